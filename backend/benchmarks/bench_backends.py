@@ -0,0 +1,136 @@
+"""
+Latency, throughput and memory of the LSTM / DistilBERT per inference backend.
+
+Usage (from backend/):
+    python benchmarks/bench_backends.py
+    python benchmarks/bench_backends.py --models distilbert --backends tf onnx-int8 --n 500 --out backends.json
+
+Each (model, backend) pair runs in a fresh subprocess with INFERENCE_BACKEND /
+ONNX_PRECISION set, so load time and memory are measured in isolation. It
+reports load time, peak RSS after loading and after inference, single-text
+p50/p95 latency, batched throughput, and how far each backend's
+probabilities drift from the first one measured (normally TensorFlow).
+Backends whose artifact is missing are reported as unavailable.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+
+from bench_batch import make_reviews
+
+BACKENDS = {
+    "tf": {"INFERENCE_BACKEND": "tf"},
+    "onnx-fp32": {"INFERENCE_BACKEND": "onnx", "ONNX_PRECISION": "fp32"},
+    "onnx-int8": {"INFERENCE_BACKEND": "onnx", "ONNX_PRECISION": "int8"},
+}
+
+
+def _rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def worker(model_name: str, backend: str, n: int, batch_size: int) -> dict:
+    """Runs inside the subprocess: load one model on one backend and measure it."""
+    from models.loader import ModelLoader
+    from services.predict import predict_with_model, predict_batch_with_model
+
+    rss_start = _rss_mb()
+    loader = ModelLoader(enabled=[model_name])
+    t0 = time.perf_counter()
+    loader.load_model(model_name)
+    load_s = time.perf_counter() - t0
+    entry = loader.models[model_name]
+    runtime = entry.get("runtime")
+    if entry["type"] == "demo" or runtime != backend.split("-")[0]:
+        return {"available": False, "error": loader.states[model_name]["error"] or f"loaded as {runtime or 'demo'}"}
+    rss_loaded = _rss_mb()
+
+    texts = make_reviews(n, seed=3)
+    predict_with_model(loader, model_name, texts[0])  # warm-up (graph optimization, allocator)
+    single = []
+    for text in texts[:min(n, 200)]:
+        t1 = time.perf_counter()
+        predict_with_model(loader, model_name, text)
+        single.append((time.perf_counter() - t1) * 1000)
+    t1 = time.perf_counter()
+    results = predict_batch_with_model(loader, model_name, texts, batch_size=batch_size)
+    batch_s = time.perf_counter() - t1
+    positive = [r["confidence"] if r["sentiment"] == "positive" else 1 - r["confidence"] for r in results]
+
+    return {
+        "available": True,
+        "precision": entry.get("precision"),
+        "load_s": round(load_s, 3),
+        "rss_model_mb": round(rss_loaded - rss_start, 1),
+        "rss_after_inference_mb": round(_rss_mb(), 1),
+        "single_p50_ms": round(float(np.percentile(single, 50)), 3),
+        "single_p95_ms": round(float(np.percentile(single, 95)), 3),
+        "batch_reviews_per_sec": round(n / batch_s, 1),
+        "positive_proba": positive,
+    }
+
+
+def run_isolated(model_name: str, backend: str, n: int, batch_size: int) -> dict:
+    env = {**os.environ, **BACKENDS[backend]}
+    cmd = [sys.executable, __file__, "--worker", model_name, backend, "--n", str(n), "--batch-size", str(batch_size)]
+    proc = subprocess.run(cmd, env=env, capture_output=True, text=True, cwd=Path(__file__).resolve().parent.parent)
+    lines = proc.stdout.strip().splitlines()
+    if proc.returncode != 0 or not lines:
+        return {"available": False, "error": (proc.stderr.strip().splitlines() or ["no output"])[-1]}
+    return json.loads(lines[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--models", nargs="+", default=["rnn_lstm", "distilbert"])
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=list(BACKENDS))
+    parser.add_argument("--n", type=int, default=300, help="reviews per measurement")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--out", default=None, help="write the results as JSON")
+    parser.add_argument("--worker", nargs=2, metavar=("MODEL", "BACKEND"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(worker(*args.worker, args.n, args.batch_size)))
+        return
+
+    report = {}
+    for model_name in args.models:
+        print(f"\n{model_name}")
+        print(f"  {'backend':<10} {'load s':>7} {'model MB':>9} {'p50 ms':>8} {'p95 ms':>8} {'batch/s':>9} {'max |Δp|':>9}")
+        reference = None
+        report[model_name] = {}
+        for backend in args.backends:
+            r = run_isolated(model_name, backend, args.n, args.batch_size)
+            proba = r.pop("positive_proba", None)
+            if not r["available"]:
+                print(f"  {backend:<10} unavailable: {r['error']}")
+            else:
+                if reference is None:
+                    reference = np.asarray(proba)
+                r["max_abs_diff_vs_first"] = round(float(np.abs(np.asarray(proba) - reference).max()), 6)
+                print(f"  {backend:<10} {r['load_s']:>7.2f} {r['rss_model_mb']:>9.1f} {r['single_p50_ms']:>8.2f} "
+                      f"{r['single_p95_ms']:>8.2f} {r['batch_reviews_per_sec']:>9.1f} {r['max_abs_diff_vs_first']:>9.2g}")
+            report[model_name][backend] = r
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Batch vs single-item throughput benchmark.
+
+Usage (from backend/):
+    python benchmarks/bench_batch.py
+    python benchmarks/bench_batch.py --models logistic_regression rnn_lstm --n 2000
+
+Loads whatever is in models/saved (demo stubs otherwise) and reports
+reviews/sec for the one-text-at-a-time loop against predict_batch_with_model.
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from models.loader import ModelLoader
+from services.predict import predict_with_model, predict_batch_with_model
+
+_WORDS = [
+    "the", "movie", "was", "plot", "acting", "film", "story", "director", "scene", "cast",
+    "great", "excellent", "wonderful", "brilliant", "boring", "terrible", "awful", "waste",
+    "not", "really", "quite", "and", "but", "ending", "characters", "music", "script",
+]
+
+
+def make_reviews(n: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(_WORDS) for _ in range(rng.randint(20, 200))) for _ in range(n)]
+
+
+def bench_model(loader, model_name: str, texts: list, batch_size: int) -> dict:
+    t0 = time.perf_counter()
+    for t in texts:
+        predict_with_model(loader, model_name, t)
+    single = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    predict_batch_with_model(loader, model_name, texts, batch_size=batch_size)
+    batched = time.perf_counter() - t0
+
+    return {
+        "model": model_name,
+        "type": loader.models[model_name]["type"],
+        "single_rps": len(texts) / single,
+        "batch_rps": len(texts) / batched,
+        "speedup": single / batched,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--n", type=int, default=1000, help="number of reviews")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--models", nargs="*", default=None)
+    args = parser.parse_args()
+
+    loader = ModelLoader()
+    loader.load_all()
+    texts = make_reviews(args.n)
+
+    print(f"\n{'model':<22}{'type':<8}{'single rev/s':>14}{'batch rev/s':>14}{'speedup':>9}")
+    for name in args.models or list(loader.models.keys()):
+        r = bench_model(loader, name, texts, args.batch_size)
+        print(f"{r['model']:<22}{r['type']:<8}{r['single_rps']:>14.1f}{r['batch_rps']:>14.1f}{r['speedup']:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Preprocessing throughput benchmark: original per-call implementation vs the
+cached engine in services/preprocess.py (single text, batch, multiprocess).
+
+Usage (from backend/):
+    python benchmarks/bench_preprocess.py --n 20000 --jobs 4
+
+Fails loudly if any output differs from the original implementation.
+"""
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services import preprocess as engine
+from bench_batch import make_reviews
+
+
+def reference_preprocess(text: str, method: str = "lemmatize") -> str:
+    """preprocess_text as it was before the engine: uncompiled regexes, no caching."""
+    text = re.sub(r'<.*?>', '', text)
+    text = re.sub(r'[^a-zA-Z\s]', '', text, flags=re.I | re.A).lower()
+    tokens = text.split()
+
+    if engine._NLTK_AVAILABLE:
+        if method == "stem":
+            from nltk.stem import PorterStemmer
+            stemmer = PorterStemmer()
+            processed = [stemmer.stem(w) for w in tokens if w not in engine._stop_words]
+        else:
+            processed = [engine._lemmatizer.lemmatize(w) for w in tokens if w not in engine._stop_words]
+    else:
+        processed = [w for w in tokens if len(w) > 2]
+
+    return ' '.join(processed)
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--n", type=int, default=5000, help="number of reviews")
+    parser.add_argument("--jobs", type=int, default=4, help="processes for the multiprocess run")
+    parser.add_argument("--method", default="lemmatize", choices=["lemmatize", "stem"])
+    args = parser.parse_args()
+
+    texts = [f"<br />{t.capitalize()}! It's a 10/10." for t in make_reviews(args.n)]
+    n_tokens = sum(len(t.split()) for t in texts)
+    engine.normalize_token.cache_clear()
+
+    ref, t_ref = timed(lambda: [reference_preprocess(t, args.method) for t in texts])
+    single, t_single = timed(lambda: [engine.preprocess_text(t, args.method) for t in texts])
+    batch, t_batch = timed(lambda: engine.preprocess_batch(texts, args.method))
+    multi, t_multi = timed(lambda: engine.preprocess_batch(texts, args.method, n_jobs=args.jobs,
+                                                          chunksize=max(len(texts) // args.jobs, 1)))
+
+    for name, out in [("preprocess_text", single), ("preprocess_batch", batch), ("multiprocess", multi)]:
+        mismatches = sum(a != b for a, b in zip(ref, out))
+        if mismatches or len(out) != len(ref):
+            sys.exit(f"{name}: {mismatches} outputs differ from the reference implementation")
+
+    print(f"\n{len(texts)} reviews, {n_tokens} tokens, NLTK={'yes' if engine._NLTK_AVAILABLE else 'no'}")
+    print(f"{'implementation':<22}{'tokens/s':>14}{'speedup':>9}")
+    for name, t in [("reference", t_ref), ("preprocess_text", t_single),
+                    ("preprocess_batch", t_batch), (f"batch x{args.jobs} procs", t_multi)]:
+        print(f"{name:<22}{n_tokens / t:>14.0f}{t_ref / t:>8.1f}x")
+    print(f"token cache: {engine.token_cache_info()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""
+Benchmark suite: micro-benchmarks for the hot paths plus an in-process load
+generator for the API, with JSON results comparable against a baseline.
+
+Usage (from backend/):
+    python benchmarks/bench_suite.py          # writes benchmarks/results/bench_results.json (gitignored)
+    python benchmarks/bench_suite.py --baseline baseline.json --fail-on-regression
+    python benchmarks/bench_suite.py --quick --save-baseline baseline.json
+
+Everything runs on fixtures: small NB / LR pipelines trained on synthetic
+reviews and demo stubs for the LSTM / DistilBERT, so no saved models, GPU or
+network are needed. The load generator drives the ASGI app directly through
+httpx (no sockets) with the result cache and process pool disabled, so the
+numbers measure the serving path rather than cache hits or IPC.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+
+from bench_batch import make_reviews
+from fixtures import make_labeled_reviews, train_pipelines, install_fixture_models
+
+LOAD_ENDPOINTS = ("/predict", "/predict/compare", "/errors")
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+def _stats(samples_ms: list) -> dict:
+    arr = np.asarray(samples_ms)
+    return {
+        "n": len(arr),
+        "mean_ms": round(float(arr.mean()), 4),
+        "p50_ms": round(float(np.percentile(arr, 50)), 4),
+        "p95_ms": round(float(np.percentile(arr, 95)), 4),
+        "p99_ms": round(float(np.percentile(arr, 99)), 4),
+    }
+
+
+def _time_calls(fn, args_list: list) -> dict:
+    """Call fn once per args tuple (after one warm-up call) and summarize per-call latency."""
+    fn(*args_list[0])
+    samples = []
+    t_all = time.perf_counter()
+    for args in args_list:
+        t0 = time.perf_counter()
+        fn(*args)
+        samples.append((time.perf_counter() - t0) * 1000)
+    total = time.perf_counter() - t_all
+    return {**_stats(samples), "ops_per_sec": round(len(args_list) / total, 2)}
+
+
+# ── Micro-benchmarks ──────────────────────────────────────────────────────────
+
+def run_micro(loader, n: int) -> dict:
+    from services.preprocess import preprocess_text, preprocess_batch
+    from services.predict import predict_with_model, predict_batch_with_model
+    from services.explain import get_lime_explanation
+
+    texts = make_reviews(n, seed=1)
+    batch = make_reviews(512, seed=2)
+    few = texts[:max(n // 20, 5)]
+    results = {
+        "preprocess_text": _time_calls(preprocess_text, [(t,) for t in texts]),
+        "preprocess_batch_512": _time_calls(preprocess_batch, [(batch,)] * 5),
+    }
+    for name in loader.enabled:
+        results[f"predict.{name}"] = _time_calls(lambda t, m=name: predict_with_model(loader, m, t),
+                                                 [(t,) for t in texts])
+        results[f"predict_batch_512.{name}"] = _time_calls(
+            lambda b, m=name: predict_batch_with_model(loader, m, b), [(batch,)] * 5)
+    for name in loader.enabled:
+        if loader.models[name]["type"] == "sklearn":
+            for mode, samples in (("exact", None), ("fast", 1000), ("lime", 1000)):
+                args = [(t,) for t in (texts if mode == "exact" else few)]
+                results[f"explain_{mode}.{name}"] = _time_calls(
+                    lambda t, m=name, md=mode, s=samples: get_lime_explanation(loader, m, t, 12, md, s), args)
+        else:
+            results[f"explain_heuristic.{name}"] = _time_calls(
+                lambda t, m=name: get_lime_explanation(loader, m, t), [(t,) for t in texts])
+    return results
+
+
+# ── Load generator ────────────────────────────────────────────────────────────
+
+async def _drive(client, method: str, path: str, bodies: list, concurrency: int) -> dict:
+    queue = asyncio.Queue()
+    for body in bodies:
+        queue.put_nowait(body)
+    samples, errors = [], 0
+
+    async def worker():
+        nonlocal errors
+        while not queue.empty():
+            body = queue.get_nowait()
+            t0 = time.perf_counter()
+            if method == "GET":
+                r = await client.get(path, params=body)
+            else:
+                r = await client.post(path, json=body)
+            samples.append((time.perf_counter() - t0) * 1000)
+            errors += r.status_code != 200
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - t0
+    return {**_stats(samples), "errors": errors, "concurrency": concurrency,
+            "throughput_rps": round(len(bodies) / wall, 2)}
+
+
+async def run_load(main, requests: int, levels: list, explain: dict = None) -> dict:
+    try:
+        import httpx
+    except ImportError:
+        raise SystemExit("The load generator needs httpx: pip install httpx")
+
+    await main.startup_event()
+    results = {}
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            for path in LOAD_ENDPOINTS:
+                results[path] = {}
+                for level in levels:
+                    texts = make_reviews(requests, seed=level)
+                    if path == "/predict":
+                        method, bodies = "POST", [{"text": t, "model": "logistic_regression", **(explain or {})}
+                                                  for t in texts]
+                    elif path == "/predict/compare":
+                        method, bodies = "POST", [{"text": t, **(explain or {})} for t in texts]
+                    else:
+                        filters = [{}, {"model": "naive_bayes"}, {"true_label": "positive"}, {"band": "high"}]
+                        method, bodies = "GET", [{**filters[i % len(filters)], "limit": 50} for i in range(requests)]
+                    await _drive(client, method, path, bodies[:max(level, 4)], level)  # warm-up
+                    results[path][f"c{level}"] = await _drive(client, method, path, bodies, level)
+                    r = results[path][f"c{level}"]
+                    print(f"  {path:<18} c={level:<4} {r['throughput_rps']:>9.1f} req/s  "
+                          f"p50 {r['p50_ms']:>8.2f}  p95 {r['p95_ms']:>8.2f}  p99 {r['p99_ms']:>8.2f} ms"
+                          + (f"  errors {r['errors']}" if r["errors"] else ""))
+    finally:
+        await main.shutdown_event()
+    return results
+
+
+# ── Baseline comparison ───────────────────────────────────────────────────────
+
+def flatten(results: dict) -> dict:
+    """Comparable scalar metrics: name -> (value, higher_is_better)."""
+    flat = {}
+    for name, r in results.get("micro", {}).items():
+        flat[f"micro.{name}.p50_ms"] = (r["p50_ms"], False)
+        flat[f"micro.{name}.ops_per_sec"] = (r["ops_per_sec"], True)
+    for path, levels in results.get("load", {}).items():
+        for level, r in levels.items():
+            for key in ("p50_ms", "p95_ms", "p99_ms"):
+                flat[f"load.{path}.{level}.{key}"] = (r[key], False)
+            flat[f"load.{path}.{level}.throughput_rps"] = (r["throughput_rps"], True)
+    return flat
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> dict:
+    """Relative change per metric, split into regressions / improvements beyond tolerance."""
+    cur, base = flatten(current), flatten(baseline)
+    regressions, improvements = {}, {}
+    for key, (value, higher_is_better) in cur.items():
+        if key not in base or not base[key][0]:
+            continue
+        change = (value - base[key][0]) / base[key][0]
+        worse = -change if higher_is_better else change
+        entry = {"baseline": base[key][0], "current": value, "change_pct": round(change * 100, 1)}
+        if worse > tolerance:
+            regressions[key] = entry
+        elif worse < -tolerance:
+            improvements[key] = entry
+    sizes = ("n", "requests", "explain_mode", "lime_samples")
+    cur_args, base_args = current["meta"]["args"], baseline.get("meta", {}).get("args", {})
+    mismatched = [k for k in sizes if k in base_args and base_args[k] != cur_args.get(k)]
+    return {"tolerance_pct": tolerance * 100, "regressions": regressions, "improvements": improvements,
+            "mismatched_args": mismatched}
+
+
+def _meta(args) -> dict:
+    import sklearn
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=Path(__file__).parent).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "sklearn": sklearn.__version__,
+        "args": vars(args),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", default=str(RESULTS_DIR / "bench_results.json"))
+    parser.add_argument("--baseline", default=None, help="results JSON to compare against")
+    parser.add_argument("--save-baseline", default=None, help="also write the results here")
+    parser.add_argument("--tolerance", type=float, default=10.0, help="percent change treated as noise")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--n", type=int, default=500, help="calls per micro-benchmark")
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint and concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--explain-mode", default=None, help="explain_mode sent with /predict requests (API default)")
+    parser.add_argument("--lime-samples", type=int, default=None, help="lime_samples sent with /predict requests")
+    parser.add_argument("--skip-micro", action="store_true")
+    parser.add_argument("--skip-load", action="store_true")
+    parser.add_argument("--quick", action="store_true", help="small sizes for a smoke run")
+    args = parser.parse_args()
+    if args.quick:
+        args.n, args.requests, args.concurrency = 100, 40, [1, 8]
+
+    # Configure the app before importing it: no process pool, no result cache, scratch error store
+    workdir = tempfile.mkdtemp(prefix="sentiment-bench-")
+    os.environ.update(EXEC_PROCESS_WORKERS="0", RESULT_CACHE_ENABLED="0", EVAL_DIR=workdir)
+    os.environ.pop("EVAL_DATA", None)
+    os.environ.pop("RESULT_CACHE_DB", None)
+    os.environ.pop("ERROR_DB", None)
+    import main as app_main
+    from services.evaluation import EvaluationStore, run_evaluation
+
+    print("Training fixture pipelines...")
+    install_fixture_models(app_main.loader, train_pipelines())
+    results = {"meta": _meta(args)}
+
+    if not args.skip_micro:
+        print("Micro-benchmarks...")
+        results["micro"] = run_micro(app_main.loader, args.n)
+        for name, r in results["micro"].items():
+            print(f"  {name:<40} p50 {r['p50_ms']:>9.3f} ms  {r['ops_per_sec']:>10.1f} ops/s")
+
+    if not args.skip_load:
+        # Fill the error store the way an evaluation run does, so /errors has real rows to page
+        texts, labels = make_labeled_reviews(3000, seed=7)
+        data = Path(workdir) / "eval.csv"
+        import pandas as pd
+        pd.DataFrame({"review": texts, "sentiment": ["positive" if y else "negative" for y in labels]}).to_csv(
+            data, index=False)
+        run_evaluation(app_main.loader, data, EvaluationStore(workdir), error_store=app_main.error_store)
+        print("Load generator...")
+        explain = {k: v for k, v in (("explain_mode", args.explain_mode), ("lime_samples", args.lime_samples)) if v}
+        results["load"] = asyncio.run(run_load(app_main, args.requests, args.concurrency, explain))
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            results["comparison"] = compare(results, json.load(f), args.tolerance / 100)
+        cmp = results["comparison"]
+        print(f"\nAgainst {args.baseline} (±{args.tolerance:g}% is noise):")
+        if cmp["mismatched_args"]:
+            print(f"  warning: baseline was run with different {', '.join(cmp['mismatched_args'])}")
+        for label, entries in (("REGRESSION", cmp["regressions"]), ("improved", cmp["improvements"])):
+            for key, e in sorted(entries.items()):
+                print(f"  {label:<10} {key:<55} {e['baseline']:>10} → {e['current']:<10} ({e['change_pct']:+.1f}%)")
+        if not cmp["regressions"] and not cmp["improvements"]:
+            print("  no change beyond tolerance")
+        if cmp["regressions"] and args.fail_on_regression:
+            exit_code = 1
+
+    for path in filter(None, (args.out, args.save_baseline)):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote {path}")
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
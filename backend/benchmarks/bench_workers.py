@@ -0,0 +1,138 @@
+"""
+Memory and throughput of serve.py against worker count.
+
+Usage (from backend/):
+    python benchmarks/bench_workers.py
+    python benchmarks/bench_workers.py --workers 1 2 4 --model logistic_regression --requests 2000
+
+For each worker count it starts serve.py, waits for /ready, drives /predict
+from client threads and reports req/s plus RSS and PSS per worker. PSS
+splits shared pages between the processes mapping them, so a low PSS next to
+a high RSS means the preloaded models really are shared copy-on-write.
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_batch import make_reviews
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def _children(pid: int) -> list:
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+
+def _memory_kb(pid: int) -> dict:
+    """RSS and PSS (kB) of one process from /proc; PSS needs smaps_rollup (Linux 4.14+)."""
+    mem = {"rss_kb": None, "pss_kb": None}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Rss:"):
+                    mem["rss_kb"] = int(line.split()[1])
+                elif line.startswith("Pss:"):
+                    mem["pss_kb"] = int(line.split()[1])
+    except OSError:
+        pass
+    return mem
+
+
+def _get(url: str, timeout: float = 5.0):
+    with urllib.request.urlopen(url, timeout=timeout) as r:
+        return json.loads(r.read())
+
+
+def _post(url: str, payload: dict, timeout: float = 60.0):
+    req = urllib.request.Request(url, data=json.dumps(payload).encode(),
+                                 headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=timeout) as r:
+        return r.status
+
+
+def _wait_ready(base: str, timeout: float = 300.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if _get(base + "/ready").get("ready"):
+                return
+        except Exception:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError("server did not become ready")
+
+
+def bench_workers(workers: int, args) -> dict:
+    base = f"http://127.0.0.1:{args.port}"
+    proc = subprocess.Popen(
+        [sys.executable, "serve.py", "--workers", str(workers), "--port", str(args.port),
+         "--host", "127.0.0.1", "--preload", args.preload],
+        cwd=BACKEND_DIR,
+    )
+    try:
+        _wait_ready(base)
+        texts = make_reviews(args.requests, seed=workers)
+        payload = lambda t: {"text": t, "model": args.model, "explain_mode": "exact"}
+        # Warm every worker before measuring
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            list(pool.map(lambda t: _post(base + "/predict", payload(t)), texts[:workers * 8]))
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            statuses = list(pool.map(lambda t: _post(base + "/predict", payload(t)), texts))
+        elapsed = time.perf_counter() - t0
+
+        pids = _children(proc.pid)
+        mems = [_memory_kb(p) for p in pids]
+        rss = [m["rss_kb"] for m in mems if m["rss_kb"] is not None]
+        pss = [m["pss_kb"] for m in mems if m["pss_kb"] is not None]
+        return {
+            "workers": workers,
+            "requests": len(texts),
+            "errors": sum(s != 200 for s in statuses),
+            "req_per_sec": round(len(texts) / elapsed, 1),
+            "parent_rss_mb": round((_memory_kb(proc.pid)["rss_kb"] or 0) / 1024, 1),
+            "worker_rss_mb": round(sum(rss) / len(rss) / 1024, 1) if rss else None,
+            "worker_pss_mb": round(sum(pss) / len(pss) / 1024, 1) if pss else None,
+            "total_pss_mb": round(sum(pss) / 1024, 1) if pss else None,
+        }
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--model", default="logistic_regression")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--preload", choices=["all", "sklearn", "none"], default="all")
+    args = parser.parse_args()
+
+    os.environ.setdefault("RESULT_CACHE_ENABLED", "0")  # measure inference, not cache hits
+    print(f"{'workers':>8} {'req/s':>10} {'rss/worker':>12} {'pss/worker':>12} {'total pss':>10} {'errors':>7}")
+    for n in args.workers:
+        r = bench_workers(n, args)
+        print(f"{r['workers']:>8} {r['req_per_sec']:>10} {str(r['worker_rss_mb']):>10}MB "
+              f"{str(r['worker_pss_mb']):>10}MB {str(r['total_pss_mb']):>8}MB {r['errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Deterministic benchmark fixtures: synthetic labeled reviews and small
+TF-IDF → NB / LR pipelines trained on them in a few seconds, so the suite
+runs without saved models, a GPU or network access.
+"""
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_batch import _WORDS
+
+_POSITIVE = ["great", "excellent", "wonderful", "brilliant", "loved", "superb", "moving", "fun"]
+_NEGATIVE = ["boring", "terrible", "awful", "waste", "dull", "worst", "weak", "mess"]
+
+
+def make_labeled_reviews(n: int, seed: int = 0) -> tuple:
+    """(texts, labels) where each review leans towards its label's vocabulary."""
+    rng = random.Random(seed)
+    texts, labels = [], []
+    for _ in range(n):
+        label = rng.random() < 0.5
+        lean, other = (_POSITIVE, _NEGATIVE) if label else (_NEGATIVE, _POSITIVE)
+        words = [rng.choice(_WORDS) for _ in range(rng.randint(20, 200))]
+        for _ in range(rng.randint(2, 8)):
+            words.insert(rng.randrange(len(words) + 1), rng.choice(lean))
+        if rng.random() < 0.3:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(other))
+        texts.append(" ".join(words))
+        labels.append(int(label))
+    return texts, labels
+
+
+def train_pipelines(n: int = 4000, seed: int = 0) -> dict:
+    """Small NB and LR pipelines shaped like the ones save_models.py produces."""
+    from sklearn.pipeline import Pipeline
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.naive_bayes import MultinomialNB
+    from sklearn.linear_model import LogisticRegression
+    from services.preprocess import preprocess_batch
+
+    texts, labels = make_labeled_reviews(n, seed)
+    processed = preprocess_batch(texts)
+    pipelines = {
+        "naive_bayes": Pipeline([("tfidf", TfidfVectorizer(ngram_range=(1, 2), min_df=2)), ("clf", MultinomialNB())]),
+        "logistic_regression": Pipeline([("tfidf", TfidfVectorizer(ngram_range=(1, 2), min_df=2)),
+                                         ("clf", LogisticRegression(max_iter=1000, random_state=seed))]),
+    }
+    for pipeline in pipelines.values():
+        pipeline.fit(processed, labels)
+    return pipelines
+
+
+def install_fixture_models(loader, pipelines: dict = None):
+    """Register the fixture pipelines (and demo stubs for the deep models) on a ModelLoader."""
+    from models.loader import sklearn_entry
+    pipelines = pipelines or train_pipelines()
+    for name in loader.enabled:
+        if name in pipelines:
+            loader._set_model(name, sklearn_entry(pipelines[name]), f"bench-{name}")
+        else:
+            loader._set_model(name, {"type": "demo", "label": name})
+        loader.states[name]["state"] = "ready"
+        loader._ready[name].set()
+    loader.load_started = True
+    return loader
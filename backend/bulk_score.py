@@ -0,0 +1,320 @@
+"""
+Offline bulk scoring: stream a review file through the models without HTTP.
+
+Usage (from backend/):
+    python bulk_score.py reviews.csv scores.csv
+    python bulk_score.py archive.parquet scores.jsonl --models logistic_regression rnn_lstm --workers 8
+    python bulk_score.py reviews.jsonl scores.csv --text-column text --id-column review_id
+
+Input (CSV, JSONL or Parquet) is read in bounded chunks. Preprocessing and
+the sklearn models run on a process pool while the parent runs batched
+LSTM / DistilBERT inference on the previous chunk. Rows are appended to the
+output (CSV or JSONL) as each chunk finishes, and a checkpoint next to the
+output records how far the job got, so re-running the same command after a
+crash or kill resumes from the last completed chunk.
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from models.loader import ModelLoader, ALL_MODELS
+from services.predict import predict_batch_with_model
+from services.preprocess import preprocess_batch
+
+SKLEARN_MODELS = ("naive_bayes", "logistic_regression")
+INPUT_FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl", ".parquet": "parquet", ".pq": "parquet"}
+OUTPUT_FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+
+# Worker-local loader, populated by _init_worker inside each pool process
+_worker_loader = None
+
+
+def _init_worker(models: list):
+    global _worker_loader
+    _worker_loader = ModelLoader(enabled=models)
+    for name in _worker_loader.enabled:
+        _worker_loader.load_model(name)
+
+
+def _score_part(texts: list, sklearn_models: list, loader=None) -> tuple:
+    """Preprocess one slice of a chunk and run the sklearn models on it."""
+    loader = loader or _worker_loader
+    timings = {}
+    t0 = time.perf_counter()
+    processed = preprocess_batch(texts)
+    timings["preprocess"] = time.perf_counter() - t0
+    results = {}
+    for name in sklearn_models:
+        t0 = time.perf_counter()
+        results[name] = predict_batch_with_model(loader, name, texts, len(texts), processed)
+        timings[name] = time.perf_counter() - t0
+    return processed, results, timings
+
+
+# ── Input ─────────────────────────────────────────────────────────────────────
+
+def _detect_format(path: str, formats: dict, given: str = None) -> str:
+    if given:
+        return given
+    fmt = formats.get(Path(path).suffix.lower())
+    if fmt is None:
+        raise SystemExit(f"Cannot infer format of {path}; pass it explicitly ({sorted(set(formats.values()))})")
+    return fmt
+
+
+def iter_chunks(path: str, fmt: str, text_column: str, id_column: str = None,
+                chunk_size: int = 10_000, skip: int = 0):
+    """Yield (ids, texts) lists of at most chunk_size rows, starting after `skip` rows."""
+    import pandas as pd
+
+    columns = [text_column] + ([id_column] if id_column else [])
+    if fmt == "csv":
+        frames = pd.read_csv(path, usecols=columns, chunksize=chunk_size,
+                             skiprows=range(1, skip + 1) if skip else None)
+        skip = 0
+    elif fmt == "jsonl":
+        frames = pd.read_json(path, lines=True, chunksize=chunk_size)
+    elif fmt == "parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Parquet input needs pyarrow: pip install pyarrow")
+        frames = (b.to_pandas() for b in pq.ParquetFile(path).iter_batches(batch_size=chunk_size, columns=columns))
+    else:
+        raise SystemExit(f"Unsupported input format '{fmt}'")
+
+    for frame in frames:
+        if skip:
+            if skip >= len(frame):
+                skip -= len(frame)
+                continue
+            frame, skip = frame.iloc[skip:], 0
+        if text_column not in frame:
+            raise SystemExit(f"Input has no '{text_column}' column (use --text-column)")
+        texts = frame[text_column].fillna("").astype(str).tolist()
+        ids = frame[id_column].tolist() if id_column else None
+        yield ids, texts
+
+
+# ── Output + checkpoint ───────────────────────────────────────────────────────
+
+class ResultWriter:
+    """Appends scored rows to CSV / JSONL; truncates back to the checkpointed offset on resume."""
+
+    def __init__(self, path: str, fmt: str, models: list, with_id: bool, offset: int = 0):
+        self.fmt = fmt
+        self.fields = ["row"] + (["id"] if with_id else [])
+        for name in models:
+            self.fields += [f"{name}_sentiment", f"{name}_confidence"]
+        mode = "r+" if offset and os.path.exists(path) else "w"
+        self.f = open(path, mode, newline="", encoding="utf-8")
+        self.f.seek(offset)
+        self.f.truncate()
+        if fmt == "csv":
+            self.csv = csv.writer(self.f)
+            if offset == 0:
+                self.csv.writerow(self.fields)
+
+    def write(self, rows: list):
+        if self.fmt == "csv":
+            self.csv.writerows([[row[k] for k in self.fields] for row in rows])
+        else:
+            self.f.write("".join(json.dumps(row) + "\n" for row in rows))
+
+    def sync(self) -> int:
+        """Flush to disk and return the byte offset a checkpoint can resume from."""
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        return self.f.tell()
+
+    def close(self):
+        self.f.close()
+
+
+def load_checkpoint(path: Path, job: dict) -> dict:
+    if not path.exists():
+        return None
+    with open(path) as f:
+        ckpt = json.load(f)
+    if ckpt.get("job") != job:
+        raise SystemExit(f"Checkpoint {path} belongs to a different job; delete it or pass --restart")
+    return ckpt
+
+
+def save_checkpoint(path: Path, ckpt: dict):
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(ckpt, f)
+    os.replace(tmp, path)
+
+
+# ── Scoring ───────────────────────────────────────────────────────────────────
+
+class BulkScorer:
+    def __init__(self, models: list, workers: int, batch_size: int = 32):
+        self.models = models
+        self.sklearn_models = [m for m in models if m in SKLEARN_MODELS]
+        self.deep_models = [m for m in models if m not in SKLEARN_MODELS]
+        self.workers = workers
+        self.batch_size = batch_size
+        self.timings = {}           # stage -> seconds (worker stages are summed CPU-seconds)
+        self.pool = None
+        # With a pool the sklearn pipelines live in the workers; the parent only needs the deep models
+        self.loader = ModelLoader(enabled=self.deep_models if workers > 0 else models)
+
+    def start(self):
+        self.loader.load_all(mode="eager")
+        if self.workers > 0:
+            # spawn, not fork: the parent may already be running TF threads
+            ctx = multiprocessing.get_context("spawn")
+            self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx,
+                                            initializer=_init_worker, initargs=(self.sklearn_models,))
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+
+    def _add(self, stage: str, seconds: float):
+        self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+
+    def submit(self, texts: list) -> list:
+        """Start preprocessing + sklearn scoring of a chunk; returns handles for finish()."""
+        if self.pool is None:
+            return [_score_part(texts, self.sklearn_models, self.loader)]
+        part = max(len(texts) // self.workers, 1)
+        return [self.pool.submit(_score_part, texts[i:i + part], self.sklearn_models)
+                for i in range(0, len(texts), part)]
+
+    def finish(self, texts: list, parts: list) -> dict:
+        """Collect the pool results for a chunk and run the deep models on it. Returns model -> results."""
+        t0 = time.perf_counter()
+        processed, results = [], {name: [] for name in self.models}
+        for part in parts:
+            part_processed, part_results, timings = part if self.pool is None else part.result()
+            processed.extend(part_processed)
+            for name, res in part_results.items():
+                results[name].extend(res)
+            for stage, seconds in timings.items():
+                self._add(stage, seconds)
+        self._add("pool_wait", time.perf_counter() - t0)
+
+        for name in self.deep_models:
+            t0 = time.perf_counter()
+            results[name] = predict_batch_with_model(self.loader, name, texts, self.batch_size, processed)
+            self._add(name, time.perf_counter() - t0)
+        return results
+
+
+def run(args) -> dict:
+    in_fmt = _detect_format(args.input, INPUT_FORMATS, args.input_format)
+    out_fmt = _detect_format(args.output, OUTPUT_FORMATS, args.output_format)
+    ckpt_path = Path(args.checkpoint or args.output + ".ckpt.json")
+    job = {"input": os.path.abspath(args.input), "output": os.path.abspath(args.output),
+           "models": args.models, "text_column": args.text_column, "id_column": args.id_column}
+
+    ckpt = None if args.restart else load_checkpoint(ckpt_path, job)
+    rows_done = ckpt["rows_done"] if ckpt else 0
+    if ckpt:
+        print(f"Resuming after row {rows_done:,} from {ckpt_path}")
+
+    scorer = BulkScorer(args.models, args.workers, args.batch_size)
+    scorer.start()
+    if ckpt:
+        scorer.timings = dict(ckpt["timings"])
+    writer = ResultWriter(args.output, out_fmt, args.models, args.id_column is not None,
+                          offset=ckpt["output_bytes"] if ckpt else 0)
+
+    started = time.perf_counter()
+    elapsed_before = ckpt["elapsed_s"] if ckpt else 0.0
+    rows_this_run = 0
+
+    def complete(row0, ids, texts, parts):
+        nonlocal rows_done, rows_this_run
+        results = scorer.finish(texts, parts)
+        t0 = time.perf_counter()
+        rows = []
+        for i in range(len(texts)):
+            row = {"row": row0 + i}
+            if ids is not None:
+                row["id"] = ids[i]
+            for name in args.models:
+                row[f"{name}_sentiment"] = results[name][i]["sentiment"]
+                row[f"{name}_confidence"] = results[name][i]["confidence"]
+            rows.append(row)
+        writer.write(rows)
+        offset = writer.sync()
+        rows_done += len(texts)
+        rows_this_run += len(texts)
+        elapsed = elapsed_before + time.perf_counter() - started
+        save_checkpoint(ckpt_path, {"job": job, "rows_done": rows_done, "output_bytes": offset,
+                                    "elapsed_s": elapsed, "timings": scorer.timings})
+        scorer._add("write", time.perf_counter() - t0)
+        print(f"  {rows_done:,} rows  ({rows_this_run / (time.perf_counter() - started):,.0f} rows/s)")
+
+    # One chunk in flight on the pool while the parent finishes the previous one
+    pending = None
+    try:
+        chunks = iter_chunks(args.input, in_fmt, args.text_column, args.id_column, args.chunk_size, skip=rows_done)
+        row0 = rows_done
+        while True:
+            t0 = time.perf_counter()
+            chunk = next(chunks, None)
+            scorer._add("read", time.perf_counter() - t0)
+            if chunk is None:
+                break
+            ids, texts = chunk
+            current = (row0, ids, texts, scorer.submit(texts))
+            row0 += len(texts)
+            if pending is not None:
+                complete(*pending)
+            pending = current
+        if pending is not None:
+            complete(*pending)
+    finally:
+        writer.close()
+        scorer.shutdown()
+
+    wall = time.perf_counter() - started
+    return {
+        "rows": rows_done,
+        "rows_this_run": rows_this_run,
+        "wall_s": round(wall, 2),
+        "rows_per_sec": round(rows_this_run / wall, 1) if wall else 0.0,
+        "stage_s": {k: round(v, 2) for k, v in sorted(scorer.timings.items())},
+        "checkpoint": str(ckpt_path),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input")
+    parser.add_argument("output")
+    parser.add_argument("--models", nargs="+", default=list(SKLEARN_MODELS), choices=ALL_MODELS)
+    parser.add_argument("--text-column", default="review")
+    parser.add_argument("--id-column", default=None)
+    parser.add_argument("--input-format", choices=sorted(set(INPUT_FORMATS.values())))
+    parser.add_argument("--output-format", choices=sorted(set(OUTPUT_FORMATS.values())))
+    parser.add_argument("--chunk-size", type=int, default=10_000, help="rows read, scored and written at a time")
+    parser.add_argument("--batch-size", type=int, default=32, help="LSTM / DistilBERT forward-pass batch size")
+    parser.add_argument("--workers", type=int, default=min(os.cpu_count() or 1, 8),
+                        help="process-pool size for preprocessing + sklearn (0 = in-process)")
+    parser.add_argument("--checkpoint", default=None, help="checkpoint path (default: <output>.ckpt.json)")
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint and start over")
+    args = parser.parse_args()
+
+    summary = run(args)
+    print(f"\nScored {summary['rows']:,} rows ({summary['rows_this_run']:,} this run) "
+          f"in {summary['wall_s']}s — {summary['rows_per_sec']:,} rows/s")
+    print("Per-stage seconds (preprocess / sklearn stages are summed across workers):")
+    for stage, seconds in summary["stage_s"].items():
+        print(f"  {stage:<20} {seconds:>10.2f}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+"""
+Pick the confidence thresholds of the "auto" cascade from a labeled review file.
+
+Every tier scores every review once; the thresholds are then grid-searched
+offline for the lowest mean per-review cost whose accuracy still meets
+--target-accuracy. Cost is each tier's measured single-review latency (or
+--cost overrides), summed over the tiers a review passes through.
+
+Usage (from backend/):
+    python calibrate_cascade.py "../IMDB Dataset.csv" --max-rows 5000 --target-accuracy 0.90
+    python calibrate_cascade.py test.csv --tiers logistic_regression distilbert --cost distilbert=40
+
+Writes the cascade config (default data/cascade.json, or CASCADE_CONFIG) that
+the server reads at startup and on POST /cascade/reload.
+"""
+import argparse
+import itertools
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from models.loader import ModelLoader
+from services.cascade import CONFIG_PATH, load_config
+from services.evaluation import EvaluationStore, iter_labeled_chunks
+from services.predict import predict_batch_with_model
+from services.preprocess import preprocess_batch
+
+COST_SAMPLE = 100        # reviews timed one at a time per tier
+
+
+def score_tiers(loader, tiers: list, data_path, max_rows: int, chunk_size: int, batch_size: int) -> tuple:
+    """Labels plus per-tier confidence and correctness arrays over the whole file."""
+    labels, confidence, correct = [], {t: [] for t in tiers}, {t: [] for t in tiers}
+    sample = []
+    for texts, chunk_labels in iter_labeled_chunks(data_path, chunk_size, max_rows=max_rows):
+        processed = preprocess_batch(texts)
+        if len(sample) < COST_SAMPLE:
+            sample.extend(zip(texts, processed))
+        labels.extend(chunk_labels)
+        for name in tiers:
+            results = predict_batch_with_model(loader, name, texts, batch_size, processed)
+            confidence[name].extend(r["confidence"] for r in results)
+            correct[name].extend(r["sentiment"] == ("positive" if y else "negative")
+                                 for r, y in zip(results, chunk_labels))
+    return (np.asarray(labels), {t: np.asarray(v) for t, v in confidence.items()},
+            {t: np.asarray(v, dtype=bool) for t, v in correct.items()}, sample[:COST_SAMPLE])
+
+
+def measure_costs(loader, tiers: list, sample: list) -> dict:
+    """Median single-review latency per tier (ms), as the server sees one request at a time."""
+    costs = {}
+    for name in tiers:
+        predict_batch_with_model(loader, name, [sample[0][0]], processed=[sample[0][1]])  # warm-up
+        times = []
+        for text, processed in sample:
+            t0 = time.perf_counter()
+            predict_batch_with_model(loader, name, [text], processed=[processed])
+            times.append((time.perf_counter() - t0) * 1000)
+        costs[name] = float(np.median(times))
+    return costs
+
+
+def simulate(thresholds, confidence: np.ndarray, correct: np.ndarray, cum_cost: np.ndarray) -> tuple:
+    """(accuracy, mean cost, answering tier per review) for one threshold combination."""
+    n_tiers, n = confidence.shape
+    answered = np.full(n, n_tiers - 1)
+    open_ = np.ones(n, dtype=bool)
+    for i, threshold in enumerate(thresholds):
+        take = open_ & (confidence[i] >= threshold)
+        answered[take] = i
+        open_ &= ~take
+    accuracy = correct[answered, np.arange(n)].mean()
+    return float(accuracy), float(cum_cost[answered].mean()), answered
+
+
+def search(confidence: np.ndarray, correct: np.ndarray, costs: np.ndarray, target: float, grid: float) -> tuple:
+    """
+    Cheapest thresholds meeting the target accuracy; (thresholds, met_target).
+    Falls back to the most accurate combination when none meets it.
+    """
+    # Binary confidences are >= 0.5; a threshold above 1.0 means "always escalate"
+    values = list(np.round(np.arange(0.5, 1.0 + grid / 2, grid), 6)) + [1.01]
+    cum_cost = np.cumsum(costs)
+    best, best_key, fallback, fallback_key = None, None, None, None
+    for thresholds in itertools.product(values, repeat=len(costs) - 1):
+        accuracy, cost, _ = simulate(thresholds, confidence, correct, cum_cost)
+        if accuracy >= target and (best_key is None or (cost, -accuracy) < best_key):
+            best, best_key = thresholds, (cost, -accuracy)
+        if fallback_key is None or (-accuracy, cost) < fallback_key:
+            fallback, fallback_key = thresholds, (-accuracy, cost)
+    return ([float(t) for t in best], True) if best is not None else ([float(t) for t in fallback], False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("data", help="CSV with 'review' and 'sentiment' columns")
+    parser.add_argument("--tiers", nargs="+", default=None, help="cheapest first (default: current cascade tiers)")
+    parser.add_argument("--target-accuracy", type=float, default=None,
+                        help="minimum accuracy (default: the last tier's own accuracy minus 0.005)")
+    parser.add_argument("--grid", type=float, default=0.01, help="threshold grid step")
+    parser.add_argument("--cost", nargs="*", default=[], metavar="MODEL=MS",
+                        help="per-review cost override instead of the measured latency")
+    parser.add_argument("--max-rows", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--out", default=os.getenv("CASCADE_CONFIG") or str(CONFIG_PATH))
+    args = parser.parse_args()
+
+    tiers = args.tiers or load_config()["tiers"]
+    if len(tiers) < 2:
+        raise SystemExit("A cascade needs at least two tiers")
+    loader = ModelLoader(enabled=tiers)
+    for name in tiers:
+        loader.load_model(name)
+        if loader.versions.get(name) == "demo":
+            print(f"⚠️  {name} is the demo stub; its thresholds will not mean anything")
+
+    print(f"Scoring {args.data} with {', '.join(tiers)}...")
+    labels, confidence, correct, sample = score_tiers(loader, tiers, args.data, args.max_rows,
+                                                      args.chunk_size, args.batch_size)
+    if not len(labels):
+        raise SystemExit("No labeled rows")
+    costs = measure_costs(loader, tiers, sample)
+    for override in args.cost:
+        name, ms = override.split("=")
+        costs[name] = float(ms)
+
+    conf = np.stack([confidence[t] for t in tiers])
+    corr = np.stack([correct[t] for t in tiers])
+    cost_vec = np.array([costs[t] for t in tiers])
+    last_accuracy = float(corr[-1].mean())
+    target = args.target_accuracy if args.target_accuracy is not None else last_accuracy - 0.005
+    thresholds, met = search(conf, corr, cost_vec, target, args.grid)
+    accuracy, mean_cost, answered = simulate(thresholds, conf, corr, np.cumsum(cost_vec))
+    if not met:
+        print(f"⚠️  No thresholds reach accuracy {target:.4f}; using the most accurate ({accuracy:.4f})")
+
+    last_cost = float(cost_vec[-1])
+    config = {
+        "tiers": tiers,
+        "thresholds": thresholds,
+        "costs_ms": {t: round(costs[t], 3) for t in tiers},
+        "target_accuracy": round(target, 4),
+        "expected": {
+            "accuracy": round(accuracy, 4),
+            "met_target": met,
+            "mean_cost_ms": round(mean_cost, 3),
+            "last_tier_accuracy": round(last_accuracy, 4),
+            "last_tier_cost_ms": round(last_cost, 3),
+            "savings_pct": round(100 * (1 - mean_cost / last_cost), 1) if last_cost > 0 else None,
+            "tier_share": {t: round(float((answered == i).mean()), 4) for i, t in enumerate(tiers)},
+            "tier_accuracy": {t: round(float(corr[i].mean()), 4) for i, t in enumerate(tiers)},
+        },
+        "rows": int(len(labels)),
+        "data_version": EvaluationStore().data_version(args.data, args.max_rows),
+        "calibrated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(config, f, indent=2)
+
+    print(f"\n{'tier':<22} {'threshold':>9} {'cost ms':>8} {'alone acc':>9} {'answers':>8}")
+    for i, t in enumerate(tiers):
+        threshold = f"{thresholds[i]:.2f}" if i < len(thresholds) else "—"
+        print(f"{t:<22} {threshold:>9} {costs[t]:>8.2f} {corr[i].mean():>9.4f} "
+              f"{config['expected']['tier_share'][t]:>8.1%}")
+    print(f"\nCascade accuracy {accuracy:.4f} (target {target:.4f}, {tiers[-1]} alone {last_accuracy:.4f})")
+    print(f"Mean cost {mean_cost:.2f} ms vs {last_cost:.2f} ms for {tiers[-1]} alone "
+          f"({config['expected']['savings_pct']}% saved)")
+    print(f"Wrote {args.out} — POST /cascade/reload or restart the server to apply")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Evaluate the saved models on a labeled IMDB-format CSV and store the results
+the /metrics, /metrics/details and /dataset/stats endpoints serve.
+
+Misclassified reviews go to the SQLite store behind /errors.
+
+Usage (from backend/):
+    python evaluate.py "../IMDB Dataset.csv"
+    python evaluate.py test.csv --max-rows 10000 --force
+
+Only models (and dataset statistics) without an artifact for this data file
+and model version are recomputed, unless --force is given.
+"""
+import argparse
+import json
+import os
+
+from models.loader import ModelLoader
+from services.errors import ErrorStore
+from services.evaluation import EVAL_DIR, EvaluationStore, run_evaluation
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("data", help="CSV with 'review' and 'sentiment' columns")
+    parser.add_argument("--max-rows", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=32, help="LSTM / DistilBERT forward-pass batch size")
+    parser.add_argument("--out-dir", default=os.getenv("EVAL_DIR") or str(EVAL_DIR))
+    parser.add_argument("--error-db", default=None, help="misclassification store (default: <out-dir>/errors.db)")
+    parser.add_argument("--force", action="store_true", help="recompute even if artifacts exist")
+    args = parser.parse_args()
+
+    loader = ModelLoader()
+    loader.load_all(mode="eager")
+    report = run_evaluation(loader, args.data, EvaluationStore(args.out_dir), chunk_size=args.chunk_size,
+                            max_rows=args.max_rows, batch_size=args.batch_size, force=args.force,
+                            error_store=ErrorStore(args.error_db or os.path.join(args.out_dir, "errors.db")))
+
+    print(f"\nEvaluation {report['key']} (data {report['data_version']})")
+    for art in report["models"].values():
+        print(f"  {art['label']:<20} {json.dumps(art['metrics'])}")
+
+
+if __name__ == "__main__":
+    main()
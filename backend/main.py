@@ -2,16 +2,33 @@
 Sentiment Analysis Dashboard — FastAPI Backend
 Serves all 4 ML models with LIME explanations
 """
+import asyncio
+import json
+import os
 import time
+from contextlib import AsyncExitStack
 import numpy as np
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 
-from schemas import PredictRequest, CompareRequest, PredictResponse, CompareResponse
-from models.loader import ModelLoader
+from schemas import (
+    PredictRequest, CompareRequest, PredictResponse, CompareResponse,
+    BatchPredictRequest, BatchPredictResponse,
+)
+from models.loader import ModelLoader, ReloadInProgress
 from services.preprocess import preprocess_text
-from services.predict import predict_with_model
-from services.explain import get_lime_explanation
+from services.batching import MicroBatcher, batching_config
+from services.executor import InferenceExecutor
+from services.explain import EXPLAIN_MODES, MAX_NUM_SAMPLES, PartialExplanation
+from services.cache import ResultCache
+from services.evaluation import EVAL_DIR, EvaluationRunner
+from services.errors import ErrorStore
+from services.cascade import CASCADE_MODEL, Cascade
+from services.live import LiveSession
+from services.admission import DEADLINE_HEADER, AdmissionController, Overloaded
+from services.reload import ModelReloader
+from services import telemetry
 
 app = FastAPI(
     title="Sentiment Analysis API",
@@ -30,10 +47,162 @@ app.add_middleware(
 # Load models once on startup
 loader = ModelLoader()
 
+# Prediction / explanation results keyed by model version + text hash
+result_cache = ResultCache.from_env()
+loader.add_listener(result_cache.on_model_loaded)
+
+# Metrics / dataset stats computed from EVAL_DATA, re-run when a model version changes
+# Misclassified reviews from the evaluation run, queried by /errors
+error_store = ErrorStore.from_env(os.path.join(os.getenv("EVAL_DIR") or EVAL_DIR, "errors.db"))
+evaluation = EvaluationRunner.from_env(loader, error_store)
+loader.add_listener(evaluation.on_model_loaded)
+
+# Virtual "auto" model: cheapest tier first, escalating while confidence is below the tier threshold
+cascade = Cascade.from_env()
+
+# Thread / process pools for CPU-bound inference and LIME
+executor = InferenceExecutor()
+
+# Per-model slots, bounded queues and the degradation ladder for /predict and /predict/compare
+admission = AdmissionController.from_env(executor)
+
+# Hot reload with warm-up: POST /admin/models/{name}/reload, or a watcher on models/saved (MODEL_WATCH=1)
+reloader = ModelReloader.from_env(loader)
+
+# Micro-batchers for the deep models, keyed by model name (created on first use)
+batchers = {}
+
+# How long a request waits for a model that is still loading before getting a 503
+MODEL_WAIT_MS = float(os.getenv("MODEL_WAIT_MS", 2000))
+
+# Shared explanation deadline for /predict/compare unless the request sets lime_deadline_ms
+COMPARE_EXPLAIN_DEADLINE_MS = float(os.getenv("COMPARE_EXPLAIN_DEADLINE_MS", 3000))
+
+# Runtime sampling profiler endpoints (/debug/profile/*) are off unless PROFILER_ENABLED=1
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "0") == "1"
+
+_route_paths = None
+
+
+@app.middleware("http")
+async def instrument_requests(request: Request, call_next):
+    """In-flight gauge, request latency histogram and the endpoint label for stage timings."""
+    global _route_paths
+    if _route_paths is None:
+        _route_paths = {getattr(r, "path", None) for r in app.routes}
+    endpoint = request.url.path if request.url.path in _route_paths else "other"
+    telemetry.current_endpoint.set(endpoint)
+    telemetry.IN_FLIGHT.inc(endpoint=endpoint)
+    t0 = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        telemetry.IN_FLIGHT.dec(endpoint=endpoint)
+        telemetry.REQUEST_SECONDS.observe(time.perf_counter() - t0, endpoint=endpoint,
+                                          method=request.method, status=status)
+
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    return JSONResponse({"detail": str(exc), "degradation": {"level": "shed", "reason": exc.reason}},
+                        status_code=429, headers={"Retry-After": str(exc.retry_after), "X-Degradation": "shed"})
+
+
+def _serialize(payload, model: str = "") -> Response:
+    """Render a response model to JSON, timed as the serialize stage."""
+    with telemetry.stage("serialize", model):
+        return Response(payload.model_dump_json(), media_type="application/json")
+
+
 @app.on_event("startup")
 async def startup_event():
-    loader.load_all()
-    print(" All models loaded and ready")
+    executor.start()
+    if not loader.load_started:  # serve.py loads in the parent before forking workers
+        loader.load_all()
+    if loader.mode == "eager":
+        print(" All models loaded and ready")
+    evaluation.start()
+    reloader.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    reloader.stop()
+    for batcher in batchers.values():
+        await batcher.stop()
+    executor.shutdown()
+    result_cache.close()
+
+
+async def _require_model(model_name: str):
+    """400 for unknown models; wait briefly for one that is loading, then 503."""
+    if not loader.known(model_name):
+        raise HTTPException(status_code=400, detail=f"Model '{model_name}' not found. Choose from: {loader.enabled}")
+    if loader.is_ready(model_name):
+        return
+    if not await asyncio.to_thread(loader.wait_ready, model_name, MODEL_WAIT_MS / 1000):
+        raise HTTPException(
+            status_code=503, detail=f"Model '{model_name}' is still loading",
+            headers={"Retry-After": "1"},
+        )
+
+
+def _batcher_for(model_name: str):
+    """Micro-batcher for a loaded deep model, created on first use; None for other types."""
+    mtype = loader.models[model_name]["type"]
+    if mtype not in ("lstm", "bert"):
+        return None
+    if model_name not in batchers:
+        batchers[model_name] = MicroBatcher(loader, model_name, executor=executor, **batching_config(model_name, mtype))
+        batchers[model_name].start()
+    return batchers[model_name]
+
+
+async def _predict_one(model_name: str, text: str, processed: str = None) -> dict:
+    """Route deep models through their micro-batcher; everything else goes to the thread pool."""
+    batcher = _batcher_for(model_name)
+    if batcher is not None:
+        return await batcher.submit(text, processed)
+    return await executor.predict(loader, model_name, text, processed)
+
+
+def _predict_key(model_name: str, text: str) -> tuple:
+    return result_cache.key("predict", model_name, loader.versions.get(model_name), text)
+
+
+async def _cached_predict(model_name: str, text: str, processed: str = None) -> dict:
+    key = _predict_key(model_name, text)
+    result = await result_cache.aget(key)
+    if result is None:
+        result = await _predict_one(model_name, text, processed)
+        # Keyed by the version that answered, which a hot reload may have changed since the lookup
+        result_cache.set(result_cache.key("predict", model_name, result["model_version"], text), result)
+    return result
+
+
+async def _cached_explain(model_name: str, text: str, mode: str, num_samples: int, deadline_ms: float) -> list:
+    # The deadline is not part of the key: a complete explanation answers any deadline,
+    # and one the deadline cut short is not cached
+    key = result_cache.key("explain", model_name, loader.versions.get(model_name), text,
+                           mode=mode, num_samples=num_samples)
+    words = await result_cache.aget(key)
+    if words is None:
+        words = await executor.explain(
+            loader, model_name, text, mode=mode, num_samples=num_samples, deadline_ms=deadline_ms,
+        )
+        if not isinstance(words, PartialExplanation):
+            result_cache.set(key, words)
+    return words
+
+
+def _check_explain_params(req):
+    if req.explain_mode not in EXPLAIN_MODES:
+        raise HTTPException(status_code=400, detail=f"explain_mode must be one of {list(EXPLAIN_MODES)}")
+    if req.lime_samples is not None and not 2 <= req.lime_samples <= MAX_NUM_SAMPLES:
+        raise HTTPException(status_code=422, detail=f"lime_samples must be between 2 and {MAX_NUM_SAMPLES}")
 
 
 @app.get("/")
@@ -41,57 +210,700 @@ def root():
     return {"status": "ok", "message": "Sentiment Analysis API is running"}
 
 
-@app.post("/predict", response_model=PredictResponse)
-async def predict(req: PredictRequest):
-    """Single model prediction with LIME explanation"""
-    model_name = req.model
-    if model_name not in loader.models:
-        raise HTTPException(status_code=400, detail=f"Model '{model_name}' not found. Choose from: {list(loader.models.keys())}")
+@app.get("/ready")
+def ready():
+    """Per-model load state; 503 until nothing is pending/loading (lazy mode is always ready)"""
+    states = loader.status()
+    busy = [n for n, s in states.items() if s["state"] == "loading"
+            or (s["state"] == "pending" and loader.mode != "lazy")]
+    body = {"ready": not busy, "mode": loader.mode, "models": states}
+    return JSONResponse(body, status_code=200 if not busy else 503)
 
-    t0 = time.time()
-    result = predict_with_model(loader, model_name, req.text)
-    elapsed = (time.time() - t0) * 1000
 
-    lime_words = []
+def _deadline_ms(request: Request):
+    """Client time budget from the deadline header, or None."""
+    value = request.headers.get(DEADLINE_HEADER)
+    if value is None:
+        return None
     try:
-        lime_words = get_lime_explanation(loader, model_name, req.text)
+        return max(float(value), 0.0)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{DEADLINE_HEADER} must be a number of milliseconds")
+
+
+def _explain_budget(deadline_ms, decision):
+    """Explanation deadline: the request's own, cut to what is left of the client's budget."""
+    remaining = decision.remaining_ms() if decision is not None else None
+    if remaining is None:
+        return deadline_ms
+    return remaining if deadline_ms is None else min(deadline_ms, remaining)
+
+
+async def _within(decision, coro):
+    """Await coro within the client's remaining budget; 504 when it runs out."""
+    remaining = decision.remaining_ms()
+    if remaining is None:
+        return await coro
+    try:
+        return await asyncio.wait_for(coro, remaining / 1000)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail=f"{DEADLINE_HEADER} budget exhausted")
+
+
+async def _explain_or_empty(model_name: str, req, decision=None) -> list:
+    mode = decision.explain_mode if decision is not None else req.explain_mode
+    try:
+        return await _cached_explain(model_name, req.text, mode, req.lime_samples,
+                                     _explain_budget(req.lime_deadline_ms, decision))
     except Exception as e:
-        print(f"LIME failed: {e}")
+        print(f"LIME failed for {model_name}: {type(e).__name__}: {e}")
+        telemetry.record_error("explain", e)
+        return []
+
 
-    return PredictResponse(
+async def _predict_cascade(req: PredictRequest, request: Request) -> Response:
+    """
+    The "auto" model: run the tiers in order until one is confident enough, explain with that tier.
+    Each tier is admitted on its own; a tier that would be shed or routed elsewhere ends the
+    escalation and the previous tier's answer stands.
+    """
+    _check_explain_params(req)
+    tiers = [m for m in cascade.tiers if loader.known(m)]
+    if not tiers:
+        raise HTTPException(status_code=400, detail=f"No cascade tier is enabled (tiers: {cascade.tiers})")
+    deadline_ms = _deadline_ms(request)
+    processed, path, decisions = None, [], {}
+    for i, name in enumerate(cascade.tiers):
+        if name not in tiers:
+            continue
+        # A tier that is still loading is skipped; the previous tier's answer stands if it was the last
+        if not await asyncio.to_thread(loader.wait_ready, name, MODEL_WAIT_MS / 1000):
+            continue
+        last = name == tiers[-1]
+        try:
+            decision = admission.decide(loader, name, req.explain_mode, deadline_ms)
+            if path and decision.served_by != name:
+                break
+            if processed is None:
+                processed = await _shared_preprocess(req.text, [decision.served_by])
+            async with admission.slot(loader, decision):
+                prediction = _cached_predict(decision.served_by, req.text, processed)
+                result, elapsed = await _within(decision, _timed(prediction))
+        except Overloaded:
+            if not path:
+                raise
+            break
+        admission.observe(loader, decision.served_by, elapsed)
+        decisions[decision.served_by] = decision
+        path.append({"model": decision.served_by, "sentiment": result["sentiment"], "confidence": result["confidence"],
+                     "model_version": result["model_version"], "threshold": None if last else cascade.threshold(i),
+                     "inference_time_ms": elapsed})
+        if cascade.accepts(i, result["confidence"], last):
+            break
+    if not path:
+        raise HTTPException(status_code=503, detail="No cascade tier has finished loading", headers={"Retry-After": "1"})
+
+    answer = path[-1]
+    cost = cascade.record(path)
+    decision = decisions[answer["model"]]
+    try:
+        async with admission.slot(loader, decision):
+            lime_words = await _explain_or_empty(answer["model"], req, decision)
+    except Overloaded:
+        lime_words = []
+    tier_index = cascade.tiers.index(answer["model"]) if answer["model"] in cascade.tiers else None
+    return _serialize(PredictResponse(
+        model=CASCADE_MODEL,
+        sentiment=answer["sentiment"],
+        confidence=answer["confidence"],
+        lime_words=lime_words,
+        inference_time_ms=cost["latency_ms"],
+        model_version=answer["model_version"],
+        cascade={"tier": answer["model"], "tier_index": tier_index, "path": path, **cost},
+        degradation=decision.info(),
+    ), CASCADE_MODEL)
+
+
+@app.post("/predict", response_model=PredictResponse)
+async def predict(req: PredictRequest, request: Request):
+    """
+    Single model prediction with LIME explanation ("auto" runs the confidence cascade).
+    Under load the explanation, then the model, is degraded; `degradation` says how.
+    """
+    if req.model == CASCADE_MODEL:
+        return await _predict_cascade(req, request)
+    model_name = req.model
+    await _require_model(model_name)
+    _check_explain_params(req)
+
+    decision = admission.decide(loader, model_name, req.explain_mode, _deadline_ms(request))
+    served = decision.served_by
+    async with admission.slot(loader, decision):
+        t0 = time.time()
+        result = await _within(decision, _cached_predict(served, req.text))
+        elapsed = (time.time() - t0) * 1000
+        t1 = time.time()
+        lime_words = await _explain_or_empty(served, req, decision)
+        admission.observe(loader, served, elapsed, (time.time() - t1) * 1000 if not decision.level else None)
+
+    response = _serialize(PredictResponse(
         model=model_name,
         sentiment=result["sentiment"],
         confidence=result["confidence"],
         lime_words=lime_words,
-        inference_time_ms=elapsed
-    )
+        inference_time_ms=elapsed,
+        model_version=result["model_version"],
+        degradation=decision.info(),
+    ), model_name)
+    response.headers["X-Degradation"] = decision.info()["level"]
+    return response
 
 
-@app.post("/predict/compare", response_model=CompareResponse)
-async def predict_compare(req: CompareRequest):
-    """Run all 4 models on the same input"""
-    results = {}
-    for model_name in loader.models:
-        t0 = time.time()
-        result = predict_with_model(loader, model_name, req.text)
-        elapsed = (time.time() - t0) * 1000
-        lime_words = []
+@app.post("/predict/batch", response_model=BatchPredictResponse)
+async def predict_batch(req: BatchPredictRequest):
+    """Vectorized prediction for many texts with one model (no LIME)"""
+    model_name = req.model
+    await _require_model(model_name)
+    if req.batch_size < 1:
+        raise HTTPException(status_code=400, detail="batch_size must be >= 1")
+
+    t0 = time.time()
+    processed = None
+    if loader.models[model_name]["type"] in ("sklearn", "lstm"):
+        processed = await executor.preprocess(req.texts)
+    results = await executor.predict_batch(loader, model_name, req.texts, req.batch_size, processed)
+    elapsed = time.time() - t0
+
+    return _serialize(BatchPredictResponse(
+        model=model_name,
+        results=results,
+        inference_time_ms=elapsed * 1000,
+        reviews_per_sec=len(req.texts) / elapsed if elapsed > 0 else 0.0,
+        model_version=results[0]["model_version"] if results else loader.versions.get(model_name),
+    ), model_name)
+
+
+async def _timed(coro) -> tuple:
+    t0 = time.perf_counter()
+    result = await coro
+    return result, (time.perf_counter() - t0) * 1000
+
+
+async def _wait_models(requested: list = None) -> tuple:
+    """Validate a model subset and give loading models one shared wait; returns (ready, pending)."""
+    names = list(dict.fromkeys(requested or loader.enabled))
+    unknown = [m for m in names if not loader.known(m)]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown models {unknown}. Choose from: {loader.enabled}")
+    ready_flags = await asyncio.gather(*(asyncio.to_thread(loader.wait_ready, m, MODEL_WAIT_MS / 1000) for m in names))
+    model_names = [m for m, ok in zip(names, ready_flags) if ok]
+    pending = [m for m, ok in zip(names, ready_flags) if not ok]
+    if not model_names:
+        raise HTTPException(status_code=503, detail="No model has finished loading", headers={"Retry-After": "1"})
+    return model_names, pending
+
+
+async def _shared_preprocess(text: str, model_names: list):
+    """Preprocess once for all models, only when one that needs it misses the result cache."""
+    for m in model_names:
+        if (loader.models[m]["type"] in ("sklearn", "lstm")
+                and await result_cache.aget(_predict_key(m, text), record=False) is None):
+            return (await executor.preprocess([text]))[0]
+    return None
+
+
+def _decide_all(model_names: list, explain_mode: str, deadline_ms) -> tuple:
+    """Admission decision per model; returns (decisions, shed model -> Overloaded)."""
+    decisions, shed = {}, {}
+    for name in model_names:
         try:
-            lime_words = get_lime_explanation(loader, model_name, req.text)
-        except:
-            pass
-        results[model_name] = {
-            **result,
-            "model": model_name,
-            "lime_words": lime_words,
-            "inference_time_ms": elapsed
+            decisions[name] = admission.decide(loader, name, explain_mode, deadline_ms)
+        except Overloaded as e:
+            shed[name] = e
+    return decisions, shed
+
+
+async def _hold_slots(decisions: dict, shed: dict, stack: AsyncExitStack):
+    """
+    One slot per serving model (models routed to the same fallback share it), taken in
+    sorted order so concurrent multi-model requests cannot wait on each other in a cycle.
+    A slot wanted while others are already held is waited for at most
+    ADMISSION_HOLD_WAIT_MS; models whose slot is shed move from decisions to shed.
+    """
+    by_served = {}
+    for name, decision in decisions.items():
+        by_served.setdefault(decision.served_by, []).append(name)
+    holding = False
+    for served in sorted(by_served):
+        names = by_served[served]
+        try:
+            await stack.enter_async_context(admission.slot(
+                loader, decisions[names[0]], admission.hold_wait_ms if holding else None))
+            holding = True
+        except Overloaded as e:
+            for name in names:
+                del decisions[name]
+                shed[name] = e
+
+
+async def _admit_all(model_names: list, explain_mode: str, deadline_ms, stack: AsyncExitStack) -> tuple:
+    """Admission decisions and slots for every model; returns (admitted decisions, shed model -> Overloaded)."""
+    decisions, shed = _decide_all(model_names, explain_mode, deadline_ms)
+    if decisions:
+        await _hold_slots(decisions, shed, stack)
+    if not decisions:
+        raise max(shed.values(), key=lambda e: e.retry_after)
+    return decisions, shed
+
+
+@app.post("/predict/compare", response_model=CompareResponse)
+async def predict_compare(req: CompareRequest, request: Request):
+    """
+    Run every model (or the requested subset) on the same input.
+    Preprocessing is shared, the models run concurrently, and explanations
+    share one deadline: any explainer still running when it expires returns
+    no words instead of holding up the response. Each model is admitted and
+    degraded on its own; shed models are left out and listed in `degradation`.
+    """
+    _check_explain_params(req)
+    t_start = time.perf_counter()
+    model_names, pending = await _wait_models(req.models)
+    async with AsyncExitStack() as stack:
+        decisions, shed = await _admit_all(model_names, req.explain_mode, _deadline_ms(request), stack)
+        model_names = list(decisions)
+        served = {name: decisions[name].served_by for name in model_names}
+        processed = await _shared_preprocess(req.text, list(set(served.values())))
+        preprocess_ms = (time.perf_counter() - t_start) * 1000
+
+        first = decisions[model_names[0]]   # every decision carries the same client deadline
+        deadline_ms = _explain_budget(req.lime_deadline_ms or COMPARE_EXPLAIN_DEADLINE_MS, first)
+        explain_tasks = {
+            name: asyncio.create_task(_timed(_cached_explain(
+                served[name], req.text, decisions[name].explain_mode, req.lime_samples, deadline_ms)))
+            for name in model_names
         }
-    return CompareResponse(results=results)
+        try:
+            predictions = await _within(first, asyncio.gather(
+                *(_timed(_cached_predict(served[name], req.text, processed)) for name in model_names)))
+            await asyncio.wait(explain_tasks.values(), timeout=_explain_budget(deadline_ms, first) / 1000)
+
+            results = {}
+            serial_ms = preprocess_ms
+            for name, (result, elapsed) in zip(model_names, predictions):
+                task = explain_tasks[name]
+                lime_words, explain_ms, timed_out = [], 0.0, not task.done()
+                if timed_out:
+                    explain_ms = deadline_ms
+                elif task.exception() is None:
+                    lime_words, explain_ms = task.result()
+                else:
+                    print(f"LIME failed for {name}: {type(task.exception()).__name__}: {task.exception()}")
+                    telemetry.record_error("explain", task.exception())
+                serial_ms += elapsed + explain_ms
+                results[name] = {
+                    **result,
+                    "model": name,
+                    "lime_words": lime_words,
+                    "inference_time_ms": elapsed,
+                    "explain_time_ms": explain_ms,
+                    "explain_timed_out": timed_out,
+                    "degradation": decisions[name].info(),
+                }
+                admission.observe(loader, served[name], elapsed,
+                                  explain_ms if not decisions[name].level and not timed_out else None)
+        finally:
+            # Explainers past the deadline, or all of them when the predictions themselves time out (504)
+            for task in explain_tasks.values():
+                task.cancel()
+
+    wall_ms = (time.perf_counter() - t_start) * 1000
+    degradation = {name: d.info()["level"] for name, d in decisions.items()}
+    degradation.update({name: "shed" for name in shed})
+    return _serialize(CompareResponse(results=results, pending_models=pending, degradation=degradation, timing={
+        "preprocess_ms": preprocess_ms,
+        "wall_ms": wall_ms,
+        "serial_estimate_ms": serial_ms,
+        "saved_ms": max(serial_ms - wall_ms, 0.0),
+    }), "all")
+
+
+# ── Streaming ─────────────────────────────────────────────────────────────────
+
+async def _prediction_events(text: str, decisions: dict, shed: dict, pending: list,
+                             lime_samples: int = None, deadline_ms: float = None):
+    """
+    Yield events as work finishes: "start", then per model a "prediction" as soon as
+    it is ready and its "explanation" after it, then "done". Explanations still running
+    at the deadline are cancelled and sent empty with explain_timed_out set. The admission
+    slots are taken here, inside the stream, so they are released however it ends;
+    shed models get an "error" event.
+    """
+    t_start = time.perf_counter()
+    yield {"event": "start", "models": list(decisions), "pending_models": pending}
+    async with AsyncExitStack() as stack:
+        await _hold_slots(decisions, shed, stack)
+        for name, e in shed.items():
+            yield {"event": "error", "model": name, "detail": str(e), "retry_after": e.retry_after}
+        model_names = list(decisions)
+        served = {name: decision.served_by for name, decision in decisions.items()}
+        if model_names:
+            deadline_ms = _explain_budget(deadline_ms, decisions[model_names[0]])
+        processed = await _shared_preprocess(text, list(set(served.values())))
+        preprocess_ms = (time.perf_counter() - t_start) * 1000
+
+        tasks = {}
+        for name in model_names:
+            tasks[asyncio.create_task(_timed(_cached_predict(served[name], text, processed)))] = ("prediction", name)
+            tasks[asyncio.create_task(_timed(_cached_explain(
+                served[name], text, decisions[name].explain_mode, lime_samples, deadline_ms)))] = ("explanation", name)
+        explain_deadline = time.perf_counter() + deadline_ms / 1000 if deadline_ms else None
+        predicted, failed, held = set(), set(), {}
+
+        def explanation_event(name, task, timed_out=False):
+            words, explain_ms = [], deadline_ms if timed_out else 0.0
+            if not timed_out:
+                if task.exception() is None:
+                    words, explain_ms = task.result()
+                else:
+                    print(f"LIME failed for {name}: {type(task.exception()).__name__}: {task.exception()}")
+                    telemetry.record_error("explain", task.exception())
+            return {"event": "explanation", "model": name, "lime_words": words,
+                    "explain_time_ms": explain_ms, "explain_timed_out": timed_out}
+
+        def explanation_ready(event) -> list:
+            """Explanations follow their prediction; hold one that finishes first."""
+            name = event["model"]
+            if name in failed:
+                return []
+            if name in predicted:
+                return [event]
+            held[name] = event
+            return []
+
+        try:
+            while tasks:
+                timeout = max(explain_deadline - time.perf_counter(), 0) if explain_deadline is not None else None
+                done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                events = []
+                if not done:
+                    # Explanation deadline passed: give up on the explainers, keep waiting for predictions
+                    explain_deadline = None
+                    for task, (kind, name) in list(tasks.items()):
+                        if kind == "explanation":
+                            task.cancel()
+                            del tasks[task]
+                            events += explanation_ready(explanation_event(name, task, timed_out=True))
+                for task in done:
+                    kind, name = tasks.pop(task)
+                    if kind == "explanation":
+                        events += explanation_ready(explanation_event(name, task))
+                    elif task.exception() is not None:
+                        failed.add(name)
+                        held.pop(name, None)
+                        telemetry.record_error("predict", task.exception())
+                        events.append({"event": "error", "model": name, "detail": str(task.exception())})
+                    else:
+                        result, elapsed = task.result()
+                        predicted.add(name)
+                        admission.observe(loader, served[name], elapsed)
+                        events.append({"event": "prediction", **result, "model": name, "inference_time_ms": elapsed,
+                                       "degradation": decisions[name].info()})
+                        if name in held:
+                            events.append(held.pop(name))
+                for event in events:
+                    yield event
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    yield {"event": "done", "timing": {"preprocess_ms": preprocess_ms,
+                                       "wall_ms": (time.perf_counter() - t_start) * 1000}}
+
+
+def _stream(events, request: Request) -> StreamingResponse:
+    """NDJSON by default; Server-Sent Events when the client accepts text/event-stream."""
+    sse = "text/event-stream" in request.headers.get("accept", "")
+
+    async def body():
+        async for event in events:
+            data = json.dumps(event, default=float)
+            yield f"event: {event['event']}\ndata: {data}\n\n" if sse else data + "\n"
+
+    return StreamingResponse(body(), media_type="text/event-stream" if sse else "application/x-ndjson",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.post("/predict/stream")
+async def predict_stream(req: PredictRequest, request: Request):
+    """/predict as an event stream: the prediction first, the explanation when it is ready"""
+    await _require_model(req.model)
+    _check_explain_params(req)
+    decision = admission.decide(loader, req.model, req.explain_mode, _deadline_ms(request))
+    events = _prediction_events(req.text, {req.model: decision}, {}, [], req.lime_samples, req.lime_deadline_ms)
+    return _stream(events, request)
+
+
+@app.post("/predict/compare/stream")
+async def predict_compare_stream(req: CompareRequest, request: Request):
+    """/predict/compare as an event stream: each model's prediction as soon as it is ready, explanations after"""
+    _check_explain_params(req)
+    model_names, pending = await _wait_models(req.models)
+    decisions, shed = _decide_all(model_names, req.explain_mode, _deadline_ms(request))
+    if not decisions:
+        raise max(shed.values(), key=lambda e: e.retry_after)
+    deadline_ms = req.lime_deadline_ms or COMPARE_EXPLAIN_DEADLINE_MS
+    events = _prediction_events(req.text, decisions, shed, pending, req.lime_samples, deadline_ms)
+    return _stream(events, request)
+
+
+# ── Live typing ───────────────────────────────────────────────────────────────
+
+# Quiet period after the last edit before the deep models and the explanations run
+LIVE_DEBOUNCE_MS = float(os.getenv("LIVE_DEBOUNCE_MS", 300))
+
+
+async def _live_settle(ws: WebSocket, session: LiveSession, seq, text: str, model_names: list, explain_mode: str):
+    """
+    Debounced part of a live update: deep-model predictions and every model's explanation,
+    admitted like /predict/compare (shed models get an "error" event).
+    """
+    await asyncio.sleep(LIVE_DEBOUNCE_MS / 1000)
+    processed = session.processed()
+    tasks = {}
+    try:
+        async with AsyncExitStack() as stack:
+            decisions, shed = _decide_all(model_names, explain_mode, None)
+            await _hold_slots(decisions, shed, stack)
+            for name, e in shed.items():
+                await ws.send_json({"event": "error", "seq": seq, "model": name, "detail": str(e),
+                                    "retry_after": e.retry_after})
+            for name, decision in decisions.items():
+                served = decision.served_by
+                if session.debounced(name):
+                    tasks[asyncio.create_task(_timed(_cached_predict(served, text, processed)))] = ("prediction", name)
+                tasks[asyncio.create_task(_timed(_cached_explain(
+                    served, text, decision.explain_mode, None, None)))] = ("explanation", name)
+            await _live_settle_events(ws, seq, tasks)
+        await ws.send_json({"event": "settled", "seq": seq})
+        telemetry.LIVE_UPDATES.inc(outcome="settled")
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def _live_settle_events(ws: WebSocket, seq, tasks: dict):
+    """Send each settle task's prediction / explanation event as it finishes."""
+    while tasks:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            kind, name = tasks.pop(task)
+            if task.exception() is not None:
+                telemetry.record_error("explain" if kind == "explanation" else "predict", task.exception())
+                await ws.send_json({"event": "error", "seq": seq, "model": name, "detail": str(task.exception())})
+            elif kind == "prediction":
+                result, elapsed = task.result()
+                await ws.send_json({"event": "prediction", "seq": seq, **result, "model": name,
+                                    "inference_time_ms": elapsed, "incremental": False})
+            else:
+                words, elapsed = task.result()
+                await ws.send_json({"event": "explanation", "seq": seq, "model": name,
+                                    "lime_words": words, "explain_time_ms": elapsed})
+
+
+@app.websocket("/ws/live")
+async def live_predict(ws: WebSocket):
+    """
+    As-you-type prediction. Send {"seq", "text", "models"?, "explain_mode"?} after each edit.
+    NB / LR answer at once from incrementally updated term counts; the deep models and the
+    explanations run once the text has been still for LIVE_DEBOUNCE_MS. Updates queued behind
+    a newer one are dropped, and a newer update cancels the previous one's pending work.
+    The debounced work goes through admission control; the per-keystroke scoring does not,
+    as a connection never has more than one update in flight.
+    """
+    await ws.accept()
+    session = LiveSession(loader)
+    inbox = asyncio.Queue()
+    model_names, explain_mode = None, "fast"
+
+    async def receive():
+        try:
+            while True:
+                inbox.put_nowait(await ws.receive_json())
+        except (WebSocketDisconnect, RuntimeError, ValueError):
+            inbox.put_nowait(None)
+
+    reader = asyncio.create_task(receive())
+    settle = None
+    try:
+        while True:
+            msg = await inbox.get()
+            dropped = 0
+            while msg is not None and not inbox.empty():   # only the newest text matters
+                msg = inbox.get_nowait()
+                dropped += 1
+            if msg is None:
+                break
+            if settle is not None:
+                settle.cancel()
+            if dropped:
+                telemetry.LIVE_UPDATES.inc(dropped, outcome="dropped")
+            if not isinstance(msg, dict):
+                await ws.send_json({"event": "error", "detail": "Expected a JSON object"})
+                continue
+            seq = msg.get("seq")
+
+            requested = msg.get("models") or model_names
+            unknown = [m for m in requested or [] if not loader.known(m)]
+            mode = msg.get("explain_mode", explain_mode)
+            if unknown or mode not in EXPLAIN_MODES:
+                detail = f"Unknown models {unknown}" if unknown else f"explain_mode must be one of {list(EXPLAIN_MODES)}"
+                await ws.send_json({"event": "error", "seq": seq, "detail": detail})
+                continue
+            model_names, explain_mode = requested, mode
+            wanted = model_names or list(loader.states)
+            names = [m for m in wanted if loader.is_ready(m)]
+
+            text = msg.get("text", "")
+            t0 = time.perf_counter()
+            update = await executor.run_in_thread(session.update, text, names)
+            update_ms = (time.perf_counter() - t0) * 1000
+            telemetry.LIVE_UPDATES.inc(outcome="applied")
+            await ws.send_json({"event": "update", "seq": seq, "dropped": dropped, "update_ms": update_ms,
+                                "pending_models": [m for m in wanted if m not in names],
+                                **{k: v for k, v in update.items() if k != "predictions"}})
+            for name, result in update["predictions"].items():
+                await ws.send_json({"event": "prediction", "seq": seq, **result, "model": name,
+                                    "inference_time_ms": update_ms, "incremental": True})
+            # Other non-deep models (no native scorer, demo stubs) are cheap enough to run on every edit
+            for name in names:
+                if name not in update["predictions"] and not session.debounced(name):
+                    result, elapsed = await _timed(_cached_predict(name, text, session.processed()))
+                    await ws.send_json({"event": "prediction", "seq": seq, **result, "model": name,
+                                        "inference_time_ms": elapsed, "incremental": False})
+            settle = asyncio.create_task(_live_settle(ws, session, seq, text, names, explain_mode))
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        reader.cancel()
+        if settle is not None:
+            settle.cancel()
+
+
+@app.get("/cascade/stats")
+async def get_cascade_stats():
+    """Which tier answered "auto" requests, per-tier latency and the savings against the last tier alone"""
+    return cascade.status()
+
+
+@app.post("/cascade/reload")
+async def reload_cascade():
+    """Re-read the cascade tiers / thresholds (e.g. after calibrate_cascade.py); resets the statistics"""
+    global cascade
+    try:
+        cascade = Cascade.from_env()
+    except (ValueError, KeyError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid cascade config: {e}")
+    return cascade.status()
+
+
+@app.post("/admin/models/{model_name}/reload")
+async def reload_model(model_name: str):
+    """
+    Load the model's artifact again, warm it up and swap it in without dropping requests;
+    in-flight requests finish on the old version. Only this server process is reloaded.
+    """
+    if not loader.known(model_name):
+        raise HTTPException(status_code=400, detail=f"Model '{model_name}' not found. Choose from: {loader.enabled}")
+    if loader.states[model_name]["state"] not in ("ready", "failed"):
+        raise HTTPException(status_code=409, detail=f"Model '{model_name}' has not been loaded yet")
+    try:
+        record = await asyncio.to_thread(reloader.reload, model_name, "admin", False)
+    except ReloadInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if record["outcome"] == "failed":
+        raise HTTPException(status_code=500, detail=record)
+    return record
+
+
+@app.get("/admin/models/reloads")
+async def get_reloads():
+    """Serving and on-disk versions, recent reloads with warm-up timings and whether old versions were freed"""
+    return reloader.status()
+
+
+@app.get("/admission/stats")
+async def get_admission_stats():
+    """Per-model slots, queue occupancy, latency averages and how often each degradation level was applied"""
+    return admission.stats()
+
+
+@app.get("/batching/stats")
+async def get_batching_stats():
+    """Queue depth and achieved batch sizes per micro-batched model"""
+    return {name: b.stats() for name, b in batchers.items()}
+
+
+@app.get("/executor/stats")
+async def get_executor_stats():
+    """Thread / process pool saturation and per-model concurrency"""
+    return executor.stats()
+
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """Result cache size and hit / miss rates"""
+    return result_cache.stats()
+
+
+@app.get("/metrics/prometheus", response_class=PlainTextResponse)
+async def get_prometheus_metrics():
+    """Stage latency histograms, fallback / error counters and in-flight gauges (Prometheus text format)"""
+    return PlainTextResponse(telemetry.render(), media_type="text/plain; version=0.0.4")
+
+
+def _require_profiler():
+    if not PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiler disabled; set PROFILER_ENABLED=1")
+
+
+@app.post("/debug/profile/start")
+async def start_profile(interval_ms: float = 5.0, duration_s: float = 30.0):
+    """Start sampling every thread's stack for up to duration_s"""
+    _require_profiler()
+    try:
+        telemetry.profiler.start(interval_ms, duration_s)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return telemetry.profiler.status()
+
+
+@app.post("/debug/profile/stop")
+async def stop_profile():
+    _require_profiler()
+    await asyncio.to_thread(telemetry.profiler.stop)
+    return telemetry.profiler.status()
+
+
+@app.get("/debug/profile", response_class=PlainTextResponse)
+async def get_profile(limit: int = 200):
+    """Folded stacks ("frame;frame;frame count") of the last profile, for flamegraph tools"""
+    _require_profiler()
+    return PlainTextResponse(telemetry.profiler.folded(limit))
+
+
+def _evaluation_report():
+    report = evaluation.store.report(loader.versions)
+    return report if report and report["models"] else None
 
 
 @app.get("/metrics")
 async def get_metrics():
-    """Pre-computed model metrics on full test set"""
+    """Model metrics from the latest evaluation artifact (reference numbers until one exists)"""
+    report = _evaluation_report()
+    if report:
+        return {art["label"]: art["metrics"] for art in report["models"].values()}
     return {
         "Naive Bayes": {
             "Accuracy": 0.872,
@@ -124,9 +936,42 @@ async def get_metrics():
     }
 
 
+@app.get("/metrics/details")
+async def get_metrics_details():
+    """Confusion matrices and ROC points per model, with the artifact versions they came from"""
+    report = _evaluation_report()
+    if not report:
+        raise HTTPException(status_code=404, detail="No evaluation results yet; set EVAL_DATA or POST /metrics/refresh")
+    return {
+        "key": report["key"],
+        "data_version": report["data_version"],
+        "models": {
+            art["label"]: {
+                "model": name, "version": art["version"], "rows": art["rows"], "computed_at": art["computed_at"],
+                "confusion_matrix": art["confusion_matrix"], "roc": art["roc"],
+            }
+            for name, art in report["models"].items()
+        },
+        "evaluation": evaluation.status(),
+    }
+
+
+@app.post("/metrics/refresh")
+async def refresh_metrics():
+    """Re-run the evaluation in the background for any model version without results"""
+    if not evaluation.schedule():
+        raise HTTPException(status_code=400, detail="EVAL_DATA is not set")
+    return evaluation.status()
+
+
 @app.get("/dataset/stats")
 async def get_dataset_stats():
     """EDA data — review length distribution, word frequencies, sample reviews"""
+    report = evaluation.store.report(loader.versions)
+    if report and report["dataset"]:
+        return {k: report["dataset"][k] for k in (
+            "length_distribution", "sentiment_distribution", "top_positive_words",
+            "top_negative_words", "sample_reviews")}
     import random
     rng = random.Random(42)
 
@@ -160,8 +1005,20 @@ async def get_dataset_stats():
 
 
 @app.get("/errors")
-async def get_errors(model: str = None, true_label: str = None, pred_label: str = None):
-    """Misclassification examples"""
+async def get_errors(model: str = None, true_label: str = None, pred_label: str = None, band: str = None,
+                     min_length: int = None, max_length: int = None, sort: str = "confidence_desc",
+                     limit: int = 50, cursor: str = None):
+    """Misclassified reviews, one page at a time; pass next_cursor back as cursor for the next page"""
+    limit = max(1, min(limit, 500))
+    if error_store.has_data():
+        try:
+            return await asyncio.to_thread(
+                error_store.query, model, true_label, pred_label, band, min_length, max_length, sort, limit, cursor,
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    # Reference examples until an evaluation run has filled the store
     errors = [
         {"id": 1, "model": "Naive Bayes", "review": "I can't say enough bad things about this film... just kidding, it was fantastic!", "true_label": "positive", "pred_label": "negative", "confidence": 0.91, "length": 78, "reason": "Sarcasm / Negation"},
         {"id": 2, "model": "Logistic Regression", "review": "The movie was not without its charm, but ultimately fails to deliver on its ambitious premise.", "true_label": "negative", "pred_label": "positive", "confidence": 0.82, "length": 90, "reason": "Complex negation"},
@@ -177,8 +1034,17 @@ async def get_errors(model: str = None, true_label: str = None, pred_label: str
         errors = [e for e in errors if e["true_label"] == true_label]
     if pred_label:
         errors = [e for e in errors if e["pred_label"] == pred_label]
+    errors.sort(key=lambda e: e["confidence"], reverse=sort != "confidence_asc")
+
+    return {"items": errors[:limit], "next_cursor": None}
+
 
-    return errors
+@app.get("/errors/summary")
+async def get_errors_summary():
+    """Error counts per model and error rate by review length from the latest evaluation"""
+    if not error_store.has_data():
+        raise HTTPException(status_code=404, detail="No evaluation results yet; set EVAL_DATA or run evaluate.py")
+    return await asyncio.to_thread(error_store.summary)
 
 
 @app.get("/training-history")
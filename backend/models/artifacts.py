@@ -0,0 +1,290 @@
+"""
+Array artifact format for the sklearn pipelines and the Keras tokenizer.
+
+Each artifact is a directory of .npy arrays plus a manifest.json holding the
+format version, preprocessing method, estimator settings and a sha256 per
+array. Arrays are opened with mmap_mode="r", so loading is near-instant and
+the pages are shared by every worker process mapping the same files.
+"""
+import hashlib
+import json
+import time
+import numpy as np
+from pathlib import Path
+
+FORMAT_VERSION = 1
+MANIFEST = "manifest.json"
+
+_SUPPORTED_CLASSIFIERS = ("LogisticRegression", "MultinomialNB")
+# Classifier settings that only matter while fitting and need not be JSON-safe
+_FIT_ONLY_PARAMS = ("class_weight", "n_jobs", "random_state", "verbose", "warm_start")
+# Max |predict_proba| difference accepted by the export round-trip check
+ROUND_TRIP_TOLERANCE = 1e-9
+
+
+def sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _write_arrays(out_dir: Path, arrays: dict) -> dict:
+    entries = {}
+    for name, arr in arrays.items():
+        path = out_dir / f"{name}.npy"
+        np.save(path, np.ascontiguousarray(arr))
+        entries[name] = {"file": path.name, "dtype": str(arr.dtype), "shape": list(arr.shape), "sha256": sha256(path)}
+    return entries
+
+
+def write_manifest(out_dir: Path, manifest: dict, entries: str) -> dict:
+    """
+    Stamp the format version and creation time, checksum the per-file sha256s
+    under manifest[entries] and write manifest.json. Shared with the ONNX
+    artifacts so both manifest formats stay in step.
+    """
+    manifest["format_version"] = FORMAT_VERSION
+    manifest["created"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    files = manifest[entries]
+    manifest["checksum"] = hashlib.sha256("".join(files[k]["sha256"] for k in sorted(files)).encode()).hexdigest()
+    with open(Path(out_dir) / MANIFEST, "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def _write_manifest(out_dir: Path, manifest: dict, arrays: dict) -> dict:
+    manifest["arrays"] = _write_arrays(out_dir, arrays)
+    return write_manifest(out_dir, manifest, "arrays")
+
+
+def read_manifest(art_dir) -> dict:
+    with open(Path(art_dir) / MANIFEST) as f:
+        manifest = json.load(f)
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"unsupported artifact format_version {manifest.get('format_version')}")
+    return manifest
+
+
+def _open_arrays(art_dir: Path, manifest: dict, verify: bool) -> dict:
+    arrays = {}
+    for name, entry in manifest["arrays"].items():
+        path = art_dir / entry["file"]
+        if verify and sha256(path) != entry["sha256"]:
+            raise ValueError(f"checksum mismatch for {path}")
+        arrays[name] = np.load(path, mmap_mode="r")
+    return arrays
+
+
+def _terms_array(index: dict, start: int = 0) -> np.ndarray:
+    """Terms ordered by their integer index, as a fixed-width unicode array."""
+    terms = [None] * len(index)
+    for term, i in index.items():
+        terms[i - start] = term
+    return np.array(terms, dtype=str)
+
+
+# ── Scikit-learn TF-IDF → linear classifier ───────────────────────────────────
+
+def _vectorizer_params(vectorizer) -> dict:
+    params = {}
+    for key, value in vectorizer.get_params().items():
+        if key == "vocabulary":
+            continue
+        if key == "dtype":
+            value = np.dtype(value).name
+        elif callable(value):
+            raise ValueError(f"cannot export vectorizer with callable {key}")
+        elif isinstance(value, (tuple, set, frozenset)):
+            value = list(value)
+        params[key] = value
+    return params
+
+
+def _classifier_params(clf) -> dict:
+    """get_params() minus the fit-only settings; multi_class decides how predict_proba normalises."""
+    params = {}
+    for key, value in clf.get_params().items():
+        if key in _FIT_ONLY_PARAMS:
+            continue
+        if isinstance(value, np.ndarray):
+            value = value.tolist()
+        elif isinstance(value, np.generic):
+            value = value.item()
+        try:
+            json.dumps(value)
+        except TypeError:
+            raise ValueError(f"cannot export classifier with {key}={value!r}") from None
+        params[key] = value
+    return params
+
+
+def _round_trip_docs(terms: list, n_docs: int = 16, n_terms: int = 12) -> list:
+    """Synthetic documents spread over the vocabulary, plus one with no known terms."""
+    step = max(1, len(terms) // (n_docs * n_terms))
+    docs = [" ".join(terms[i * n_terms * step:(i + 1) * n_terms * step:step]) for i in range(n_docs)]
+    return [d for d in docs if d] + [""]
+
+
+def _check_round_trip(pipeline, out_dir: Path):
+    reloaded, _ = load_sklearn_pipeline(out_dir, verify=True)
+    vectorizer = pipeline.steps[0][1]
+    docs = _round_trip_docs(sorted(vectorizer.vocabulary_, key=vectorizer.vocabulary_.get))
+    diff = float(np.max(np.abs(pipeline.predict_proba(docs) - reloaded.predict_proba(docs))))
+    if diff > ROUND_TRIP_TOLERANCE:
+        raise ValueError(f"exported pipeline does not reproduce predict_proba (max difference {diff:.3g})")
+
+
+def export_sklearn_pipeline(pipeline, out_dir, preprocessing: str = "lemmatize") -> dict:
+    """
+    Write a TfidfVectorizer → LogisticRegression / MultinomialNB pipeline as
+    arrays, then reload it and check predict_proba matches the original.
+    """
+    if len(pipeline.steps) != 2:
+        raise ValueError("only two-step vectorizer → classifier pipelines can be exported")
+    (vec_name, vectorizer), (clf_name, clf) = pipeline.steps
+    clf_type = type(clf).__name__
+    if type(vectorizer).__name__ != "TfidfVectorizer" or clf_type not in _SUPPORTED_CLASSIFIERS:
+        raise ValueError(f"unsupported pipeline: {type(vectorizer).__name__} → {clf_type}")
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    arrays = {"terms": _terms_array(vectorizer.vocabulary_), "classes": clf.classes_}
+    if vectorizer.use_idf:
+        arrays["idf"] = vectorizer.idf_
+    if clf_type == "LogisticRegression":
+        arrays.update(coef=clf.coef_, intercept=clf.intercept_)
+    else:
+        arrays.update(feature_log_prob=clf.feature_log_prob_, class_log_prior=clf.class_log_prior_)
+
+    manifest = {
+        "kind": "sklearn_tfidf_linear",
+        "preprocessing": preprocessing,
+        "steps": [vec_name, clf_name],
+        "classifier": clf_type,
+        "vectorizer_params": _vectorizer_params(vectorizer),
+        "classifier_params": _classifier_params(clf),
+    }
+    manifest = _write_manifest(out_dir, manifest, arrays)
+    _check_round_trip(pipeline, out_dir)
+    return manifest
+
+
+def load_sklearn_pipeline(art_dir, verify: bool = False):
+    """Rebuild a predict-only Pipeline around memory-mapped arrays. Returns (pipeline, manifest)."""
+    from sklearn.pipeline import Pipeline
+    from scipy.sparse import csr_matrix
+    from sklearn.feature_extraction.text import TfidfTransformer, TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.naive_bayes import MultinomialNB
+
+    art_dir = Path(art_dir)
+    manifest = read_manifest(art_dir)
+    arrays = _open_arrays(art_dir, manifest, verify)
+
+    params = dict(manifest["vectorizer_params"])
+    params["dtype"] = np.dtype(params["dtype"]).type
+    params["ngram_range"] = tuple(params["ngram_range"])
+    if isinstance(params.get("stop_words"), list):
+        params["stop_words"] = frozenset(params["stop_words"])
+    vectorizer = TfidfVectorizer(**params)
+    vectorizer.vocabulary_ = {term: i for i, term in enumerate(arrays["terms"].tolist())}
+    if vectorizer.use_idf:
+        vectorizer.idf_ = arrays["idf"]
+    else:
+        # The idf_ setter is what normally creates the inner transformer; without idf, fit one on an empty matrix
+        vectorizer._tfidf = TfidfTransformer(norm=vectorizer.norm, use_idf=False, smooth_idf=vectorizer.smooth_idf,
+                                             sublinear_tf=vectorizer.sublinear_tf).fit(
+            csr_matrix((1, len(arrays["terms"])), dtype=vectorizer.dtype))
+
+    n_features = len(arrays["terms"])
+    # Artifacts written before classifier_params was recorded fall back to the defaults
+    clf_params = manifest.get("classifier_params", {})
+    if manifest["classifier"] == "LogisticRegression":
+        clf = LogisticRegression(**clf_params)
+        clf.coef_, clf.intercept_ = arrays["coef"], arrays["intercept"]
+    else:
+        clf = MultinomialNB(**clf_params)
+        clf.feature_log_prob_, clf.class_log_prior_ = arrays["feature_log_prob"], arrays["class_log_prior"]
+    clf.classes_ = arrays["classes"]
+    clf.n_features_in_ = n_features
+
+    vec_name, clf_name = manifest["steps"]
+    return Pipeline([(vec_name, vectorizer), (clf_name, clf)]), manifest
+
+
+# ── Keras tokenizer ───────────────────────────────────────────────────────────
+
+_TOKENIZER_CONFIG = ("num_words", "filters", "lower", "split", "char_level", "oov_token")
+
+
+def export_keras_tokenizer(tokenizer, out_dir, preprocessing: str = "lemmatize") -> dict:
+    """Write the tokenizer's word index (1-based) as a term array plus its config."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    manifest = {
+        "kind": "keras_tokenizer",
+        "preprocessing": preprocessing,
+        "config": {k: getattr(tokenizer, k) for k in _TOKENIZER_CONFIG},
+    }
+    return _write_manifest(out_dir, manifest, {"terms": _terms_array(tokenizer.word_index, start=1)})
+
+
+class SequenceTokenizer:
+    """
+    texts_to_sequences of a fitted Keras Tokenizer without TensorFlow, for the
+    ONNX Runtime LSTM: same filtering, lowercasing, num_words cut-off and OOV handling.
+    """
+
+    def __init__(self, num_words=None, filters='!"#$%&()*+,-./:;<=>?@[\\]^_`{|}~\t\n', lower=True,
+                 split=" ", char_level=False, oov_token=None):
+        self.num_words = num_words
+        self.filters = filters
+        self.lower = lower
+        self.split = split
+        self.char_level = char_level
+        self.oov_token = oov_token
+        self.word_index = {}
+        self.index_word = {}
+        self._table = str.maketrans({c: split for c in filters})
+
+    def _words(self, text: str) -> list:
+        if self.lower:
+            text = text.lower()
+        if self.char_level:
+            return list(text)
+        return [w for w in text.translate(self._table).split(self.split) if w]
+
+    def texts_to_sequences(self, texts) -> list:
+        oov = self.word_index.get(self.oov_token) if self.oov_token is not None else None
+        seqs = []
+        for text in texts:
+            seq = []
+            for w in self._words(text):
+                i = self.word_index.get(w)
+                if i is not None and not (self.num_words and i >= self.num_words):
+                    seq.append(i)
+                elif oov is not None:
+                    seq.append(oov)
+            seqs.append(seq)
+        return seqs
+
+
+def load_keras_tokenizer(art_dir, verify: bool = False):
+    """
+    Rebuild a Keras Tokenizer usable for texts_to_sequences (a SequenceTokenizer
+    when TensorFlow is not installed). Returns (tokenizer, manifest).
+    """
+    try:
+        from tensorflow.keras.preprocessing.text import Tokenizer
+    except ImportError:
+        Tokenizer = SequenceTokenizer
+
+    art_dir = Path(art_dir)
+    manifest = read_manifest(art_dir)
+    terms = _open_arrays(art_dir, manifest, verify)["terms"].tolist()
+    tokenizer = Tokenizer(**manifest["config"])
+    tokenizer.word_index = {term: i for i, term in enumerate(terms, start=1)}
+    tokenizer.index_word = {i: term for term, i in tokenizer.word_index.items()}
+    return tokenizer, manifest
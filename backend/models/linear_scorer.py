@@ -0,0 +1,170 @@
+"""
+Native scorer for TF-IDF → LogisticRegression / MultinomialNB pipelines.
+
+Both classifiers are linear in the TF-IDF features, so for a binary problem
+the positive-class log-odds of a document is
+
+    bias + Σ tf(t) · idf(t) · w(t) / ‖tf · idf‖
+
+with w the LR coefficient or the NB log-probability difference. The scorer
+is extracted from a loaded pipeline once: the vocabulary lookup, idf·w and
+idf per term, and the vectorizer's tokenization / n-gram / stop-word / tf
+and norm settings. It then scores preprocessed texts (or token lists)
+without building a CSR matrix or going through predict_proba's validation.
+Vectorizer options it does not reimplement (custom analyzers, preprocessors,
+tokenizers, accent stripping) fall back to the vectorizer's own analyzer, so
+the terms are always the ones transform() would produce.
+"""
+import re
+from collections import Counter
+from itertools import chain
+import numpy as np
+
+# Max |p_scorer - p_pipeline| accepted by the load-time self-check
+TOLERANCE = 1e-6
+
+
+class UnsupportedPipeline(ValueError):
+    pass
+
+
+class LinearScorer:
+    def __init__(self, vectorizer, weights: np.ndarray, bias: float, scale: float = 1.0):
+        self.vocabulary = vectorizer.vocabulary_
+        idf = getattr(vectorizer, "idf_", None) if vectorizer.use_idf else None
+        self.idf = np.ones(len(weights)) if idf is None else np.asarray(idf, dtype=np.float64)
+        self.weighted = self.idf * np.asarray(weights, dtype=np.float64)
+        self.bias = float(bias)
+        self.scale = scale                     # 2 for binary multinomial LR (softmax over ±z)
+        self.binary = vectorizer.binary
+        self.sublinear_tf = vectorizer.sublinear_tf
+        self.norm = vectorizer.norm
+        if self.norm not in ("l2", "l1", None):
+            raise UnsupportedPipeline(f"norm={self.norm!r}")
+
+        self.min_n, self.max_n = vectorizer.ngram_range
+        self.stop_words = vectorizer.get_stop_words()
+        native = (vectorizer.analyzer == "word" and vectorizer.preprocessor is None
+                  and vectorizer.tokenizer is None and vectorizer.strip_accents is None)
+        if native:
+            self.lowercase = vectorizer.lowercase
+            self._findall = re.compile(vectorizer.token_pattern).findall
+            self._analyze = None
+        else:
+            self._analyze = vectorizer.build_analyzer()
+
+    @classmethod
+    def from_pipeline(cls, pipeline) -> "LinearScorer":
+        """Extract a scorer from a fitted two-step TfidfVectorizer → LR / MultinomialNB pipeline."""
+        if len(pipeline.steps) != 2:
+            raise UnsupportedPipeline("needs a two-step vectorizer → classifier pipeline")
+        vectorizer, clf = pipeline.steps[0][1], pipeline.steps[1][1]
+        if type(vectorizer).__name__ != "TfidfVectorizer":
+            raise UnsupportedPipeline(f"vectorizer {type(vectorizer).__name__}")
+        if len(clf.classes_) != 2:
+            raise UnsupportedPipeline(f"{len(clf.classes_)} classes")
+        clf_type = type(clf).__name__
+        if clf_type == "LogisticRegression":
+            scale = 2.0 if getattr(clf, "multi_class", "auto") == "multinomial" else 1.0
+            return cls(vectorizer, clf.coef_[0], clf.intercept_[0], scale)
+        if clf_type == "MultinomialNB":
+            flp, prior = clf.feature_log_prob_, clf.class_log_prior_
+            return cls(vectorizer, flp[1] - flp[0], prior[1] - prior[0])
+        raise UnsupportedPipeline(f"classifier {clf_type}")
+
+    # ── Terms ─────────────────────────────────────────────────────────────────
+
+    @property
+    def incremental(self) -> bool:
+        """Whether tokens() / ngrams() reproduce the analyzer, so term counts can be updated in place."""
+        return self._analyze is None
+
+    def tokens(self, doc) -> list:
+        """Word tokens of one document after lowercasing and stop-word removal (native analyzer only)."""
+        if isinstance(doc, str):
+            tokens = self._findall(doc.lower() if self.lowercase else doc)
+        else:
+            tokens = [t.lower() for t in doc] if self.lowercase else list(doc)
+        if self.stop_words is not None:
+            tokens = [t for t in tokens if t not in self.stop_words]
+        return tokens
+
+    def ngrams(self, tokens: list, start: int = 0, stop: int = None) -> list:
+        """
+        Terms of a token list whose n-gram overlaps positions [start, stop) — with
+        start == stop, the n-grams spanning that gap. Defaults to every term.
+        """
+        stop = len(tokens) if stop is None else stop
+        terms = []
+        for n in range(self.min_n, self.max_n + 1):
+            lo, hi = max(start - n + 1, 0), min(stop, len(tokens) - n + 1)
+            if n == 1:
+                terms.extend(tokens[lo:hi])
+            elif hi > lo:
+                terms.extend(map(" ".join, zip(*(tokens[lo + k:hi + k] for k in range(n)))))
+        return terms
+
+    def terms(self, doc) -> list:
+        """Terms of one document exactly as the vectorizer's analyzer yields them."""
+        if self._analyze is not None:
+            return self._analyze(doc if isinstance(doc, str) else " ".join(doc))
+        tokens = self.tokens(doc)
+        return tokens if self.max_n == 1 else self.ngrams(tokens)
+
+    def features(self, doc) -> dict:
+        """Sparse term counts of one document: {feature index: count}."""
+        return Counter(j for j in map(self.vocabulary.get, self.terms(doc)) if j is not None)
+
+    # ── Scores ────────────────────────────────────────────────────────────────
+
+    def log_odds(self, features: list) -> np.ndarray:
+        """Positive-class log-odds per document, computed for the whole batch at once."""
+        n_docs = len(features)
+        lengths = [len(c) for c in features]
+        total = sum(lengths)
+        idx = np.fromiter(chain.from_iterable(c.keys() for c in features), dtype=np.intp, count=total)
+        tf = np.fromiter(chain.from_iterable(c.values() for c in features), dtype=np.float64, count=total)
+        doc = np.repeat(np.arange(n_docs), lengths)
+        if self.binary:
+            tf[:] = 1.0
+        elif self.sublinear_tf:
+            tf = np.log(tf) + 1.0
+        # bincount returns int64 when no document has a known term
+        dot = np.bincount(doc, weights=tf * self.weighted[idx], minlength=n_docs).astype(np.float64, copy=False)
+        if self.norm is not None:
+            values = tf * self.idf[idx]
+            if self.norm == "l2":
+                norm = np.sqrt(np.bincount(doc, weights=values * values, minlength=n_docs))
+            else:
+                norm = np.bincount(doc, weights=np.abs(values), minlength=n_docs)
+            dot = np.divide(dot, norm, out=dot, where=norm > 0)
+        return dot + self.bias
+
+    def predict_proba(self, docs: list, features: list = None) -> np.ndarray:
+        """[p(classes_[0]), p(classes_[1])] per document, like pipeline.predict_proba."""
+        features = features if features is not None else [self.features(d) for d in docs]
+        positive = 1.0 / (1.0 + np.exp(-self.log_odds(features) * self.scale))
+        return np.column_stack([1.0 - positive, positive])
+
+
+def extract_scorer(pipeline, check_docs: list = None):
+    """
+    LinearScorer for the pipeline, or None if it is not a supported linear pipeline
+    or disagrees with predict_proba by more than TOLERANCE on the check documents.
+    """
+    try:
+        scorer = LinearScorer.from_pipeline(pipeline)
+    except (UnsupportedPipeline, AttributeError) as e:
+        print(f"  linear scorer not used: {e}")
+        return None
+    if check_docs is None:
+        # A few documents built from the vocabulary (unigrams, so n-grams form across them) plus an empty one
+        vocab = list(scorer.vocabulary)
+        step = max(len(vocab) // 97, 1)
+        sample = [t for t in vocab[::step] if " " not in t] or vocab[:50]
+        check_docs = [" ".join(sample[i::3]) for i in range(3)] + [" ".join(sample[:5] * 3), ""]
+    diff = np.abs(scorer.predict_proba(check_docs) - pipeline.predict_proba(check_docs)).max()
+    if not diff <= TOLERANCE:
+        print(f"  linear scorer not used: differs from predict_proba by {diff:.3g}")
+        return None
+    return scorer
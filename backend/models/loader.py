@@ -1,69 +1,332 @@
 """
 Model Loader — loads all 4 trained models on startup.
 Falls back to lightweight demo models if saved files are not found.
+
+MODEL_LOAD_MODE picks how: "eager" (default) loads everything before the app
+serves, "background" loads every model in parallel threads, "lazy" loads a
+model on first use. ENABLED_MODELS (comma-separated) limits which models are
+registered at all, so TensorFlow / transformers are only imported when the
+LSTM or DistilBERT is enabled. The LSTM and DistilBERT run on ONNX Runtime
+instead of TensorFlow when an export exists (see models/onnx_runtime.py).
+
+reload_model loads a model again next to the serving version and swaps the
+new entry in with one dict assignment; requests that already picked up the
+old entry finish on it (see services/reload.py for warm-up and draining).
 """
+import hashlib
 import os
 import pickle
+import threading
+import time
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+from models.artifacts import MANIFEST, load_sklearn_pipeline, load_keras_tokenizer
+from models.linear_scorer import extract_scorer
+from models.onnx_runtime import OnnxModel, inference_backend, onnx_precision, select_graph
+from services import telemetry
+
 SAVED_DIR = Path(__file__).parent / "saved"
 
+ALL_MODELS = ["naive_bayes", "logistic_regression", "rnn_lstm", "distilbert"]
+# Type each model is configured as, whether or not its real artifact (or a demo stub) is loaded yet
+MODEL_TYPES = {"naive_bayes": "sklearn", "logistic_regression": "sklearn", "rnn_lstm": "lstm", "distilbert": "bert"}
+
+# Files each model can be loaded from; a change to any of them is a new version on disk
+ARTIFACT_PATHS = {
+    "naive_bayes": ["naive_bayes", "naive_bayes_pipeline.pkl"],
+    "logistic_regression": ["logistic_regression", "logistic_regression_pipeline.pkl"],
+    "rnn_lstm": ["rnn_lstm.h5", "tokenizer.pkl", "tokenizer", "rnn_lstm_onnx"],
+    "distilbert": ["distilbert", "distilbert_onnx"],
+}
+
+# Re-hash array artifacts against their manifest checksums on load
+VERIFY_ARTIFACTS = os.getenv("ARTIFACT_VERIFY", "0") == "1"
+LOAD_MODES = ("eager", "background", "lazy")
+# Score NB / LR with the native linear scorer extracted at load time instead of the sklearn pipeline
+LINEAR_SCORER = os.getenv("LINEAR_SCORER", "1") == "1"
+
+
+def artifact_version(*paths) -> str:
+    """Cheap fingerprint of model artifacts: name, size and mtime of every file."""
+    h = hashlib.sha1()
+    for path in paths:
+        path = Path(path)
+        files = sorted(path.rglob("*")) if path.is_dir() else [path]
+        for f in files:
+            if f.is_file():
+                st = f.stat()
+                h.update(f"{f.relative_to(path.parent)}:{st.st_size}:{st.st_mtime_ns};".encode())
+    return h.hexdigest()[:12]
+
+
+class ReloadInProgress(RuntimeError):
+    """Raised by ModelLoader.reload_model(wait=False) while another reload runs."""
+
+
+class ModelEntry(dict):
+    """Registry entry; unlike a plain dict it can be weakly referenced, to tell when a replaced one is freed."""
+
+
+def sklearn_entry(pipeline, preprocessing: str = None) -> dict:
+    """Registry entry for a TF-IDF → NB/LR pipeline, with its native scorer when enabled and supported."""
+    entry = {"type": "sklearn", "pipeline": pipeline}
+    if preprocessing:
+        entry["preprocessing"] = preprocessing
+    if LINEAR_SCORER:
+        entry["scorer"] = extract_scorer(pipeline)
+    return entry
+
+
 class ModelLoader:
-    def __init__(self):
+    def __init__(self, enabled: list = None):
         self.models = {}
+        self.versions = {}             # model name -> artifact fingerprint ("demo" for stubs)
         self.tokenizer = None          # Keras tokenizer for LSTM
         self.bert_tokenizer = None     # HuggingFace tokenizer
         self.tfidf = None              # Shared TF-IDF vectorizer
+        self._listeners = []
+
+        env_enabled = os.getenv("ENABLED_MODELS")
+        if enabled is None and env_enabled:
+            enabled = [m.strip() for m in env_enabled.split(",") if m.strip()]
+        self.enabled = [m for m in ALL_MODELS if enabled is None or m in enabled]
+        self.mode = "eager"
+        self.load_started = False      # set by load_all; lets a preloading launcher skip the startup load
+        # Per-model load state: pending → loading → ready | failed (failed models serve a demo stub)
+        self.states = {name: {"state": "pending", "load_time_ms": None, "error": None} for name in self.enabled}
+        self._ready = {name: threading.Event() for name in self.enabled}
+        self._state_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._staging = threading.local()   # reload_model collects entries here instead of publishing them
+        self.disk_versions = {}             # model name -> artifact_version of its files when last loaded
+        self._pool = None
+
+    def add_listener(self, fn):
+        """Register fn(model_name, version), called whenever a model is (re)loaded."""
+        self._listeners.append(fn)
+
+    def _set_model(self, name: str, entry: dict, version: str = "demo"):
+        if not isinstance(entry, ModelEntry):
+            entry = ModelEntry(entry, version=version)
+        staged = getattr(self._staging, "entries", None)
+        if staged is not None:
+            staged[name] = entry
+            return
+        self.models[name] = entry
+        self.versions[name] = version
+        if "tokenizer" in entry:
+            if entry["type"] == "lstm":
+                self.tokenizer = entry["tokenizer"]
+            elif entry["type"] == "bert":
+                self.bert_tokenizer = entry["tokenizer"]
+        for fn in self._listeners:
+            fn(name, version)
 
-    def load_all(self):
+    def load_all(self, mode: str = None):
         """Try to load saved models; fall back to demo stubs if not found."""
-        self._load_sklearn_models()
-        self._load_lstm()
-        self._load_distilbert()
-        print(f"Loaded models: {list(self.models.keys())}")
+        self.mode = mode or os.getenv("MODEL_LOAD_MODE", "eager")
+        if self.mode not in LOAD_MODES:
+            raise ValueError(f"MODEL_LOAD_MODE must be one of {LOAD_MODES}, got '{self.mode}'")
+        self.load_started = True
+
+        if self.mode == "eager":
+            for name in self.enabled:
+                self.load_model(name)
+            print(f"Loaded models: {list(self.models.keys())}")
+        elif self.mode == "background":
+            self._pool = ThreadPoolExecutor(max_workers=len(self.enabled) or 1, thread_name_prefix="model-load")
+            for name in self.enabled:
+                self._pool.submit(self.load_model, name)
+            print(f"Loading models in background: {self.enabled}")
+        else:
+            print(f"Models will load on first use: {self.enabled}")
+
+    # ── Load state ────────────────────────────────────────────────────────────
+
+    def known(self, name: str) -> bool:
+        return name in self.states
+
+    def is_ready(self, name: str) -> bool:
+        return name in self._ready and self._ready[name].is_set()
+
+    def load_model(self, name: str):
+        """Load one model (once), recording state and load time."""
+        with self._state_lock:
+            if self.states[name]["state"] != "pending":
+                return
+            self.states[name]["state"] = "loading"
+        t0 = time.perf_counter()
+        self.disk_versions[name] = self.disk_version(name)
+        try:
+            self._loaders()[name]()
+            self.states[name]["state"] = "ready"
+        except Exception as e:
+            print(f"  {name} load failed ({type(e).__name__}: {e}); using demo stub")
+            telemetry.record_error("model_load", e)
+            self._set_model(name, {"type": "demo", "label": name, "reason": "load_failed"})
+            self.states[name].update(state="failed", error=str(e))
+        self.states[name]["load_time_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        self._ready[name].set()
+
+    def wait_ready(self, name: str, timeout: float = None) -> bool:
+        """Block until `name` is servable; in lazy mode this triggers the load."""
+        if self.is_ready(name):
+            return True
+        if self.mode == "lazy" and self.states[name]["state"] == "pending":
+            threading.Thread(target=self.load_model, args=(name,), daemon=True).start()
+        return self._ready[name].wait(timeout)
+
+    def disk_version(self, name: str) -> str:
+        return artifact_version(*(SAVED_DIR / p for p in ARTIFACT_PATHS[name]))
+
+    def changed_on_disk(self) -> list:
+        """Loaded models whose artifact files changed since they were loaded."""
+        return [name for name, state in self.states.items()
+                if state["state"] in ("ready", "failed") and self.disk_version(name) != self.disk_versions.get(name)]
+
+    def stage_model(self, name: str) -> dict:
+        """Load `name` from disk into a new entry without publishing it."""
+        self._staging.entries = {}
+        try:
+            self._loaders()[name]()
+            return self._staging.entries[name]
+        finally:
+            self._staging.entries = None
+
+    def reload_model(self, name: str, warmup=None, wait: bool = True) -> dict:
+        """
+        Load `name` again while the current version keeps serving, run warmup(name, entry)
+        on the new entry, then swap it in. One reload at a time; with wait=False a reload
+        already in progress raises ReloadInProgress, and a model that was never loaded raises
+        ValueError. Returns the old and new entries ("swapped" is False when the artifacts
+        on disk are the version already serving).
+        """
+        if not self._reload_lock.acquire(blocking=wait):
+            raise ReloadInProgress("another model reload is in progress")
+        try:
+            if self.states[name]["state"] not in ("ready", "failed"):
+                raise ValueError(f"'{name}' has not been loaded yet ({self.states[name]['state']})")
+            old = self.models.get(name)
+            disk_version = self.disk_version(name)
+            t0 = time.perf_counter()
+            entry = self.stage_model(name)
+            info = {"old": old, "new": entry, "load_ms": (time.perf_counter() - t0) * 1000, "warmup_ms": None,
+                    "swapped": False}
+            if entry["type"] == "demo" and old is not None and old["type"] != "demo":
+                raise FileNotFoundError(f"no loadable artifact for '{name}'; keeping version {old['version']}")
+            if old is None or entry["version"] != old["version"] or self.states[name]["state"] == "failed":
+                if warmup is not None:
+                    info["warmup_ms"] = warmup(name, entry)
+                self._set_model(name, entry, entry["version"])
+                self.states[name].update(state="ready", error=None, load_time_ms=round(info["load_ms"], 1))
+                info["swapped"] = True
+            self.disk_versions[name] = disk_version
+            return info
+        finally:
+            self._reload_lock.release()
+
+    def status(self) -> dict:
+        return {
+            name: {**state, "type": self.models[name]["type"] if name in self.models else None,
+                   "runtime": self._runtime(name),
+                   "version": self.versions.get(name)}
+            for name, state in self.states.items()
+        }
+
+    def _runtime(self, name: str):
+        entry = self.models.get(name)
+        if entry is None or entry["type"] == "demo":
+            return None
+        if entry["type"] == "sklearn":
+            return "linear_scorer" if entry.get("scorer") is not None else "sklearn"
+        return entry.get("runtime")
+
+    def _loaders(self) -> dict:
+        return {
+            "naive_bayes": self._load_naive_bayes,
+            "logistic_regression": self._load_logistic_regression,
+            "rnn_lstm": self._load_lstm,
+            "distilbert": self._load_distilbert,
+        }
 
     # ── Scikit-learn ──────────────────────────────────────────────────────────
 
-    def _load_sklearn_models(self):
-        nb_path = SAVED_DIR / "naive_bayes_pipeline.pkl"
-        lr_path = SAVED_DIR / "logistic_regression_pipeline.pkl"
+    def _load_naive_bayes(self):
+        self._load_sklearn("naive_bayes", "Naive Bayes")
 
-        if nb_path.exists():
-            with open(nb_path, "rb") as f:
-                self.models["naive_bayes"] = {"type": "sklearn", "pipeline": pickle.load(f)}
-            print(" Naive Bayes loaded from file")
-        else:
-            self.models["naive_bayes"] = {"type": "demo", "label": "naive_bayes"}
-            print("  Naive Bayes: using demo stub (no saved model found)")
+    def _load_logistic_regression(self):
+        self._load_sklearn("logistic_regression", "Logistic Regression")
+
+    def _load_sklearn(self, name: str, label: str):
+        """Prefer the memory-mapped array artifact (saved/<name>/), then the pickle."""
+        art_dir = SAVED_DIR / name
+        pkl_path = SAVED_DIR / f"{name}_pipeline.pkl"
 
-        if lr_path.exists():
-            with open(lr_path, "rb") as f:
-                self.models["logistic_regression"] = {"type": "sklearn", "pipeline": pickle.load(f)}
-            print(" Logistic Regression loaded from file")
+        if (art_dir / MANIFEST).exists():
+            pipeline, manifest = load_sklearn_pipeline(art_dir, verify=VERIFY_ARTIFACTS)
+            self._set_model(name, sklearn_entry(pipeline, manifest["preprocessing"]), manifest["checksum"][:12])
+            print(f" {label} loaded from arrays")
+        elif pkl_path.exists():
+            with open(pkl_path, "rb") as f:
+                self._set_model(name, sklearn_entry(pickle.load(f)), artifact_version(pkl_path))
+            print(f" {label} loaded from file")
         else:
-            self.models["logistic_regression"] = {"type": "demo", "label": "logistic_regression"}
-            print("  Logistic Regression: using demo stub")
+            self._set_model(name, {"type": "demo", "label": name})
+            print(f"  {label}: using demo stub (no saved model found)")
+
+    # ── ONNX Runtime ──────────────────────────────────────────────────────────
+
+    def _load_onnx(self, name: str):
+        """(OnnxModel, graph path) for saved/<name>_onnx/, or None to fall back to TensorFlow."""
+        backend = inference_backend()
+        art_dir = SAVED_DIR / f"{name}_onnx"
+        if backend == "tf":
+            return None
+        if not (art_dir / MANIFEST).exists():
+            if backend == "onnx":
+                raise FileNotFoundError(f"INFERENCE_BACKEND=onnx but there is no export in {art_dir}")
+            return None
+        try:
+            path, _ = select_graph(art_dir)
+            return OnnxModel(path), path
+        except (ImportError, FileNotFoundError, ValueError) as e:
+            if backend == "onnx":
+                raise
+            print(f"  {name}: ONNX export not used ({type(e).__name__}: {e}); falling back to TensorFlow")
+            return None
 
     # ── LSTM ──────────────────────────────────────────────────────────────────
 
     def _load_lstm(self):
         model_path = SAVED_DIR / "rnn_lstm.h5"
         tok_path   = SAVED_DIR / "tokenizer.pkl"
+        tok_dir    = SAVED_DIR / "tokenizer"
 
-        if model_path.exists() and tok_path.exists():
-            try:
-                import tensorflow as tf
-                lstm_model = tf.keras.models.load_model(str(model_path))
+        has_tokenizer = (tok_dir / MANIFEST).exists() or tok_path.exists()
+        onnx = self._load_onnx("rnn_lstm") if has_tokenizer else None
+        if has_tokenizer and (onnx or model_path.exists()):
+            if (tok_dir / MANIFEST).exists():
+                tokenizer, _ = load_keras_tokenizer(tok_dir, verify=VERIFY_ARTIFACTS)
+                tok_path = tok_dir
+            else:
                 with open(tok_path, "rb") as f:
-                    self.tokenizer = pickle.load(f)
-                self.models["rnn_lstm"] = {"type": "lstm", "model": lstm_model}
-                print(" RNN (LSTM) loaded from file")
-            except Exception as e:
-                print(f"  LSTM load failed ({e}); using demo stub")
-                self.models["rnn_lstm"] = {"type": "demo", "label": "rnn_lstm"}
+                    tokenizer = pickle.load(f)
+            if onnx:
+                model, graph_path = onnx
+                entry = {"type": "lstm", "runtime": "onnx", "model": model, "tokenizer": tokenizer,
+                         "precision": onnx_precision()}
+                self._set_model("rnn_lstm", entry, artifact_version(graph_path, tok_path))
+                print(f" RNN (LSTM) loaded from ONNX ({entry['precision']})")
+                return
+            import tensorflow as tf
+            lstm_model = tf.keras.models.load_model(str(model_path))
+            self._set_model("rnn_lstm", {"type": "lstm", "runtime": "tf", "model": lstm_model, "tokenizer": tokenizer},
+                            artifact_version(model_path, tok_path))
+            print(" RNN (LSTM) loaded from file")
         else:
-            self.models["rnn_lstm"] = {"type": "demo", "label": "rnn_lstm"}
+            self._set_model("rnn_lstm", {"type": "demo", "label": "rnn_lstm"})
             print("  RNN (LSTM): using demo stub (no saved model found)")
 
     # ── DistilBERT ────────────────────────────────────────────────────────────
@@ -72,15 +335,21 @@ class ModelLoader:
         bert_path = SAVED_DIR / "distilbert"
 
         if bert_path.exists():
-            try:
-                from transformers import DistilBertTokenizer, TFDistilBertForSequenceClassification
-                self.bert_tokenizer = DistilBertTokenizer.from_pretrained(str(bert_path))
-                bert_model = TFDistilBertForSequenceClassification.from_pretrained(str(bert_path))
-                self.models["distilbert"] = {"type": "bert", "model": bert_model}
-                print(" DistilBERT loaded from file")
-            except Exception as e:
-                print(f"  DistilBERT load failed ({e}); using demo stub")
-                self.models["distilbert"] = {"type": "demo", "label": "distilbert"}
+            from transformers import DistilBertTokenizer
+            onnx = self._load_onnx("distilbert")
+            tokenizer = DistilBertTokenizer.from_pretrained(str(bert_path))
+            if onnx:
+                model, graph_path = onnx
+                entry = {"type": "bert", "runtime": "onnx", "model": model, "tokenizer": tokenizer,
+                         "precision": onnx_precision()}
+                self._set_model("distilbert", entry, artifact_version(graph_path, bert_path))
+                print(f" DistilBERT loaded from ONNX ({entry['precision']})")
+                return
+            from transformers import TFDistilBertForSequenceClassification
+            bert_model = TFDistilBertForSequenceClassification.from_pretrained(str(bert_path))
+            self._set_model("distilbert", {"type": "bert", "runtime": "tf", "model": bert_model,
+                                           "tokenizer": tokenizer}, artifact_version(bert_path))
+            print(" DistilBERT loaded from file")
         else:
-            self.models["distilbert"] = {"type": "demo", "label": "distilbert"}
+            self._set_model("distilbert", {"type": "demo", "label": "distilbert"})
             print("⚠️  DistilBERT: using demo stub (no saved model found)")
@@ -0,0 +1,182 @@
+"""
+ONNX Runtime backend for the LSTM and DistilBERT.
+
+save_models.py converts the Keras / TF models with tf2onnx into an artifact
+directory (saved/rnn_lstm_onnx/, saved/distilbert_onnx/) holding model.onnx,
+optionally a dynamically int8-quantized model.int8.onnx, and a manifest.json
+with the opset, input names, a sha256 per file and the parity check against
+the TF outputs. ModelLoader serves from it when present, so neither
+TensorFlow nor the TF weights are needed at runtime.
+
+INFERENCE_BACKEND picks the runtime: "auto" (default) uses ONNX when the
+artifact and onnxruntime are available, "onnx" requires it, "tf" ignores it.
+ONNX_PRECISION ("fp32" default, or "int8") picks the graph; a graph whose
+recorded parity check failed is not served.
+"""
+import os
+import numpy as np
+from pathlib import Path
+
+from models.artifacts import read_manifest, sha256, write_manifest
+
+BACKENDS = ("auto", "onnx", "tf")
+PRECISIONS = ("fp32", "int8")
+FILES = {"fp32": "model.onnx", "int8": "model.int8.onnx"}
+
+LSTM_MAXLEN = 200
+BERT_MAX_LENGTH = 128
+
+# Parity thresholds: max |p_tf - p_onnx| over the sample set, per precision
+PARITY_TOLERANCE = {"fp32": 1e-4, "int8": 0.05}
+
+_NP_TYPES = {
+    "tensor(float)": np.float32, "tensor(double)": np.float64,
+    "tensor(int32)": np.int32, "tensor(int64)": np.int64,
+}
+
+
+def inference_backend() -> str:
+    backend = os.getenv("INFERENCE_BACKEND", "auto")
+    if backend not in BACKENDS:
+        raise ValueError(f"INFERENCE_BACKEND must be one of {BACKENDS}, got '{backend}'")
+    return backend
+
+
+def onnx_precision() -> str:
+    precision = os.getenv("ONNX_PRECISION", "fp32")
+    if precision not in PRECISIONS:
+        raise ValueError(f"ONNX_PRECISION must be one of {PRECISIONS}, got '{precision}'")
+    return precision
+
+
+def pad_post(seqs: list, maxlen: int = LSTM_MAXLEN) -> np.ndarray:
+    """Keras pad_sequences(padding='post', truncating='post') without importing TensorFlow."""
+    padded = np.zeros((len(seqs), maxlen), dtype=np.int32)
+    for i, seq in enumerate(seqs):
+        seq = seq[:maxlen]
+        padded[i, :len(seq)] = seq
+    return padded
+
+
+def softmax(logits: np.ndarray) -> np.ndarray:
+    z = logits - logits.max(axis=-1, keepdims=True)
+    e = np.exp(z)
+    return e / e.sum(axis=-1, keepdims=True)
+
+
+class OnnxModel:
+    """An ONNX Runtime session fed by input name, casting arrays to the dtypes the graph declares."""
+
+    def __init__(self, path, threads: int = None):
+        import onnxruntime as ort
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        # Follow the per-worker thread budget serve.py sets; 0 lets ORT use every core
+        threads = threads if threads is not None else int(os.getenv("ORT_NUM_THREADS") or os.getenv("OMP_NUM_THREADS") or 0)
+        opts.intra_op_num_threads = threads
+        opts.inter_op_num_threads = 1
+        self.path = Path(path)
+        self.session = ort.InferenceSession(str(path), opts, providers=["CPUExecutionProvider"])
+        self.inputs = {i.name: _NP_TYPES.get(i.type, np.float32) for i in self.session.get_inputs()}
+
+    def run(self, *arrays, **named) -> np.ndarray:
+        """First output for positional (in graph input order) or named inputs; unknown names are ignored."""
+        feeds = dict(zip(self.inputs, arrays))
+        feeds.update({k: v for k, v in named.items() if k in self.inputs})
+        return self.session.run(None, {k: np.asarray(v, dtype=self.inputs[k]) for k, v in feeds.items()})[0]
+
+
+# ── Artifact ──────────────────────────────────────────────────────────────────
+
+def select_graph(art_dir, precision: str = None) -> tuple:
+    """(path, checksum) of the graph to serve, or raise if it is missing or failed its parity check."""
+    precision = precision or onnx_precision()
+    manifest = read_manifest(art_dir)
+    entry = manifest["files"].get(precision)
+    if entry is None:
+        raise FileNotFoundError(f"{art_dir} has no {precision} graph (exported: {sorted(manifest['files'])})")
+    parity = manifest.get("parity", {}).get(precision)
+    if parity is not None and not parity["passed"]:
+        raise ValueError(f"{precision} graph in {art_dir} failed its parity check "
+                         f"(max abs diff {parity['max_abs_diff']:.4g} > {parity['tolerance']})")
+    return Path(art_dir) / entry["file"], entry["sha256"][:12]
+
+
+def parity_report(reference: np.ndarray, candidate: np.ndarray, tolerance: float) -> dict:
+    """Compare positive-class probabilities of two backends on the same samples."""
+    reference, candidate = np.asarray(reference, dtype=np.float64), np.asarray(candidate, dtype=np.float64)
+    diff = np.abs(reference - candidate)
+    return {
+        "samples": int(len(reference)),
+        "max_abs_diff": float(diff.max()) if len(diff) else 0.0,
+        "mean_abs_diff": float(diff.mean()) if len(diff) else 0.0,
+        "label_agreement": float(np.mean((reference > 0.5) == (candidate > 0.5))) if len(diff) else 1.0,
+        "tolerance": tolerance,
+        "passed": bool(len(diff) == 0 or diff.max() <= tolerance),
+    }
+
+
+def _quantize_int8(src: Path, dst: Path):
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    quantize_dynamic(str(src), str(dst), weight_type=QuantType.QInt8)
+
+
+def _write_artifact(out_dir: Path, source: str, opset: int, quantize: bool, parity_fn) -> dict:
+    """Quantize if asked, run the parity check per graph, then write the manifest."""
+    if quantize:
+        _quantize_int8(out_dir / FILES["fp32"], out_dir / FILES["int8"])
+    files, parity = {}, {}
+    for precision, name in FILES.items():
+        path = out_dir / name
+        if not path.exists() or (precision == "int8" and not quantize):
+            continue
+        files[precision] = {"file": name, "bytes": path.stat().st_size, "sha256": sha256(path)}
+        if parity_fn is not None:
+            parity[precision] = parity_fn(OnnxModel(path), PARITY_TOLERANCE[precision])
+    manifest = {"source": source, "opset": opset, "files": files, "parity": parity}
+    return write_manifest(out_dir, manifest, "files")
+
+
+# ── Export (needs tensorflow + tf2onnx) ───────────────────────────────────────
+
+def export_lstm(model, tokenizer, out_dir, sample_texts: list = None, quantize: bool = False,
+                opset: int = 13) -> dict:
+    """Convert the Keras LSTM; the parity check runs both backends on the preprocessed sample texts."""
+    import tensorflow as tf
+    import tf2onnx
+    from services.preprocess import preprocess_batch
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    spec = [tf.TensorSpec((None, LSTM_MAXLEN), model.inputs[0].dtype, name="input_ids")]
+    tf2onnx.convert.from_keras(model, input_signature=spec, opset=opset, output_path=str(out_dir / FILES["fp32"]))
+
+    parity_fn = None
+    if sample_texts:
+        padded = pad_post(tokenizer.texts_to_sequences(preprocess_batch(sample_texts)))
+        reference = model.predict(padded, verbose=0)[:, 0]
+        parity_fn = lambda onnx_model, tol: parity_report(reference, onnx_model.run(padded)[:, 0], tol)
+    return _write_artifact(out_dir, "rnn_lstm.h5", opset, quantize, parity_fn)
+
+
+def export_distilbert(model, tokenizer, out_dir, sample_texts: list = None, quantize: bool = False,
+                      opset: int = 13) -> dict:
+    """Convert TFDistilBertForSequenceClassification with dynamic batch and sequence axes."""
+    import tensorflow as tf
+    import tf2onnx
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    spec = [tf.TensorSpec((None, None), tf.int32, name="input_ids"),
+            tf.TensorSpec((None, None), tf.int32, name="attention_mask")]
+    tf2onnx.convert.from_keras(model, input_signature=spec, opset=opset, output_path=str(out_dir / FILES["fp32"]))
+
+    parity_fn = None
+    if sample_texts:
+        enc = tokenizer(list(sample_texts), truncation=True, max_length=BERT_MAX_LENGTH, padding=True,
+                        return_tensors="np")
+        feeds = {"input_ids": enc["input_ids"], "attention_mask": enc["attention_mask"]}
+        logits = model(**{k: tf.constant(v, dtype=tf.int32) for k, v in feeds.items()}).logits.numpy()
+        reference = softmax(logits)[:, 1]
+        parity_fn = lambda onnx_model, tol: parity_report(reference, softmax(onnx_model.run(**feeds))[:, 1], tol)
+    return _write_artifact(out_dir, "distilbert", opset, quantize, parity_fn)
@@ -1,14 +1,22 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import List, Dict, Any, Optional
 
 
 class PredictRequest(BaseModel):
     text: str
     model: str = "logistic_regression"
+    explain_mode: str = "fast"               # "fast" | "lime" | "exact" | "heuristic" (keywords only)
+    lime_samples: Optional[int] = None       # perturbation budget (default 5000; LSTM 512, DistilBERT 128;
+                                             # at most EXPLAIN_MAX_SAMPLES, 10000)
+    lime_deadline_ms: Optional[float] = None # stop scoring perturbations after this
 
 
 class CompareRequest(BaseModel):
     text: str
+    models: Optional[List[str]] = None       # subset to run (default: every enabled model)
+    explain_mode: str = "fast"
+    lime_samples: Optional[int] = None
+    lime_deadline_ms: Optional[float] = None
 
 
 class LimeWord(BaseModel):
@@ -17,12 +25,41 @@ class LimeWord(BaseModel):
 
 
 class PredictResponse(BaseModel):
+    model_config = ConfigDict(protected_namespaces=())  # allow the model_version field
+
     model: str
     sentiment: str           # "positive" | "negative"
     confidence: float        # 0.0 – 1.0
     lime_words: List[LimeWord] = []
     inference_time_ms: float = 0.0
+    model_version: Optional[str] = None  # artifact version that answered; changes on a hot reload
+    cascade: Optional[Dict[str, Any]] = None  # "auto" model: answering tier, escalation path, savings
+    degradation: Optional[Dict[str, Any]] = None  # admission ladder level applied, model actually served
 
 
 class CompareResponse(BaseModel):
     results: Dict[str, Any]
+    timing: Dict[str, float] = {}  # preprocess / wall-clock / serial-estimate / saved ms
+    pending_models: List[str] = []  # models still loading when the request arrived
+    degradation: Dict[str, str] = {}  # ladder level per model ("shed" ones have no result)
+
+
+class BatchPredictRequest(BaseModel):
+    texts: List[str]
+    model: str = "logistic_regression"
+    batch_size: int = 32
+
+
+class BatchPredictItem(BaseModel):
+    sentiment: str
+    confidence: float
+
+
+class BatchPredictResponse(BaseModel):
+    model_config = ConfigDict(protected_namespaces=())
+
+    model: str
+    results: List[BatchPredictItem]
+    inference_time_ms: float = 0.0
+    reviews_per_sec: float = 0.0
+    model_version: Optional[str] = None
@@ -0,0 +1,130 @@
+"""
+Multi-worker launcher: load the models once in a parent process, then fork
+uvicorn workers that share them copy-on-write.
+
+Usage (from backend/):
+    python serve.py --workers 4 --port 8000
+    python serve.py --workers 4 --preload sklearn   # deep models load per worker
+
+Each worker gets cores // workers TF intra-op threads (and 1 inter-op thread)
+so the workers don't oversubscribe the CPU. Workers that die are restarted.
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+
+
+def parse_args():
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Preload-then-fork multi-worker server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=cpus)
+    parser.add_argument("--intra-op-threads", type=int, default=None,
+                        help="TF/BLAS threads per worker (default: cores // workers)")
+    parser.add_argument("--inter-op-threads", type=int, default=1)
+    parser.add_argument("--preload", choices=["all", "sklearn", "none"], default="all",
+                        help="models loaded in the parent before forking; 'sklearn' keeps "
+                             "TensorFlow out of the parent, at the cost of per-worker TF weights")
+    args = parser.parse_args()
+    if args.intra_op_threads is None:
+        args.intra_op_threads = max(cpus // max(args.workers, 1), 1)
+    return args
+
+
+def configure_threads(intra: int, inter: int):
+    """Must run before TensorFlow / numpy BLAS are imported."""
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "TF_NUM_INTRAOP_THREADS"):
+        os.environ[var] = str(intra)
+    os.environ["TF_NUM_INTEROP_THREADS"] = str(inter)
+    # The executor's own pools are per worker as well
+    os.environ.setdefault("EXEC_THREAD_WORKERS", str(max(intra * 2, 4)))
+    os.environ.setdefault("EXEC_PROCESS_WORKERS", "1")
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app, sock: socket.socket):
+    import uvicorn
+    config = uvicorn.Config(app, log_level="warning")
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def main():
+    args = parse_args()
+    configure_threads(args.intra_op_threads, args.inter_op_threads)
+
+    import main as app_module
+    loader = app_module.loader
+    if args.preload == "all":
+        loader.load_all(mode="eager")
+    elif args.preload == "sklearn":
+        # TensorFlow stays out of the parent; workers load the deep models lazily
+        loader.load_all(mode="lazy")
+        for name in ("naive_bayes", "logistic_regression"):
+            if loader.known(name):
+                loader.load_model(name)
+
+    # Move everything allocated so far out of the GC's reach so collections in
+    # the workers don't write to (and so un-share) the preloaded pages
+    gc.collect()
+    gc.freeze()
+
+    sock = bind_socket(args.host, args.port)
+    print(f"Serving on {args.host}:{args.port} with {args.workers} workers "
+          f"({args.intra_op_threads} intra-op threads each, preload={args.preload})")
+
+    children = {}
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            try:
+                run_worker(app_module.app, sock)
+            finally:
+                os._exit(0)
+        children[pid] = True
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    for _ in range(args.workers):
+        spawn()
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        children.pop(pid, None)
+        if not stopping:
+            print(f"Worker {pid} exited with status {status}; restarting")
+            spawn()
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""
+Admission control and graceful degradation for /predict and /predict/compare.
+
+Every request holds a slot on the model it is served by: at most `limit` run
+at once and at most `queue` wait, per model (ADMISSION_LIMIT_<MODEL> /
+ADMISSION_QUEUE_<MODEL>; the limit defaults to the executor's in-flight limit
+for the model, so occupancy reflects the queue the work actually waits in). The model's occupancy, (running + waiting) over
+(limit + queue), picks a rung of the degradation ladder:
+
+    none → drop_lime → heuristic_explainer → route_to_sklearn → shed
+
+drop_lime swaps LIME for the sampling-free exact attribution,
+heuristic_explainer skips the model for the explanation altogether,
+route_to_sklearn serves LSTM / DistilBERT requests with the fallback sklearn
+model and shed answers 429 with Retry-After. A backed-up explainer pool
+alone can push a request as far as heuristic_explainer.
+
+A client deadline (X-Request-Deadline-Ms, the time budget left in ms) moves
+the request down the ladder when the estimated queue wait plus service time
+would not fit, bounds the explanation and the wait for a slot.
+"""
+import asyncio
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+
+from models.loader import MODEL_TYPES
+from services import telemetry
+from services.executor import DEFAULT_MODEL_LIMITS
+
+LEVELS = ("none", "drop_lime", "heuristic_explainer", "route_to_sklearn", "shed")
+NONE, DROP_LIME, HEURISTIC, ROUTE, SHED = range(len(LEVELS))
+
+# Occupancy at which each rung after "none" starts; override with ADMISSION_THRESHOLDS
+DEFAULT_THRESHOLDS = (0.5, 0.7, 0.85, 1.0)
+
+HEAVY_TYPES = ("lstm", "bert")
+
+DEADLINE_HEADER = "X-Request-Deadline-Ms"
+EXPLAIN_QUEUE_PER_WORKER = 4    # explain jobs queued per pool worker that count as a full explainer queue
+LATENCY_EWMA = 0.1
+
+
+class Overloaded(Exception):
+    """Request shed; maps to 429 with Retry-After."""
+
+    def __init__(self, model_name: str, reason: str, retry_after: int):
+        super().__init__(f"Model '{model_name}' is overloaded ({reason}); retry in {retry_after}s")
+        self.model_name = model_name
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Decision:
+    """What an admitted request runs: the serving model, the explain mode and the rung it came from."""
+
+    def __init__(self, model_name: str, served_by: str, level: int, explain_mode: str, pressure: float,
+                 deadline: float = None):
+        self.model_name = model_name
+        self.served_by = served_by
+        self.level = level
+        self.explain_mode = explain_mode
+        self.pressure = pressure
+        self.deadline = deadline    # absolute time.perf_counter() value, or None
+
+    def remaining_ms(self):
+        return None if self.deadline is None else max((self.deadline - time.perf_counter()) * 1000, 0.0)
+
+    def info(self) -> dict:
+        return {"level": LEVELS[self.level], "served_by": self.served_by, "explain_mode": self.explain_mode,
+                "pressure": round(self.pressure, 3)}
+
+
+class _Gate:
+    def __init__(self, limit: int, queue: int):
+        self.limit = limit
+        self.queue = queue
+        self.semaphore = asyncio.Semaphore(limit)
+        self.running = 0
+        self.waiting = 0
+        self.predict_ms = None      # moving averages used for deadline estimates and Retry-After
+        self.explain_ms = None
+
+    def occupancy(self) -> float:
+        return (self.running + self.waiting) / (self.limit + self.queue)
+
+    def wait_estimate_ms(self) -> float:
+        """Time until a newly queued request would start, from the average request time."""
+        per_request = (self.predict_ms or 0.0) + (self.explain_ms or 0.0)
+        return (self.waiting + max(self.running - self.limit + 1, 0)) * per_request / self.limit
+
+
+def _abandon(gate, acquire: asyncio.Future):
+    """Give up on a pending acquire; a permit it already took goes back to the gate."""
+    if not acquire.done():
+        acquire.cancel()     # Semaphore.acquire hands back a permit it was woken with but had not returned
+    elif not acquire.cancelled() and acquire.exception() is None:
+        gate.semaphore.release()
+
+
+class AdmissionController:
+    def __init__(self, executor=None, thresholds=DEFAULT_THRESHOLDS, fallback_model: str = "logistic_regression",
+                 enabled: bool = True, hold_wait_ms: float = 1000.0):
+        if len(thresholds) != len(LEVELS) - 1:
+            raise ValueError(f"need {len(LEVELS) - 1} admission thresholds, got {len(thresholds)}")
+        self.executor = executor
+        self.thresholds = tuple(float(t) for t in thresholds)
+        self.fallback_model = fallback_model
+        self.enabled = enabled
+        self.hold_wait_ms = hold_wait_ms   # longest wait for a slot while the request already holds others
+        self._gates = {}
+
+    @classmethod
+    def from_env(cls, executor=None) -> "AdmissionController":
+        env = os.getenv("ADMISSION_THRESHOLDS")
+        return cls(
+            executor,
+            thresholds=tuple(float(t) for t in env.split(",")) if env else DEFAULT_THRESHOLDS,
+            fallback_model=os.getenv("ADMISSION_FALLBACK_MODEL", "logistic_regression"),
+            enabled=os.getenv("ADMISSION_CONTROL", "1") == "1",
+            hold_wait_ms=float(os.getenv("ADMISSION_HOLD_WAIT_MS", 1000)),
+        )
+
+    def _gate(self, loader, model_name: str) -> _Gate:
+        if model_name not in self._gates:
+            mtype = MODEL_TYPES.get(model_name) or loader.models[model_name]["type"]
+            env = os.getenv(f"ADMISSION_LIMIT_{model_name.upper()}")
+            if env:
+                limit = int(env)
+            elif self.executor is not None:
+                limit = self.executor.model_limit(model_name, mtype)
+            else:
+                limit = DEFAULT_MODEL_LIMITS.get(mtype, 4)
+            queue = int(os.getenv(f"ADMISSION_QUEUE_{model_name.upper()}") or 2 * limit)
+            self._gates[model_name] = _Gate(limit, queue)
+        return self._gates[model_name]
+
+    def _level(self, pressure: float) -> int:
+        return sum(pressure >= t for t in self.thresholds)
+
+    def explain_pressure(self) -> float:
+        if self.executor is None:
+            return 0.0
+        stats = self.executor.stats()
+        # The reference LIME queues on the process pool, the vectorized explainers on the thread pool
+        pools = [pool for pool in (stats["process_pool"], stats["thread_pool"]) if pool is not None]
+        return max(pool["queued"] / max(pool["workers"] * EXPLAIN_QUEUE_PER_WORKER, 1) for pool in pools)
+
+    def _retry_after(self, gate: _Gate) -> int:
+        return max(1, math.ceil(gate.wait_estimate_ms() / 1000))
+
+    def _shed(self, loader, model_name: str, reason: str):
+        telemetry.DEGRADATIONS.inc(model=model_name, level="shed")
+        raise Overloaded(model_name, reason, self._retry_after(self._gate(loader, model_name)))
+
+    # ── Decisions ─────────────────────────────────────────────────────────────
+
+    def decide(self, loader, model_name: str, explain_mode: str, deadline_ms: float = None) -> Decision:
+        """Pick the ladder rung for one request; raises Overloaded when it is shed."""
+        deadline = time.perf_counter() + deadline_ms / 1000 if deadline_ms is not None else None
+        if not self.enabled:
+            return Decision(model_name, model_name, NONE, explain_mode, 0.0, deadline)
+        gate = self._gate(loader, model_name)
+        pressure = gate.occupancy()
+        level = max(self._level(pressure), min(self._level(self.explain_pressure()), HEURISTIC))
+
+        if deadline_ms is not None:
+            wait_ms = gate.wait_estimate_ms()
+            if wait_ms + (gate.predict_ms or 0.0) + (gate.explain_ms or 0.0) > deadline_ms:
+                # No time for a model-based explanation; without one, maybe no time for this model either
+                level = max(level, HEURISTIC)
+                if wait_ms + (gate.predict_ms or 0.0) > deadline_ms:
+                    level = max(level, ROUTE)
+
+        served_by = model_name
+        if level >= ROUTE:
+            fallback = self.fallback_model
+            if (loader.models[model_name]["type"] in HEAVY_TYPES and fallback != model_name
+                    and loader.is_ready(fallback)):
+                fallback_gate = self._gate(loader, fallback)
+                pressure = fallback_gate.occupancy()
+                if self._level(pressure) >= SHED:
+                    self._shed(loader, model_name, "fallback model saturated")
+                if deadline_ms is not None and (fallback_gate.wait_estimate_ms()
+                                                + (fallback_gate.predict_ms or 0.0)) > deadline_ms:
+                    self._shed(loader, model_name, "deadline cannot be met")
+                served_by, level = fallback, ROUTE
+            elif level >= SHED:
+                self._shed(loader, model_name, "queue full")
+            elif deadline_ms is not None and gate.wait_estimate_ms() + (gate.predict_ms or 0.0) > deadline_ms:
+                self._shed(loader, model_name, "deadline cannot be met")
+            else:
+                # Nothing cheaper to route to: a heuristic explanation is as far as it goes before shedding
+                level = HEURISTIC
+
+        if level >= HEURISTIC:
+            explain_mode = "heuristic"
+        elif level == DROP_LIME and explain_mode in ("fast", "lime") and loader.models[served_by]["type"] == "sklearn":
+            explain_mode = "exact"
+        elif level == DROP_LIME:
+            level = NONE    # nothing cheaper short of the heuristic: already sampling-free, or a deep model
+        telemetry.DEGRADATIONS.inc(model=model_name, level=LEVELS[level])
+        return Decision(model_name, served_by, level, explain_mode, pressure, deadline)
+
+    # ── Slots ─────────────────────────────────────────────────────────────────
+
+    @asynccontextmanager
+    async def slot(self, loader, decision: Decision, max_wait_ms: float = None):
+        """
+        Hold a running slot on the serving model; sheds when its queue is full, or when
+        the deadline (or max_wait_ms, for a request already holding other slots) passes while queued.
+        """
+        if not self.enabled:
+            yield
+            return
+        gate = self._gate(loader, decision.served_by)
+        if gate.running >= gate.limit and gate.waiting >= gate.queue:
+            self._shed(loader, decision.served_by, "queue full")
+        if not gate.semaphore.locked():
+            # Free slot: taken without suspending, so it counts as running before the next request is checked
+            await gate.semaphore.acquire()
+        else:
+            await self._queue(loader, decision, gate, max_wait_ms)
+        gate.running += 1
+        try:
+            yield
+        finally:
+            gate.running -= 1
+            gate.semaphore.release()
+
+    async def _queue(self, loader, decision: Decision, gate: _Gate, max_wait_ms: float = None):
+        remaining = decision.remaining_ms()
+        waits = [w for w in (remaining, max_wait_ms) if w is not None]
+        # asyncio.wait rather than wait_for: on 3.11 wait_for can take the permit and still time out
+        acquire = asyncio.ensure_future(gate.semaphore.acquire())
+        gate.waiting += 1
+        try:
+            done, _ = await asyncio.wait({acquire}, timeout=min(waits) / 1000 if waits else None)
+        except BaseException:
+            _abandon(gate, acquire)
+            raise
+        finally:
+            gate.waiting -= 1
+        if not done:
+            _abandon(gate, acquire)
+            bounded_by_deadline = remaining is not None and (max_wait_ms is None or remaining <= max_wait_ms)
+            self._shed(loader, decision.served_by,
+                       "deadline passed while queued" if bounded_by_deadline else "no slot while holding others")
+
+    def observe(self, loader, model_name: str, predict_ms: float = None, explain_ms: float = None):
+        gate = self._gate(loader, model_name)
+        if predict_ms is not None:
+            gate.predict_ms = predict_ms if gate.predict_ms is None else gate.predict_ms + LATENCY_EWMA * (
+                predict_ms - gate.predict_ms)
+        if explain_ms is not None:
+            gate.explain_ms = explain_ms if gate.explain_ms is None else gate.explain_ms + LATENCY_EWMA * (
+                explain_ms - gate.explain_ms)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "thresholds": dict(zip(LEVELS[1:], self.thresholds)),
+            "fallback_model": self.fallback_model,
+            "explain_pressure": round(self.explain_pressure(), 3),
+            "models": {
+                name: {"limit": g.limit, "queue": g.queue, "running": g.running, "waiting": g.waiting,
+                       "occupancy": round(g.occupancy(), 3), "avg_predict_ms": g.predict_ms,
+                       "avg_explain_ms": g.explain_ms,
+                       "levels": {level: telemetry.DEGRADATIONS.value(model=name, level=level) for level in LEVELS}}
+                for name, g in self._gates.items()
+            },
+        }
@@ -0,0 +1,158 @@
+"""
+Dynamic micro-batching for the deep models.
+Concurrent /predict calls for the same model are queued and flushed as one
+batched forward pass once max_wait_ms has elapsed or max_batch_size is reached.
+"""
+import asyncio
+import os
+import time
+
+from services.predict import predict_batch_with_model
+from services.preprocess import preprocess_text
+from services import telemetry
+
+# Per-model defaults; override with BATCH_<MODEL>_MAX_WAIT_MS / BATCH_<MODEL>_MAX_SIZE
+DEFAULT_BATCHING = {
+    "lstm": {"max_wait_ms": 5.0, "max_batch_size": 32},
+    "bert": {"max_wait_ms": 10.0, "max_batch_size": 16},
+}
+
+
+def batching_config(model_name: str, mtype: str) -> dict:
+    """Resolve max wait / max batch size for a model from defaults + env vars."""
+    cfg = dict(DEFAULT_BATCHING.get(mtype, {"max_wait_ms": 5.0, "max_batch_size": 32}))
+    prefix = f"BATCH_{model_name.upper()}_"
+    if os.getenv(prefix + "MAX_WAIT_MS"):
+        cfg["max_wait_ms"] = float(os.getenv(prefix + "MAX_WAIT_MS"))
+    if os.getenv(prefix + "MAX_SIZE"):
+        cfg["max_batch_size"] = int(os.getenv(prefix + "MAX_SIZE"))
+    return cfg
+
+
+def _predict_batch(loader, model_name: str, texts: list, processed: list = None) -> list:
+    """
+    Worker-thread side of a flush. In a batch mixing pre-processed and raw
+    texts, the raw ones are preprocessed here rather than on the event loop,
+    and only for models that consume the shared lemmatized text.
+    """
+    model_entry = loader.models.get(model_name)
+    if processed is not None and model_entry is not None and _uses_shared_preprocessing(model_entry):
+        processed = [p if p is not None else preprocess_text(t) for t, p in zip(texts, processed)]
+    else:
+        processed = None
+    return predict_batch_with_model(loader, model_name, texts, len(texts), processed, model_entry)
+
+
+def _uses_shared_preprocessing(model_entry: dict) -> bool:
+    """bert reads raw text and sklearn models trained on another method re-preprocess anyway."""
+    if model_entry["type"] == "lstm":
+        return True
+    return model_entry["type"] == "sklearn" and model_entry.get("preprocessing", "lemmatize") == "lemmatize"
+
+
+class MicroBatcher:
+    def __init__(self, loader, model_name: str, max_wait_ms: float = 5.0, max_batch_size: int = 32,
+                 executor=None):
+        self.loader = loader
+        self.executor = executor
+        self.model_name = model_name
+        self.max_wait_ms = max_wait_ms
+        self.max_batch_size = max_batch_size
+        self.queue = None
+        self._task = None
+        # Stats
+        self.batches = 0
+        self.items = 0
+        self.max_seen_batch = 0
+        self.batch_size_counts = {}
+        self.total_wait_ms = 0.0
+
+    def start(self):
+        self.queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def submit(self, text: str, processed: str = None) -> dict:
+        """Queue one text and wait for its slot in the next batched forward pass."""
+        fut = asyncio.get_running_loop().create_future()
+        await self.queue.put((text, processed, fut, time.perf_counter()))
+        return await fut
+
+    async def _collect(self) -> list:
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            # asyncio.wait rather than wait_for: wait_for can swallow a cancel on 3.11
+            get = asyncio.ensure_future(self.queue.get())
+            try:
+                done, _ = await asyncio.wait({get}, timeout=timeout)
+            finally:
+                if not get.done():
+                    get.cancel()
+            if not done:
+                break
+            batch.append(get.result())
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        # A batch mixes requests from several endpoints; label its stages as such
+        telemetry.current_endpoint.set("microbatch")
+        while True:
+            batch = await self._collect()
+            texts = [text for text, _, _, _ in batch]
+            processed = None
+            if any(p is not None for _, p, _, _ in batch):
+                processed = [p for _, p, _, _ in batch]
+            args = (_predict_batch, self.loader, self.model_name, texts, processed)
+            started = time.perf_counter()
+            try:
+                if self.executor is not None:
+                    results = await self.executor.run_in_thread(*args)
+                else:
+                    results = await loop.run_in_executor(None, *args)
+            except Exception as e:
+                telemetry.record_error("microbatch", e)
+                for _, _, fut, _ in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+            else:
+                for (_, _, fut, _), result in zip(batch, results):
+                    if not fut.done():
+                        fut.set_result(result)
+            self._record(batch, started)
+
+    def _record(self, batch: list, started: float):
+        n = len(batch)
+        self.batches += 1
+        self.items += n
+        self.max_seen_batch = max(self.max_seen_batch, n)
+        self.batch_size_counts[n] = self.batch_size_counts.get(n, 0) + 1
+        self.total_wait_ms += sum((started - queued) * 1000 for _, _, _, queued in batch)
+        for _, _, _, queued in batch:
+            telemetry.observe_stage("queue", started - queued, self.model_name)
+
+    def stats(self) -> dict:
+        return {
+            "max_wait_ms": self.max_wait_ms,
+            "max_batch_size": self.max_batch_size,
+            "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 3) if self.batches else 0.0,
+            "max_batch_seen": self.max_seen_batch,
+            "avg_queue_wait_ms": round(self.total_wait_ms / self.items, 3) if self.items else 0.0,
+            "batch_size_histogram": dict(sorted(self.batch_size_counts.items())),
+        }
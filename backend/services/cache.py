@@ -0,0 +1,258 @@
+"""
+Content-addressed cache for prediction and explanation results.
+Keys hash (kind, model name, model version, normalized text, params), so a
+new model artifact never serves stale results. An in-memory LRU with TTL and
+a byte cap sits in front of an optional SQLite tier that survives restarts.
+Disk writes go through a background writer thread that commits whatever has
+queued up in one transaction, so set() never waits on SQLite.
+
+The SQLite connections and the writer belong to one process: nothing is
+opened until a lookup or store needs the disk, and a forked child (serve.py
+workers) drops what it inherited and opens its own. Invalidations that
+arrive before then (model loads in the preloading parent) are remembered
+and applied when the writer starts.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_text(text: str) -> str:
+    """Whitespace-insensitive form of a review used for hashing."""
+    return " ".join(text.split())
+
+
+class ResultCache:
+    def __init__(self, max_entries: int = 10_000, max_bytes: int = 64 * 1024 * 1024,
+                 ttl_s: float = 3600, db_path: str = None, enabled: bool = True):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self.enabled = enabled
+        self._mem = OrderedDict()      # key -> (expires_at, size, model_name, version, value)
+        self._bytes = 0
+        self._db_path = db_path if enabled else None
+        self._invalidated = {}         # model -> keep_version, applied to the disk when the writer starts
+        self.disk_commits = 0
+        self.hits = {"memory": 0, "disk": 0}
+        self.misses = 0
+        self.evictions = 0
+        self._reset_process_state()
+        os.register_at_fork(after_in_child=self._reset_process_state)
+
+    def _reset_process_state(self):
+        """Fresh locks, no connection and no writer; the parent's are unusable after a fork."""
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()   # the lookup connection
+        self._db = None
+        self._writes = queue.Queue()       # ("put", row) / ("invalidate", model, keep_version), applied in order
+        self._pending = {}                 # digest -> (expires, payload, model_name, version) not yet committed
+        self._writer = None
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self._db_path, check_same_thread=False)
+        # WAL: the writer's commits don't block lookups, in this process or the other workers
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY, model TEXT, version TEXT, expires REAL, value TEXT)"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS idx_results_model ON results (model)")
+        db.commit()
+        return db
+
+    def _read_disk(self, digest: str):
+        """(expires, value) from SQLite or None; opens this process's lookup connection on first use."""
+        with self._db_lock:
+            if self._db is None:
+                self._db = self._connect()
+            return self._db.execute("SELECT expires, value FROM results WHERE key = ?", (digest,)).fetchone()
+
+    @classmethod
+    def from_env(cls) -> "ResultCache":
+        return cls(
+            max_entries=int(os.getenv("RESULT_CACHE_MAX_ENTRIES", 10_000)),
+            max_bytes=int(float(os.getenv("RESULT_CACHE_MAX_MB", 64)) * 1024 * 1024),
+            ttl_s=float(os.getenv("RESULT_CACHE_TTL_S", 3600)),
+            db_path=os.getenv("RESULT_CACHE_DB") or None,
+            enabled=os.getenv("RESULT_CACHE_ENABLED", "1") != "0",
+        )
+
+    @staticmethod
+    def key(kind: str, model_name: str, version: str, text: str, **params) -> tuple:
+        """(digest, model_name, version) for one result."""
+        text_hash = hashlib.sha256(normalize_text(text).encode()).hexdigest()
+        raw = json.dumps([kind, model_name, version, text_hash, params], sort_keys=True)
+        return hashlib.sha256(raw.encode()).hexdigest(), model_name, version
+
+    def get(self, key: tuple, record: bool = True):
+        """Cached value or None; record=False peeks without touching hit/miss counters."""
+        if not self.enabled:
+            return None
+        found, value = self._get_mem(key[0], record)
+        return value if found else self._get_disk(key, record)
+
+    async def aget(self, key: tuple, record: bool = True):
+        """get() for the event loop: a memory miss reads the SQLite tier in a worker thread."""
+        if not self.enabled:
+            return None
+        found, value = self._get_mem(key[0], record)
+        if found:
+            return value
+        if not self._db_path:
+            return self._get_disk(key, record)
+        return await asyncio.to_thread(self._get_disk, key, record)
+
+    def _get_mem(self, digest: str, record: bool) -> tuple:
+        """(True, value) on a live in-memory entry, else (False, None); expired entries are dropped."""
+        with self._lock:
+            item = self._mem.get(digest)
+            if item is not None:
+                if item[0] >= time.time():
+                    self._mem.move_to_end(digest)
+                    self.hits["memory"] += record
+                    return True, item[4]
+                self._drop(digest)
+        return False, None
+
+    def _get_disk(self, key: tuple, record: bool):
+        """Second-tier lookup; the SQLite read runs outside _lock so it never stalls memory hits."""
+        digest = key[0]
+        if self._db_path:
+            with self._lock:
+                row = self._pending.get(digest)
+            if row is None:
+                row = self._read_disk(digest)
+            if row is not None and row[0] >= time.time():
+                value = json.loads(row[1])
+                with self._lock:
+                    self.hits["disk"] += record
+                    self._put_mem(digest, row[0], len(row[1]), key[1], key[2], value)
+                return value
+        with self._lock:
+            self.misses += record
+        return None
+
+    def set(self, key: tuple, value):
+        if not self.enabled:
+            return
+        digest, model_name, version = key
+        payload = json.dumps(value)
+        expires = time.time() + self.ttl_s
+        with self._lock:
+            self._put_mem(digest, expires, len(payload), model_name, version, value)
+            if self._db_path:
+                self._pending[digest] = (expires, payload, model_name, version)
+                self._write(("put", (digest, model_name, version, expires, payload)))
+
+    def _put_mem(self, digest: str, expires: float, size: int, model_name: str, version: str, value):
+        if digest in self._mem:
+            self._drop(digest)
+        self._mem[digest] = (expires, size, model_name, version, value)
+        self._bytes += size
+        while self._mem and (len(self._mem) > self.max_entries or self._bytes > self.max_bytes):
+            self._drop(next(iter(self._mem)))
+            self.evictions += 1
+
+    def _drop(self, digest: str):
+        size = self._mem.pop(digest)[1]
+        self._bytes -= size
+
+    def invalidate_model(self, model_name: str, keep_version: str = None):
+        """Drop a model's entries (except those for keep_version) from both tiers."""
+        with self._lock:
+            stale = [d for d, item in self._mem.items() if item[2] == model_name and item[3] != keep_version]
+            for digest in stale:
+                self._drop(digest)
+            for digest in [d for d, item in self._pending.items() if item[2] == model_name and item[3] != keep_version]:
+                del self._pending[digest]
+            if self._writer is not None:
+                self._write(("invalidate", model_name, keep_version))
+            elif self._db_path:
+                self._invalidated[model_name] = keep_version
+
+    # ── Disk writer ───────────────────────────────────────────────────────────
+
+    def _write(self, op: tuple):
+        """Queue a disk operation; called with the lock held. Starts this process's writer on first use."""
+        if self._writer is None:
+            for model_name, keep_version in self._invalidated.items():
+                self._writes.put(("invalidate", model_name, keep_version))
+            self._invalidated.clear()
+            self._writer = threading.Thread(target=self._write_loop, daemon=True, name="result-cache-writer")
+            self._writer.start()
+        self._writes.put(op)
+
+    def _write_loop(self):
+        db = self._connect()
+        db.execute("DELETE FROM results WHERE expires < ?", (time.time(),))
+        db.commit()
+        while True:
+            batch = [self._writes.get()]
+            # Everything queued while the previous commit ran goes into this one
+            while True:
+                try:
+                    batch.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            ops = [op for op in batch if op is not None]
+            try:
+                for op in ops:
+                    if op[0] == "put":
+                        db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)", op[1])
+                    else:
+                        db.execute("DELETE FROM results WHERE model = ? AND version IS NOT ?", op[1:])
+                db.commit()
+            except sqlite3.Error as e:
+                print(f"Result cache disk write failed ({type(e).__name__}: {e}); dropped {len(ops)} writes")
+            with self._lock:
+                self.disk_commits += 1
+                for op in ops:
+                    # Unless set() has queued a newer value for the same key meanwhile
+                    if op[0] == "put" and self._pending.get(op[1][0], ())[:2] == op[1][3:]:
+                        del self._pending[op[1][0]]
+            if len(ops) < len(batch):
+                db.close()
+                return
+
+    def close(self):
+        """Commit the queued writes and stop the writer (app shutdown)."""
+        with self._lock:
+            writer, self._writer = self._writer, None
+        if writer is not None:
+            self._writes.put(None)
+            writer.join()
+
+    def on_model_loaded(self, model_name: str, version: str):
+        """ModelLoader listener: a newly loaded artifact invalidates the old results."""
+        self.invalidate_model(model_name, keep_version=version)
+
+    def stats(self) -> dict:
+        hits = self.hits["memory"] + self.hits["disk"]
+        lookups = hits + self.misses
+        disk_entries = None
+        if self._db is not None:
+            with self._db_lock:
+                disk_entries = self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        return {
+            "enabled": self.enabled,
+            "memory_entries": len(self._mem),
+            "memory_bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_s": self.ttl_s,
+            "disk_entries": disk_entries,
+            "disk_pending": len(self._pending),
+            "disk_commits": self.disk_commits,
+            "hits_memory": self.hits["memory"],
+            "hits_disk": self.hits["disk"],
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
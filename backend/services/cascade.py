@@ -0,0 +1,121 @@
+"""
+Confidence cascade behind the virtual "auto" model.
+
+A request runs the cheapest tier first (by default Logistic Regression) and
+escalates to the next tier (LSTM, then DistilBERT) only while the answer's
+confidence is below that tier's threshold; the last tier always answers.
+
+Tiers and thresholds come from the calibration file written by
+calibrate_cascade.py (CASCADE_CONFIG, default data/cascade.json), else from
+CASCADE_TIERS / CASCADE_THRESHOLDS. Running counts of which tier answered
+and per-model latency averages give the savings against always running the
+last tier.
+"""
+import json
+import os
+import threading
+from pathlib import Path
+
+from services import telemetry
+
+CASCADE_MODEL = "auto"
+CONFIG_PATH = Path(__file__).parent.parent / "data" / "cascade.json"
+DEFAULT_TIERS = ["logistic_regression", "rnn_lstm", "distilbert"]
+DEFAULT_THRESHOLD = 0.9
+LATENCY_EWMA = 0.05      # weight of the newest observation in the per-model latency average
+
+
+def load_config(path=None) -> dict:
+    """Calibrated config if the file exists, else tiers / thresholds from the environment."""
+    path = Path(path or os.getenv("CASCADE_CONFIG") or CONFIG_PATH)
+    if path.exists():
+        with open(path) as f:
+            config = json.load(f)
+        config["source"] = str(path)
+        return config
+    tiers = [t.strip() for t in os.getenv("CASCADE_TIERS", ",".join(DEFAULT_TIERS)).split(",") if t.strip()]
+    env_thresholds = os.getenv("CASCADE_THRESHOLDS")
+    thresholds = ([float(t) for t in env_thresholds.split(",")] if env_thresholds
+                  else [DEFAULT_THRESHOLD] * (len(tiers) - 1))
+    return {"tiers": tiers, "thresholds": thresholds, "source": "env"}
+
+
+class Cascade:
+    def __init__(self, tiers: list, thresholds: list, costs_ms: dict = None, source: str = "env",
+                 calibration: dict = None):
+        if len(thresholds) != len(tiers) - 1:
+            raise ValueError(f"{len(tiers)} cascade tiers need {len(tiers) - 1} thresholds, got {len(thresholds)}")
+        self.tiers = list(tiers)
+        self.thresholds = [float(t) for t in thresholds]
+        self.source = source
+        self.calibration = calibration or {}
+        self._latency_ms = dict(costs_ms or {})   # seeded with calibrated per-review costs
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.answered = {t: 0 for t in self.tiers}
+        self.model_calls = 0
+        self.total_ms = 0.0
+        self.saved_ms = 0.0
+
+    @classmethod
+    def from_config(cls, config: dict) -> "Cascade":
+        return cls(config["tiers"], config["thresholds"], config.get("costs_ms"), config.get("source", "env"),
+                   config.get("expected"))
+
+    @classmethod
+    def from_env(cls) -> "Cascade":
+        return cls.from_config(load_config())
+
+    def threshold(self, tier_index: int) -> float:
+        """Minimum confidence for tier i to answer; the last tier always answers."""
+        return self.thresholds[tier_index] if tier_index < len(self.thresholds) else 0.0
+
+    def accepts(self, tier_index: int, confidence: float, last: bool = False) -> bool:
+        return last or confidence >= self.threshold(tier_index)
+
+    def estimate_ms(self, model: str):
+        return self._latency_ms.get(model)
+
+    def record(self, path: list) -> dict:
+        """
+        Account one cascade run (path: [{"model", "inference_time_ms"}, ...], last entry
+        answered) and return its cost summary against running only the last tier.
+        """
+        latency_ms = sum(step["inference_time_ms"] for step in path)
+        answered = path[-1]["model"]
+        with self._lock:
+            for step in path:
+                prev = self._latency_ms.get(step["model"])
+                ms = step["inference_time_ms"]
+                self._latency_ms[step["model"]] = ms if prev is None else prev + LATENCY_EWMA * (ms - prev)
+            full_ms = self._latency_ms.get(self.tiers[-1])
+            saved = full_ms - latency_ms if full_ms is not None else None
+            self.requests += 1
+            self.answered[answered] = self.answered.get(answered, 0) + 1
+            self.model_calls += len(path)
+            self.total_ms += latency_ms
+            if saved is not None:
+                self.saved_ms += saved
+        telemetry.CASCADE_ANSWERS.inc(tier=answered)
+        return {"latency_ms": latency_ms, "full_model_ms": full_ms, "saved_ms": saved}
+
+    def status(self) -> dict:
+        with self._lock:
+            n = self.requests
+            full_ms = self._latency_ms.get(self.tiers[-1])
+            return {
+                "tiers": [{"model": t, "threshold": self.thresholds[i] if i < len(self.thresholds) else None,
+                           "answered": self.answered.get(t, 0),
+                           "share": round(self.answered.get(t, 0) / n, 4) if n else 0.0,
+                           "avg_latency_ms": self._latency_ms.get(t)}
+                          for i, t in enumerate(self.tiers)],
+                "source": self.source,
+                "calibration": self.calibration,
+                "requests": n,
+                "avg_latency_ms": self.total_ms / n if n else None,
+                "full_model_avg_ms": full_ms,
+                "avg_saved_ms": self.saved_ms / n if n else None,
+                # Share of requests that never reached the last (most expensive) tier
+                "last_tier_avoided": round(1 - self.answered.get(self.tiers[-1], 0) / n, 4) if n else None,
+                "model_calls_per_request": round(self.model_calls / n, 3) if n else None,
+            }
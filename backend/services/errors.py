@@ -0,0 +1,300 @@
+"""
+SQLite store of misclassified reviews, filled by the evaluation run.
+
+Each model keeps only its most recently completed run (model version +
+data version). Run ids come from the runs table, so several processes
+(serve.py workers, evaluate.py) can share one database; a run's rows stay
+invisible until it is published. Rows are indexed on model, labels, confidence band and
+length, and /errors reads them with keyset (cursor) pagination ordered by
+confidence, so no request scans or loads the whole table.
+"""
+import base64
+import os
+import sqlite3
+import threading
+import time
+
+LENGTH_BUCKET = 200
+LENGTH_BUCKETS = 5       # 0-200 … 800-1000, plus a 1000+ overflow bucket
+CONFIDENCE_BANDS = {"low": (0.0, 0.7), "medium": (0.7, 0.9), "high": (0.9, 1.01)}
+SORTS = ("confidence_desc", "confidence_asc")
+SCHEMA_VERSION = 2       # PRAGMA user_version; older stores are dropped and re-filled by the next evaluation
+STALE_RUN_S = 24 * 3600  # unpublished runs older than this were interrupted; their rows are cleared
+
+_NEGATIONS = {"not", "no", "never", "nothing", "nobody", "neither", "nor", "without",
+              "cant", "dont", "doesnt", "didnt", "isnt", "wasnt", "wont", "couldnt", "shouldnt"}
+_CONTRAST = {"but", "however", "although", "though", "despite", "yet", "whereas"}
+_POSITIVE = {"good", "great", "excellent", "love", "loved", "best", "amazing", "wonderful", "brilliant", "fantastic"}
+_NEGATIVE = {"bad", "terrible", "awful", "worst", "boring", "waste", "poor", "horrible", "dull", "hate"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS errors (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL,
+    model TEXT NOT NULL,
+    review TEXT NOT NULL,
+    true_label TEXT NOT NULL,
+    pred_label TEXT NOT NULL,
+    confidence REAL NOT NULL,
+    conf_band INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    length_bucket INTEGER NOT NULL,
+    reason TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_errors_model_conf ON errors (model, run_id, confidence, id);
+CREATE INDEX IF NOT EXISTS idx_errors_labels_conf ON errors (true_label, pred_label, confidence, id);
+CREATE INDEX IF NOT EXISTS idx_errors_band ON errors (conf_band, confidence, id);
+CREATE INDEX IF NOT EXISTS idx_errors_length ON errors (length_bucket, length);
+CREATE INDEX IF NOT EXISTS idx_errors_conf ON errors (confidence, id);
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    model TEXT NOT NULL,
+    label TEXT,
+    version TEXT NOT NULL,
+    data_version TEXT,
+    total INTEGER,
+    errors INTEGER,
+    started_at REAL NOT NULL,
+    completed_at REAL,
+    published INTEGER NOT NULL DEFAULT 0
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_runs_published ON runs (model) WHERE published = 1;
+CREATE TABLE IF NOT EXISTS length_summary (
+    run_id INTEGER NOT NULL,
+    length_bucket INTEGER NOT NULL,
+    total INTEGER NOT NULL,
+    errors INTEGER NOT NULL,
+    PRIMARY KEY (run_id, length_bucket)
+);
+"""
+
+
+def length_bucket(length: int) -> int:
+    return min(length // LENGTH_BUCKET, LENGTH_BUCKETS)
+
+
+def bucket_name(bucket: int) -> str:
+    if bucket >= LENGTH_BUCKETS:
+        return f"{LENGTH_BUCKETS * LENGTH_BUCKET}+"
+    return f"{bucket * LENGTH_BUCKET}-{(bucket + 1) * LENGTH_BUCKET}"
+
+
+def error_reason(text: str) -> str:
+    """Rough tag for why a review is hard: negation, contrast, mixed lexicon or shortness."""
+    words = set("".join(c if c.isalpha() or c.isspace() else "" for c in text.lower()).split())
+    if words & _NEGATIONS:
+        return "Negation"
+    if words & _CONTRAST:
+        return "Contrast"
+    if words & _POSITIVE and words & _NEGATIVE:
+        return "Mixed signals"
+    if len(text) < LENGTH_BUCKET:
+        return "Short length ambiguity"
+    return "Other"
+
+
+def encode_cursor(confidence: float, row_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{confidence!r}:{row_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        confidence, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split(":")
+        return float(confidence), int(row_id)
+    except Exception:
+        raise ValueError("invalid cursor")
+
+
+class ErrorStore:
+    def __init__(self, db_path: str = ":memory:"):
+        self.db_path = db_path
+        self._reset_process_state()
+        # A forked child (serve.py worker) opens its own connection instead of sharing the parent's
+        os.register_at_fork(after_in_child=self._reset_process_state)
+
+    def _reset_process_state(self):
+        self._lock = threading.Lock()
+        self._db = None
+        self._runs = {}          # model -> in-progress (run_id, {bucket: [total, errors]})
+
+    def _conn(self) -> sqlite3.Connection:
+        """This process's connection, opened on first use; call with the lock held."""
+        if self._db is None:
+            if self.db_path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            db = sqlite3.connect(self.db_path, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            if db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                db.executescript("DROP TABLE IF EXISTS errors; DROP TABLE IF EXISTS runs;"
+                                 " DROP TABLE IF EXISTS length_summary;")
+                db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            db.executescript(_SCHEMA)
+            db.commit()
+            self._db = db
+        return self._db
+
+    @classmethod
+    def from_env(cls, default_path) -> "ErrorStore":
+        return cls(os.getenv("ERROR_DB") or str(default_path))
+
+    # ── Writes (evaluation run) ───────────────────────────────────────────────
+
+    def has_run(self, model: str, version: str, data_version: str) -> bool:
+        with self._lock:
+            row = self._conn().execute(
+                "SELECT version, data_version FROM runs WHERE model = ? AND published = 1", (model,)
+            ).fetchone()
+        return row == (version, data_version)
+
+    def start_run(self, model: str, version: str):
+        """
+        Open a new run for a model. Its rows stay invisible until finish_run publishes
+        it; rows of runs interrupted more than STALE_RUN_S ago are cleared here.
+        """
+        now = time.time()
+        with self._lock:
+            db = self._conn()
+            stale = [r[0] for r in db.execute(
+                "SELECT run_id FROM runs WHERE model = ? AND published = 0 AND started_at < ?",
+                (model, now - STALE_RUN_S),
+            )]
+            self._delete_runs(db, stale)
+            run_id = db.execute(
+                "INSERT INTO runs (model, version, started_at) VALUES (?, ?, ?)", (model, version, now)
+            ).lastrowid
+            db.commit()
+            self._runs[model] = (run_id, {})
+
+    @staticmethod
+    def _delete_runs(db: sqlite3.Connection, run_ids: list):
+        for table in ("errors", "length_summary", "runs"):
+            db.executemany(f"DELETE FROM {table} WHERE run_id = ?", [(r,) for r in run_ids])
+
+    def add(self, model: str, texts: list, labels: list, results: list):
+        """Record one evaluated chunk: every row counts toward the length summary, errors are stored."""
+        run_id, buckets = self._runs[model]
+        rows = []
+        for text, label, result in zip(texts, labels, results):
+            bucket = length_bucket(len(text))
+            counts = buckets.setdefault(bucket, [0, 0])
+            counts[0] += 1
+            true_label = "positive" if label == 1 else "negative"
+            if result["sentiment"] == true_label:
+                continue
+            counts[1] += 1
+            confidence = float(result["confidence"])
+            rows.append((run_id, model, text, true_label, result["sentiment"], confidence,
+                         min(int(confidence * 10), 9), len(text), bucket, error_reason(text)))
+        with self._lock:
+            db = self._conn()
+            db.executemany(
+                "INSERT INTO errors (run_id, model, review, true_label, pred_label, confidence,"
+                " conf_band, length, length_bucket, reason) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            db.commit()
+
+    def finish_run(self, model: str, label: str, data_version: str):
+        """Publish the run and drop the run it replaces, in one transaction."""
+        run_id, buckets = self._runs.pop(model)
+        total = sum(c[0] for c in buckets.values())
+        errors = sum(c[1] for c in buckets.values())
+        with self._lock:
+            db = self._conn()
+            replaced = [r[0] for r in db.execute(
+                "SELECT run_id FROM runs WHERE model = ? AND published = 1", (model,)
+            )]
+            self._delete_runs(db, replaced)
+            db.executemany(
+                "INSERT INTO length_summary VALUES (?, ?, ?, ?)",
+                [(run_id, b, c[0], c[1]) for b, c in buckets.items()],
+            )
+            db.execute(
+                "UPDATE runs SET label = ?, data_version = ?, total = ?, errors = ?, completed_at = ?, published = 1"
+                " WHERE run_id = ?",
+                (label, data_version, total, errors, time.time(), run_id),
+            )
+            db.commit()
+
+    # ── Reads (/errors) ───────────────────────────────────────────────────────
+
+    def has_data(self) -> bool:
+        with self._lock:
+            return self._conn().execute("SELECT 1 FROM runs WHERE published = 1 LIMIT 1").fetchone() is not None
+
+    def query(self, model: str = None, true_label: str = None, pred_label: str = None, band: str = None,
+              min_length: int = None, max_length: int = None, sort: str = "confidence_desc",
+              limit: int = 50, cursor: str = None) -> dict:
+        """One page of errors from the published runs, ordered by (confidence, id)."""
+        if sort not in SORTS:
+            raise ValueError(f"sort must be one of {SORTS}")
+        if band is not None and band not in CONFIDENCE_BANDS:
+            raise ValueError(f"band must be one of {tuple(CONFIDENCE_BANDS)}")
+        where, params = [], []
+        if model:
+            # Accept the model key or its display label
+            where.append("e.model = (SELECT model FROM runs WHERE published = 1 AND (model = ? OR label = ?))")
+            params += [model, model]
+        if true_label:
+            where.append("e.true_label = ?")
+            params.append(true_label)
+        if pred_label:
+            where.append("e.pred_label = ?")
+            params.append(pred_label)
+        if band:
+            lo, hi = CONFIDENCE_BANDS[band]
+            where.append("e.conf_band BETWEEN ? AND ?")
+            params += [int(lo * 10), min(int(hi * 10), 10) - 1]
+        if min_length is not None:
+            where.append("e.length >= ?")
+            params.append(min_length)
+        if max_length is not None:
+            where.append("e.length <= ?")
+            params.append(max_length)
+        desc = sort == "confidence_desc"
+        if cursor:
+            confidence, row_id = decode_cursor(cursor)
+            op = "<" if desc else ">"
+            where.append(f"(e.confidence {op} ? OR (e.confidence = ? AND e.id {op} ?))")
+            params += [confidence, confidence, row_id]
+        order = "DESC" if desc else "ASC"
+        sql = (
+            "SELECT e.id, r.label, e.review, e.true_label, e.pred_label, e.confidence, e.length, e.reason"
+            " FROM errors e JOIN runs r ON r.run_id = e.run_id AND r.published = 1"
+            + (" WHERE " + " AND ".join(where) if where else "")
+            + f" ORDER BY e.confidence {order}, e.id {order} LIMIT ?"
+        )
+        with self._lock:
+            rows = self._conn().execute(sql, params + [limit + 1]).fetchall()
+        items = [
+            {"id": r[0], "model": r[1], "review": r[2], "true_label": r[3], "pred_label": r[4],
+             "confidence": round(r[5], 4), "length": r[6], "reason": r[7]}
+            for r in rows[:limit]
+        ]
+        next_cursor = encode_cursor(rows[limit - 1][5], rows[limit - 1][0]) if len(rows) > limit else None
+        return {"items": items, "next_cursor": next_cursor}
+
+    def summary(self) -> dict:
+        """Error counts per model and error rate per length bucket (all published runs combined)."""
+        with self._lock:
+            db = self._conn()
+            runs = db.execute(
+                "SELECT model, label, version, data_version, total, errors FROM runs WHERE published = 1"
+                " ORDER BY model"
+            ).fetchall()
+            lengths = db.execute(
+                "SELECT s.length_bucket, SUM(s.total), SUM(s.errors) FROM length_summary s"
+                " JOIN runs r ON r.run_id = s.run_id AND r.published = 1"
+                " GROUP BY s.length_bucket ORDER BY s.length_bucket"
+            ).fetchall()
+        return {
+            "models": [
+                {"model": m, "label": label, "version": v, "data_version": d, "total": t, "errors": e,
+                 "error_rate": round(e / t, 4) if t else 0.0}
+                for m, label, v, d, t, e in runs
+            ],
+            "error_by_length": [
+                {"bucket": bucket_name(b), "error_rate": round(e / t, 4) if t else 0.0, "errors": e, "total": t}
+                for b, t, e in lengths
+            ],
+        }
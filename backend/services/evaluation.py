@@ -0,0 +1,415 @@
+"""
+Streaming evaluation of the loaded models on a labeled review file.
+
+One pass over an IMDB-format CSV (review, sentiment) feeds every model in
+chunks and accumulates confusion counts, positive-score histograms (for ROC
+and AUC), review-length histograms, top-word counts and a small review
+sample, so memory stays bounded whatever the file size.
+
+Results are stored as JSON artifacts keyed by the data file fingerprint and
+each model's version: one per model plus one for the dataset statistics.
+A re-run only streams the file if some piece is missing, and then only
+scores the models whose artifact is missing, so a new model version
+recomputes that model alone.
+
+Runs are single-flight across processes: each holds an exclusive lock on
+the artifact directory, so serve.py workers (and evaluate.py) sharing it
+take turns, and the ones that come second find the artifacts already
+written and have nothing left to do.
+"""
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:      # Windows: single-process there anyway (serve.py forks)
+    fcntl = None
+
+import numpy as np
+
+from models.loader import artifact_version
+from services.predict import predict_batch_with_model
+from services.preprocess import preprocess_batch
+from services import telemetry
+
+FORMAT_VERSION = 1
+EVAL_DIR = Path(__file__).parent.parent / "data" / "evaluation"
+
+MODEL_LABELS = {
+    "naive_bayes": "Naive Bayes",
+    "logistic_regression": "Logistic Regression",
+    "rnn_lstm": "RNN (LSTM)",
+    "distilbert": "DistilBERT",
+}
+
+SCORE_BINS = 1000        # positive-probability histogram resolution for ROC / AUC
+ROC_POINTS = 50
+LENGTH_BUCKET = 200      # characters per length-histogram bucket
+LENGTH_BUCKETS = 10      # plus one overflow bucket
+TOP_WORDS = 10
+MAX_TERMS = 100_000      # word counters are pruned back to half this size when exceeded
+SAMPLES_PER_LABEL = 4
+
+
+def positive_score(result: dict) -> float:
+    """P(positive) from a {"sentiment", "confidence"} prediction."""
+    return result["confidence"] if result["sentiment"] == "positive" else 1.0 - result["confidence"]
+
+
+def _parse_label(value) -> int:
+    if isinstance(value, str):
+        value = value.strip().lower()
+        if value in ("positive", "pos", "1"):
+            return 1
+        if value in ("negative", "neg", "0"):
+            return 0
+        raise ValueError(f"unrecognized sentiment label '{value}'")
+    return int(value)
+
+
+def iter_labeled_chunks(path, chunk_size: int = 2000, text_column: str = "review",
+                        label_column: str = "sentiment", max_rows: int = None):
+    """Yield (texts, labels) from an IMDB-format CSV in chunks of at most chunk_size rows."""
+    import pandas as pd
+
+    seen = 0
+    for frame in pd.read_csv(path, usecols=[text_column, label_column], chunksize=chunk_size):
+        if max_rows is not None:
+            frame = frame.iloc[:max_rows - seen]
+        texts = frame[text_column].fillna("").astype(str).tolist()
+        labels = [_parse_label(v) for v in frame[label_column].tolist()]
+        seen += len(texts)
+        yield texts, labels
+        if max_rows is not None and seen >= max_rows:
+            return
+
+
+# ── Accumulators ──────────────────────────────────────────────────────────────
+
+class ModelAccumulator:
+    """Confusion counts and per-class score histograms for one model."""
+
+    def __init__(self):
+        self.confusion = np.zeros((2, 2), dtype=np.int64)        # [true][pred]
+        self.hist = np.zeros((2, SCORE_BINS + 1), dtype=np.int64)  # [true][score bin]
+
+    def update(self, labels: list, results: list):
+        y = np.asarray(labels, dtype=np.int64)
+        pred = np.array([r["sentiment"] == "positive" for r in results], dtype=np.int64)
+        scores = np.array([positive_score(r) for r in results])
+        bins = np.clip(np.rint(scores * SCORE_BINS).astype(np.int64), 0, SCORE_BINS)
+        np.add.at(self.confusion, (y, pred), 1)
+        np.add.at(self.hist, (y, bins), 1)
+
+    def roc(self) -> tuple:
+        """(fpr, tpr) arrays over every score threshold, from high to low."""
+        neg, pos = self.hist[0][::-1].cumsum(), self.hist[1][::-1].cumsum()
+        fpr = np.concatenate([[0.0], neg / max(neg[-1], 1)])
+        tpr = np.concatenate([[0.0], pos / max(pos[-1], 1)])
+        return fpr, tpr
+
+    def result(self) -> dict:
+        (tn, fp), (fn, tp) = self.confusion.tolist()
+        total = tn + fp + fn + tp
+        precision = tp / (tp + fp) if tp + fp else 0.0
+        recall = tp / (tp + fn) if tp + fn else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        fpr, tpr = self.roc()
+        auc = float(np.trapz(tpr, fpr))
+        # Thin the curve out to ~ROC_POINTS evenly spaced FPR values for the chart
+        grid = np.linspace(0, 1, ROC_POINTS + 1)
+        roc = [{"fpr": round(float(x), 4), "tpr": round(float(np.interp(x, fpr, tpr)), 4)} for x in grid]
+        return {
+            "rows": total,
+            "metrics": {
+                "Accuracy": round((tp + tn) / total, 4) if total else 0.0,
+                "Precision": round(precision, 4),
+                "Recall": round(recall, 4),
+                "F1-Score": round(f1, 4),
+                "AUC-ROC": round(auc, 4),
+            },
+            "confusion_matrix": [[tn, fp], [fn, tp]],
+            "roc": roc,
+        }
+
+
+class DatasetAccumulator:
+    """Label counts, length histograms, distinctive words and a review sample."""
+
+    def __init__(self, seed: int = 0):
+        self.label_counts = [0, 0]
+        self.lengths = np.zeros((2, LENGTH_BUCKETS + 1), dtype=np.int64)
+        self.words = (Counter(), Counter())
+        self.samples = ([], [])
+        self._rng = random.Random(seed)
+
+    def update(self, texts: list, labels: list, processed: list):
+        for text, label, clean in zip(texts, labels, processed):
+            self.label_counts[label] += 1
+            self.lengths[label, min(len(text) // LENGTH_BUCKET, LENGTH_BUCKETS)] += 1
+            self.words[label].update(set(clean.split()))
+            # Reservoir sample per label
+            seen, sample = self.label_counts[label], self.samples[label]
+            if len(sample) < SAMPLES_PER_LABEL:
+                sample.append(text)
+            else:
+                j = self._rng.randrange(seen)
+                if j < SAMPLES_PER_LABEL:
+                    sample[j] = text
+        for counter in self.words:
+            if len(counter) > MAX_TERMS:
+                kept = counter.most_common(MAX_TERMS // 2)
+                counter.clear()
+                counter.update(dict(kept))
+
+    def _top_words(self, label: int) -> list:
+        own, other = self.words[label], self.words[1 - label]
+        scored = sorted(own, key=lambda w: own[w] - other.get(w, 0), reverse=True)[:TOP_WORDS]
+        return [{"word": w, "count": own[w]} for w in scored]
+
+    def result(self) -> dict:
+        buckets = [f"{i * LENGTH_BUCKET}-{(i + 1) * LENGTH_BUCKET}" for i in range(LENGTH_BUCKETS)]
+        buckets.append(f"{LENGTH_BUCKETS * LENGTH_BUCKET}+")
+        samples, next_id = [], 1
+        for label in (1, 0):
+            for text in self.samples[label]:
+                samples.append({"id": next_id, "text": text[:500], "sentiment": label, "length": len(text)})
+                next_id += 1
+        return {
+            "rows": sum(self.label_counts),
+            "length_distribution": [
+                {"bucket": b, "positive": int(self.lengths[1, i]), "negative": int(self.lengths[0, i])}
+                for i, b in enumerate(buckets)
+            ],
+            "sentiment_distribution": [
+                {"name": "Positive", "value": self.label_counts[1], "color": "#10b981"},
+                {"name": "Negative", "value": self.label_counts[0], "color": "#ec4899"},
+            ],
+            "top_positive_words": self._top_words(1),
+            "top_negative_words": self._top_words(0),
+            "sample_reviews": samples,
+        }
+
+
+# ── Artifact store ────────────────────────────────────────────────────────────
+
+class EvaluationStore:
+    """Evaluation artifacts on disk, keyed by data fingerprint and model version."""
+
+    def __init__(self, root=EVAL_DIR):
+        self.root = Path(root)
+        self._cache = {}
+
+    @contextmanager
+    def lock(self):
+        """Exclusive across processes for the duration of one evaluation run."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root / ".evaluation.lock", "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def data_version(self, data_path, max_rows: int = None) -> str:
+        version = artifact_version(data_path)
+        return version if max_rows is None else f"{version}-{max_rows}"
+
+    def _path(self, kind: str, data_version: str, model_name: str = None, model_version: str = None) -> Path:
+        if kind == "dataset":
+            return self.root / f"dataset_{data_version}.json"
+        return self.root / f"model_{model_name}_{model_version}_{data_version}.json"
+
+    def get(self, *key):
+        path = self._path(*key)
+        if path not in self._cache:
+            if not path.exists():
+                return None
+            with open(path) as f:
+                self._cache[path] = json.load(f)
+        return self._cache[path]
+
+    def put(self, value: dict, *key):
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = self._path(*key)
+        value = {"format_version": FORMAT_VERSION, "computed_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                 **value}
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump(value, f)
+        os.replace(tmp, path)
+        self._cache[path] = value
+
+    def set_current(self, data_path, data_version: str):
+        """Remember which data file the endpoints should report on."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root / "current.json", "w") as f:
+            json.dump({"data": str(data_path), "data_version": data_version}, f)
+
+    def current_data_version(self) -> str:
+        path = self.root / "current.json"
+        if not path.exists():
+            return None
+        with open(path) as f:
+            return json.load(f)["data_version"]
+
+    def report(self, versions: dict, data_version: str = None) -> dict:
+        """Composite report for the given model versions; models without an artifact are left out."""
+        data_version = data_version or self.current_data_version()
+        if data_version is None:
+            return None
+        models = {}
+        for name, version in versions.items():
+            if version == "demo":
+                continue
+            art = self.get("model", data_version, name, version)
+            if art is not None:
+                models[name] = art
+        key = hashlib.sha256(json.dumps([data_version, sorted(
+            (n, versions[n]) for n in models)]).encode()).hexdigest()[:16]
+        return {
+            "key": key,
+            "data_version": data_version,
+            "models": models,
+            "dataset": self.get("dataset", data_version),
+        }
+
+
+# ── Evaluation run ────────────────────────────────────────────────────────────
+
+def run_evaluation(loader, data_path, store: EvaluationStore, chunk_size: int = 2000,
+                   max_rows: int = None, batch_size: int = 32, force: bool = False,
+                   error_store=None) -> dict:
+    """
+    Evaluate the models whose artifact is missing (all of them with force) in one streaming pass.
+    With an error_store, misclassified rows are written to it as they are found.
+    """
+    with store.lock():
+        data_version = store.data_version(data_path, max_rows)
+        versions = dict(loader.versions)
+        todo = [name for name, version in versions.items()
+                if version != "demo" and (force or store.get("model", data_version, name, version) is None
+                                          or (error_store is not None
+                                              and not error_store.has_run(name, version, data_version)))]
+        need_dataset = force or store.get("dataset", data_version) is None
+
+        if todo or need_dataset:
+            started = time.perf_counter()
+            accs = {name: ModelAccumulator() for name in todo}
+            dataset = DatasetAccumulator() if need_dataset else None
+            timings = {name: 0.0 for name in todo}
+            timings["preprocess"] = 0.0
+            if error_store is not None:
+                for name in todo:
+                    error_store.start_run(name, versions[name])
+            for texts, labels in iter_labeled_chunks(data_path, chunk_size, max_rows=max_rows):
+                t0 = time.perf_counter()
+                processed = preprocess_batch(texts)
+                timings["preprocess"] += time.perf_counter() - t0
+                if dataset is not None:
+                    dataset.update(texts, labels, processed)
+                for name in todo:
+                    t0 = time.perf_counter()
+                    results = predict_batch_with_model(loader, name, texts, batch_size, processed)
+                    timings[name] += time.perf_counter() - t0
+                    accs[name].update(labels, results)
+                    if error_store is not None:
+                        error_store.add(name, texts, labels, results)
+
+            for name, acc in accs.items():
+                store.put({"model": name, "label": MODEL_LABELS.get(name, name), "version": versions[name],
+                           "data_version": data_version, "eval_time_s": round(timings[name], 2), **acc.result()},
+                          "model", data_version, name, versions[name])
+                if error_store is not None:
+                    error_store.finish_run(name, MODEL_LABELS.get(name, name), data_version)
+            if dataset is not None:
+                store.put({"data": str(data_path), "data_version": data_version, **dataset.result()},
+                          "dataset", data_version)
+            print(f"Evaluated {todo or 'dataset only'} on {data_path} in {time.perf_counter() - started:.1f}s")
+        store.set_current(data_path, data_version)
+        return store.report(versions, data_version)
+
+
+class EvaluationRunner:
+    """Single-flight background re-evaluation, triggered on startup and whenever a model (re)loads."""
+
+    def __init__(self, loader, store: EvaluationStore, data_path: str = None, max_rows: int = None,
+                 error_store=None):
+        self.loader = loader
+        self.store = store
+        self.error_store = error_store
+        self.data_path = data_path
+        self.max_rows = max_rows
+        self.started = False
+        self.running = False
+        self.last_error = None
+        self.last_run = None
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, loader, error_store=None) -> "EvaluationRunner":
+        max_rows = os.getenv("EVAL_MAX_ROWS")
+        return cls(loader, EvaluationStore(os.getenv("EVAL_DIR") or EVAL_DIR),
+                   data_path=os.getenv("EVAL_DATA") or None, max_rows=int(max_rows) if max_rows else None,
+                   error_store=error_store)
+
+    def schedule(self) -> bool:
+        """Queue a run; returns False when no evaluation data is configured."""
+        if not self.data_path:
+            return False
+        with self._lock:
+            self._dirty = True
+            if self.running:
+                return True
+            self.running = True
+        threading.Thread(target=self._run, daemon=True, name="evaluation").start()
+        return True
+
+    def start(self):
+        """Called from app startup (after any fork), so no evaluation thread runs before it."""
+        self.started = True
+        self.schedule()
+
+    def on_model_loaded(self, model_name: str, version: str):
+        """ModelLoader listener: score the new version once loading has settled."""
+        if self.started:
+            self.schedule()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._dirty:
+                    self.running = False
+                    return
+                self._dirty = False
+            # Evaluate with the full set of models, not whichever happened to be ready first
+            for name in self.loader.enabled:
+                if self.loader.mode != "lazy" or self.loader.states[name]["state"] != "pending":
+                    self.loader.wait_ready(name)
+            try:
+                run_evaluation(self.loader, self.data_path, self.store, max_rows=self.max_rows,
+                               error_store=self.error_store)
+                self.last_error = None
+            except Exception as e:
+                print(f"Evaluation of {self.data_path} failed: {type(e).__name__}: {e}")
+                telemetry.record_error("evaluation", e)
+                self.last_error = str(e)
+            self.last_run = time.time()
+
+    def status(self) -> dict:
+        return {
+            "data": self.data_path,
+            "running": self.running,
+            "last_run": self.last_run,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,241 @@
+"""
+Execution layer for CPU-bound work so the event loop stays responsive.
+TF / sklearn inference (which releases the GIL) runs on a thread pool;
+pure-Python preprocessing of larger batches and the reference LIME run on a
+process pool whose workers hold their own copy of the sklearn pipelines.
+Single texts and the vectorized explainers stay in this process, where they
+cost less than pickling them to a worker.
+"""
+import asyncio
+import contextvars
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from models.loader import MODEL_TYPES
+from services.preprocess import preprocess_batch
+from services.predict import predict_batch_with_model
+from services.explain import get_lime_explanation
+from services import telemetry
+
+# Default in-flight limit per model type; override with EXEC_LIMIT_<MODEL>
+DEFAULT_MODEL_LIMITS = {"demo": 16, "sklearn": 8, "lstm": 4, "bert": 2}
+# Up to this many texts are preprocessed on the thread pool instead of the process pool
+INLINE_PREPROCESS_MAX = int(os.getenv("EXEC_INLINE_PREPROCESS_MAX", 8))
+
+# Worker-local loader, populated by _init_worker inside each pool process
+_worker_loader = None
+_worker_seen = {}   # model name -> last parent version this worker reloaded for
+
+
+def _init_worker():
+    global _worker_loader
+    from models.loader import ModelLoader
+    _worker_loader = ModelLoader()
+    # The pool only runs sklearn explanations; the deep models stay in the parent
+    for name in _worker_loader.enabled:
+        if MODEL_TYPES[name] == "sklearn":
+            _worker_loader.load_model(name)
+
+
+def _remaining_ms(deadline_at: float):
+    """Milliseconds left until an absolute time.time() deadline, or None."""
+    return None if deadline_at is None else max((deadline_at - time.time()) * 1000, 0.0)
+
+
+def _explain_by(loader, model_name: str, text: str, num_features: int, mode: str, num_samples: int,
+                deadline_at: float) -> list:
+    """get_lime_explanation with what is left of a deadline fixed at dispatch, so time spent queued counts."""
+    return get_lime_explanation(loader, model_name, text, num_features, mode, num_samples, _remaining_ms(deadline_at))
+
+
+def _explain_in_worker(model_name: str, version: str, text: str, num_features: int, *params) -> tuple:
+    """Explanation plus the fallback / error counts it produced, for the parent to merge."""
+    if _worker_seen.get(model_name, _worker_loader.versions.get(model_name)) != version:
+        # The parent hot-reloaded this model since the worker started: load what is on disk now
+        entry = _worker_loader.stage_model(model_name)
+        _worker_loader._set_model(model_name, entry, entry["version"])
+        _worker_seen[model_name] = version
+    words = _explain_by(_worker_loader, model_name, text, num_features, *params)
+    return words, telemetry.FALLBACKS.drain(), telemetry.ERRORS.drain()
+
+
+class _PoolStats:
+    """Submitted / running / completed counters for one pool."""
+
+    def __init__(self, workers: int, tracks_running: bool = True):
+        self.workers = workers
+        self.tracks_running = tracks_running
+        self.submitted = 0
+        self.running = 0
+        self.completed = 0
+        self.lock = threading.Lock()
+
+    def snapshot(self) -> dict:
+        in_flight = self.submitted - self.completed
+        # Process workers can't report back when they start; assume every free worker picks up work
+        running = self.running if self.tracks_running else min(in_flight, self.workers)
+        return {
+            "workers": self.workers,
+            "in_flight": in_flight,
+            "running": running,
+            "queued": max(in_flight - running, 0),
+            "completed": self.completed,
+            "saturation": round(min(in_flight / self.workers, 1.0), 3) if self.workers else 0.0,
+        }
+
+
+class InferenceExecutor:
+    def __init__(self, thread_workers: int = None, process_workers: int = None, model_limits: dict = None):
+        cpus = os.cpu_count() or 1
+        self.thread_workers = thread_workers or int(os.getenv("EXEC_THREAD_WORKERS", min(32, cpus + 4)))
+        self.process_workers = (
+            process_workers if process_workers is not None
+            else int(os.getenv("EXEC_PROCESS_WORKERS", min(4, cpus)))
+        )
+        self.model_limits = model_limits or {}
+        self.threads = None
+        self.processes = None
+        self.thread_stats = _PoolStats(self.thread_workers)
+        self.process_stats = _PoolStats(self.process_workers, tracks_running=False)
+        self._semaphores = {}
+        self._limits = {}
+        self._waiting = {}
+
+    def start(self):
+        self.threads = ThreadPoolExecutor(max_workers=self.thread_workers, thread_name_prefix="inference")
+        if self.process_workers > 0:
+            # spawn, not fork: forking a process that already runs TF threads can deadlock
+            self.processes = ProcessPoolExecutor(
+                max_workers=self.process_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+
+    def shutdown(self):
+        if self.threads is not None:
+            self.threads.shutdown(wait=False, cancel_futures=True)
+        if self.processes is not None:
+            self.processes.shutdown(wait=False, cancel_futures=True)
+
+    # ── Per-model concurrency ─────────────────────────────────────────────────
+
+    def model_limit(self, model_name: str, mtype: str = None) -> int:
+        """
+        Limit for the model's configured type (MODEL_TYPES), so a demo stub standing in while
+        the real model loads doesn't fix it; mtype is only used for models outside MODEL_TYPES.
+        """
+        env = os.getenv(f"EXEC_LIMIT_{model_name.upper()}")
+        if env:
+            return int(env)
+        mtype = MODEL_TYPES.get(model_name, mtype)
+        return self.model_limits.get(model_name, DEFAULT_MODEL_LIMITS.get(mtype, 4))
+
+    def _semaphore(self, loader, model_name: str) -> asyncio.Semaphore:
+        if model_name not in self._semaphores:
+            self._limits[model_name] = self.model_limit(model_name, loader.models[model_name]["type"])
+            self._semaphores[model_name] = asyncio.Semaphore(self._limits[model_name])
+            self._waiting[model_name] = 0
+        return self._semaphores[model_name]
+
+    # ── Pool dispatch ─────────────────────────────────────────────────────────
+
+    def _tracked(self, stats: _PoolStats, fn, *args):
+        with stats.lock:
+            stats.running += 1
+        try:
+            return fn(*args)
+        finally:
+            with stats.lock:
+                stats.running -= 1
+
+    async def run_in_thread(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        with self.thread_stats.lock:
+            self.thread_stats.submitted += 1
+        # Carry the request's context (endpoint label) into the worker thread
+        ctx = contextvars.copy_context()
+        try:
+            return await loop.run_in_executor(self.threads, ctx.run, self._tracked, self.thread_stats, fn, *args)
+        finally:
+            with self.thread_stats.lock:
+                self.thread_stats.completed += 1
+
+    async def run_in_process(self, fn, *args):
+        """Run on the process pool, or on the thread pool when it is disabled."""
+        if self.processes is None:
+            return await self.run_in_thread(fn, *args)
+        loop = asyncio.get_running_loop()
+        self.process_stats.submitted += 1
+        try:
+            return await loop.run_in_executor(self.processes, fn, *args)
+        finally:
+            self.process_stats.completed += 1
+
+    async def _limited(self, loader, model_name: str, coro_fn, *args):
+        sem = self._semaphore(loader, model_name)
+        self._waiting[model_name] += 1
+        t0 = time.perf_counter()
+        async with sem:
+            self._waiting[model_name] -= 1
+            telemetry.observe_stage("queue", time.perf_counter() - t0, model_name)
+            return await coro_fn(*args)
+
+    # ── Public API ────────────────────────────────────────────────────────────
+
+    async def predict(self, loader, model_name: str, text: str, processed: str = None) -> dict:
+        results = await self.predict_batch(
+            loader, model_name, [text], processed=None if processed is None else [processed]
+        )
+        return results[0]
+
+    async def predict_batch(self, loader, model_name: str, texts: list, batch_size: int = 32,
+                            processed: list = None) -> list:
+        return await self._limited(
+            loader, model_name, self.run_in_thread,
+            predict_batch_with_model, loader, model_name, texts, batch_size, processed,
+        )
+
+    async def preprocess(self, texts: list) -> list:
+        run = self.run_in_thread if len(texts) <= INLINE_PREPROCESS_MAX else self.run_in_process
+        with telemetry.stage("preprocess", "shared"):
+            return await run(preprocess_batch, texts)
+
+    async def explain(self, loader, model_name: str, text: str, num_features: int = 12,
+                      mode: str = "fast", num_samples: int = None, deadline_ms: float = None) -> list:
+        # Absolute from here on: waiting for a model slot or a pool worker uses up the budget too
+        params = (mode, num_samples, None if deadline_ms is None else time.time() + deadline_ms / 1000)
+        with telemetry.stage("explain", model_name):
+            if mode == "heuristic":
+                # No model calls: cheaper inline than a trip through a pool that may be backed up
+                return get_lime_explanation(loader, model_name, text, num_features, mode, num_samples, deadline_ms)
+            # Only the reference LimeTextExplainer (pure Python, string perturbations) is worth the IPC;
+            # the vectorized "fast" / "exact" explainers run on the thread pool
+            if mode == "lime" and loader.models[model_name]["type"] == "sklearn" and self.processes is not None:
+                words, fallbacks, errors = await self._limited(
+                    loader, model_name, self.run_in_process,
+                    _explain_in_worker, model_name, loader.versions.get(model_name), text, num_features, *params,
+                )
+                telemetry.FALLBACKS.merge(fallbacks)
+                telemetry.ERRORS.merge(errors)
+                return words
+            return await self._limited(
+                loader, model_name, self.run_in_thread,
+                _explain_by, loader, model_name, text, num_features, *params,
+            )
+
+    def stats(self) -> dict:
+        models = {}
+        for name, sem in self._semaphores.items():
+            models[name] = {
+                "limit": self._limits[name],
+                "in_flight": self._limits[name] - sem._value,
+                "waiting": self._waiting[name],
+            }
+        return {
+            "thread_pool": self.thread_stats.snapshot(),
+            "process_pool": self.process_stats.snapshot() if self.processes is not None else None,
+            "models": models,
+        }
@@ -3,9 +3,26 @@ LIME explanation service.
 Returns word-level importance weights for a given prediction.
 Falls back to a frequency-based heuristic when LIME is unavailable.
 """
+import os
 import re
+import time
 import numpy as np
-from services.preprocess import preprocess_text
+from models.onnx_runtime import BERT_MAX_LENGTH, LSTM_MAXLEN, softmax
+from services.preprocess import preprocess_text, preprocess_batch, clean_tokens, normalize_token
+from services import telemetry
+
+EXPLAIN_MODES = ("fast", "lime", "exact", "heuristic")
+DEFAULT_NUM_SAMPLES = 5000     # LimeTextExplainer default
+# Upper bound on a request's lime_samples: the sampler allocates num_samples × vocabulary floats
+MAX_NUM_SAMPLES = int(os.getenv("EXPLAIN_MAX_SAMPLES", 10_000))
+_KERNEL_WIDTH = 25             # LimeTextExplainer default
+_SCORE_CHUNK = 500             # perturbations scored per predict_proba call under a deadline
+
+_lime_explainer = None
+
+
+class PartialExplanation(list):
+    """Word weights from an explainer its deadline stopped before the whole sample budget was scored."""
 
 # Positive / negative word lists for fallback
 _POS = {
@@ -38,36 +55,313 @@ def _heuristic_explanation(text: str, n_words: int = 12) -> list:
     return result[:n_words]
 
 
-def get_lime_explanation(loader, model_name: str, text: str, num_features: int = 12) -> list:
+def _get_lime_explainer():
+    """One LimeTextExplainer for the process instead of one per request."""
+    global _lime_explainer
+    if _lime_explainer is None:
+        import lime.lime_text
+        _lime_explainer = lime.lime_text.LimeTextExplainer(class_names=["negative", "positive"])
+    return _lime_explainer
+
+
+def _lime_explanation(pipeline, text: str, num_features: int, num_samples: int,
+                      method: str = "lemmatize") -> list:
+    """Reference LIME path: lime's own sampler, preprocessing every perturbed string."""
+    def predict_fn(texts):
+        processed = preprocess_batch(texts, method)
+        return pipeline.predict_proba(processed)
+
+    exp = _get_lime_explainer().explain_instance(
+        text, predict_fn, num_features=num_features, num_samples=num_samples
+    )
+    return [
+        {"word": w, "weight": round(float(wt), 4)}
+        for w, wt in exp.as_list()
+    ]
+
+
+def fast_lime_explanation(pipeline, text: str, num_features: int = 12,
+                          num_samples: int = DEFAULT_NUM_SAMPLES, deadline_ms: float = None,
+                          seed: int = 0, method: str = "lemmatize") -> list:
+    """
+    LIME with the same sampling / kernel / ridge fit as LimeTextExplainer, but
+    each distinct word is preprocessed once and perturbations are built from a
+    token mask matrix, then scored with a single predict_proba call (or a few
+    chunks when a deadline is set).
+    """
+    t_start = time.perf_counter()
+    # Features are distinct words that survive preprocessing; dropped words can't move the score
+    words = clean_tokens(text)
+    normalized_by_word = {w: normalize_token(w, method) for w in words}
+    vocab = [w for w, n in normalized_by_word.items() if n]
+    if not vocab:
+        return []
+    col = {w: i for i, w in enumerate(vocab)}
+    normalized = [normalized_by_word[w] for w in vocab]
+    positions = [col[w] for w in words if w in col]
+
+    masks = _perturbation_masks(len(vocab), num_samples, seed)
+
+    def render(mask):
+        return ' '.join(normalized[c] for c in positions if mask[c])
+
+    if deadline_ms is None:
+        probas = pipeline.predict_proba([render(m) for m in masks])[:, 1]
+    else:
+        probas = _score_chunks(masks, lambda chunk: pipeline.predict_proba([render(m) for m in chunk])[:, 1],
+                               _SCORE_CHUNK, t_start, deadline_ms)
+    return _top_weights(vocab, masks, probas, num_features, seed)
+
+
+def _perturbation_masks(d: int, num_samples: int, seed: int) -> np.ndarray:
+    """
+    LimeTextExplainer's sampler as a (num_samples, d) keep-mask: row 0 is the
+    unperturbed text, every other row removes 1..d distinct words (a random
+    rank per cell; a word is dropped when its rank is below the row's removal count).
+    """
+    rs = np.random.RandomState(seed)
+    n_removed = np.concatenate([[0], rs.randint(1, d + 1, num_samples - 1)])
+    ranks = rs.rand(num_samples, d).argsort(axis=1)
+    return ranks >= n_removed[:, None]
+
+
+def _score_chunks(masks: np.ndarray, score_fn, chunk_size: int, t_start: float, deadline_ms: float = None):
+    """score_fn over consecutive chunks of masks, stopping after the chunk that passes the deadline."""
+    scored = []
+    for lo in range(0, len(masks), chunk_size):
+        scored.append(score_fn(masks[lo:lo + chunk_size]))
+        if deadline_ms is not None and (time.perf_counter() - t_start) * 1000 > deadline_ms:
+            break
+    return np.concatenate(scored)
+
+
+def _top_weights(vocab: list, masks: np.ndarray, probas: np.ndarray, num_features: int, seed: int) -> list:
+    """
+    LIME's kernel-weighted ridge fit of the positive-class probability on the keep-masks
+    (the first len(probas) of them; fewer scores than masks gives a PartialExplanation).
+    """
+    from sklearn.linear_model import Ridge
+    from sklearn.metrics.pairwise import cosine_distances
+
+    data = masks[:len(probas)].astype(float)
+    distances = cosine_distances(data, data[:1]).ravel() * 100
+    kernel = np.sqrt(np.exp(-(distances ** 2) / _KERNEL_WIDTH ** 2))
+    ridge = Ridge(alpha=1, fit_intercept=True, random_state=seed)
+    ridge.fit(data, probas, sample_weight=kernel)
+
+    order = np.argsort(-np.abs(ridge.coef_))[:num_features]
+    words = [{"word": vocab[i], "weight": round(float(ridge.coef_[i]), 4)} for i in order]
+    return PartialExplanation(words) if len(probas) < len(masks) else words
+
+
+def _linear_term_weights(pipeline):
+    """(vectorizer, per-term log-odds weight) for a TF-IDF → NB/LR pipeline."""
+    vectorizer = pipeline.steps[0][1]
+    clf = pipeline.steps[-1][1]
+    if len(pipeline.steps) != 2 or not hasattr(vectorizer, "vocabulary_"):
+        raise ValueError("exact attribution needs a two-step vectorizer → classifier pipeline")
+    if hasattr(clf, "coef_") and clf.coef_.shape[0] == 1:
+        return vectorizer, np.asarray(clf.coef_[0])
+    if hasattr(clf, "feature_log_prob_"):
+        return vectorizer, clf.feature_log_prob_[1] - clf.feature_log_prob_[0]
+    raise ValueError(f"exact attribution not supported for {type(clf).__name__}")
+
+
+def exact_linear_explanation(pipeline, text: str, num_features: int = 12, method: str = "lemmatize") -> list:
+    """
+    Exact per-term contribution to the positive-class log-odds:
+    TF-IDF value × (LR coefficient, or NB log-probability difference).
+    No sampling — one transform of the original text.
+    """
+    vectorizer, weights = _linear_term_weights(pipeline)
+    x = vectorizer.transform([preprocess_text(text, method)]).tocsr()
+    contrib = x.data * weights[x.indices]
+    names = vectorizer.get_feature_names_out()
+    order = np.argsort(-np.abs(contrib))[:num_features]
+    return [{"word": str(names[x.indices[i]]), "weight": round(float(contrib[i]), 4)} for i in order]
+
+
+# ── LSTM / DistilBERT ─────────────────────────────────────────────────────────
+
+# Perturbations per explanation and rows per forward pass: by default two batched passes
+DEEP_NUM_SAMPLES = {"lstm": int(os.getenv("EXPLAIN_SAMPLES_LSTM", 512)),
+                    "bert": int(os.getenv("EXPLAIN_SAMPLES_BERT", 128))}
+DEEP_BATCH_SIZE = {"lstm": int(os.getenv("EXPLAIN_BATCH_LSTM", 256)), "bert": int(os.getenv("EXPLAIN_BATCH_BERT", 64))}
+# Upper bound on a request's lime_samples for the deep models
+DEEP_MAX_SAMPLES = int(os.getenv("EXPLAIN_MAX_SAMPLES_DEEP", 1024))
+_WORD_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def _pack(keep: np.ndarray, token_ids: np.ndarray, maxlen: int, pad_id: int = 0) -> tuple:
+    """
+    All perturbations as one padded id matrix: row i holds token_ids[keep[i]]
+    in order, truncated after maxlen. Returns (ids, tokens per row).
+    """
+    pos = np.cumsum(keep, axis=1) - 1
+    rows, cols = np.nonzero(keep & (pos < maxlen))
+    ids = np.full((len(keep), maxlen), pad_id, dtype=np.int32)
+    ids[rows, pos[rows, cols]] = token_ids[cols]
+    return ids, np.minimum(keep.sum(axis=1), maxlen)
+
+
+def _lstm_scorer(model_entry, text: str) -> tuple:
+    """(features, score_fn, None) for the LSTM: the words preprocess_text keeps, scored on their sequence ids."""
+    words = clean_tokens(text)
+    normalized_by_word = {w: normalize_token(w) for w in words}
+    distinct = [w for w, n in normalized_by_word.items() if n]
+    ids_by_word = dict(zip(distinct, model_entry["tokenizer"].texts_to_sequences(
+        [normalized_by_word[w] for w in distinct])))
+    vocab = [w for w in distinct if ids_by_word[w]]
+    col = {w: i for i, w in enumerate(vocab)}
+    token_cols = np.array([col[w] for w in words if w in col for _ in ids_by_word[w]], dtype=np.intp)
+    token_ids = np.array([i for w in words if w in col for i in ids_by_word[w]], dtype=np.int32)
+    model = model_entry["model"]
+
+    def score(masks):
+        padded, _ = _pack(masks[:, token_cols], token_ids, LSTM_MAXLEN)
+        if model_entry.get("runtime") == "onnx":
+            return model.run(padded)[:, 0]
+        return model.predict(padded, batch_size=len(padded), verbose=0)[:, 0]
+
+    return vocab, score, None
+
+
+def _bert_scorer(model_entry, text: str) -> tuple:
+    """
+    (features, score_fn, length_fn) for DistilBERT. Each word is split into its word pieces
+    on its own, so every piece maps back to exactly one word; removing a word
+    removes all of its pieces. Punctuation is kept in every perturbation.
+    """
+    tok = model_entry["tokenizer"]
+    pieces = [(w.lower(), tok.tokenize(w)) for w in _WORD_RE.findall(text)]
+    vocab = list(dict.fromkeys(w for w, p in pieces if p and any(c.isalpha() for c in w)))
+    col = {w: i for i, w in enumerate(vocab)}
+    token_cols = np.array([col.get(w, -1) for w, p in pieces for _ in p], dtype=np.intp)
+    token_ids = np.array(tok.convert_tokens_to_ids([t for _, p in pieces for t in p]), dtype=np.int32)
+    fixed = token_cols < 0
+    model = model_entry["model"]
+    maxlen = BERT_MAX_LENGTH - 2   # room for [CLS] and [SEP]
+
+    def score(masks):
+        keep = np.where(fixed, True, masks[:, np.maximum(token_cols, 0)])
+        content, counts = _pack(keep, token_ids, maxlen, tok.pad_token_id)
+        width = int(counts.max()) + 2
+        input_ids = np.full((len(masks), width), tok.pad_token_id, dtype=np.int32)
+        input_ids[:, 0] = tok.cls_token_id
+        input_ids[:, 1:width - 1] = content[:, :width - 2]
+        input_ids[np.arange(len(masks)), counts + 1] = tok.sep_token_id
+        attention_mask = (np.arange(width) < (counts + 2)[:, None]).astype(np.int32)
+        if model_entry.get("runtime") == "onnx":
+            return softmax(model.run(input_ids=input_ids, attention_mask=attention_mask))[:, 1]
+        import tensorflow as tf
+        logits = model(input_ids=input_ids, attention_mask=attention_mask).logits
+        return tf.nn.softmax(logits, axis=-1).numpy()[:, 1]
+
+    def lengths(masks):
+        return np.where(fixed, True, masks[:, np.maximum(token_cols, 0)]).sum(axis=1)
+
+    return vocab, score, lengths
+
+
+def _length_bucketed_order(lengths: np.ndarray, batch: int, seed: int) -> np.ndarray:
+    """
+    Row order for scoring in passes of `batch`: each pass holds rows of similar
+    length (less padding), the passes come in random order, and row 0 (the
+    original text) stays first. A deadline that stops after a few passes
+    therefore keeps a random set of length buckets rather than the shortest rows.
+    """
+    n = len(lengths)
+    n_passes = -(-n // batch)
+    sizes = [min(batch, n - i * batch) for i in range(n_passes)]
+    sizes[0] -= 1
+    slot = np.random.RandomState(seed).permutation(n_passes)   # pass that the j-th shortest bucket goes to
+    by_length = 1 + np.argsort(lengths[1:], kind="stable")
+    buckets = np.split(by_length, np.cumsum([sizes[i] for i in slot])[:-1])
+    passes = [None] * n_passes
+    for bucket, i in zip(buckets, slot):
+        passes[i] = bucket
+    return np.concatenate([[0], *passes]).astype(np.intp)
+
+
+def occlusion_explanation(model_entry: dict, text: str, num_features: int = 12, num_samples: int = None,
+                          deadline_ms: float = None, seed: int = 0) -> list:
+    """
+    LIME for the LSTM / DistilBERT: the same word-removal sampling and ridge fit
+    as fast_lime_explanation, but each perturbation is built directly as a row
+    of token ids, so all of them go through the model as one padded tensor in
+    DEEP_BATCH_SIZE chunks — a fixed handful of batched forward passes instead
+    of one pass per perturbed string. num_samples is capped at DEEP_MAX_SAMPLES.
+    """
+    t_start = time.perf_counter()
+    mtype = model_entry["type"]
+    num_samples = min(num_samples or DEEP_NUM_SAMPLES[mtype], DEEP_MAX_SAMPLES)
+    vocab, score, lengths = (_lstm_scorer if mtype == "lstm" else _bert_scorer)(model_entry, text)
+    if not vocab:
+        return []
+    masks = _perturbation_masks(len(vocab), num_samples, seed)
+    batch = DEEP_BATCH_SIZE[mtype]
+    if lengths is not None:
+        masks = masks[_length_bucketed_order(lengths(masks), batch, seed)]
+    probas = _score_chunks(masks, score, batch, t_start, deadline_ms)
+    return _top_weights(vocab, masks, probas, num_features, seed)
+
+
+def get_lime_explanation(loader, model_name: str, text: str, num_features: int = 12,
+                         mode: str = "fast", num_samples: int = None, deadline_ms: float = None) -> list:
     """
     Generate LIME word-importance explanation.
-    Uses real LIME for sklearn pipelines; heuristic fallback for others.
+    Uses real LIME for sklearn pipelines, batched occlusion LIME for the
+    LSTM / DistilBERT and the keyword heuristic for demo stubs.
+
+    mode: "fast"  — token-mask LIME scored in one vectorized call (default)
+          "lime"  — the reference LimeTextExplainer path (sklearn only)
+          "exact" — coefficient × TF-IDF attribution, no sampling (sklearn only)
+          "heuristic" — keyword list only, no model calls (used under overload)
+    num_samples bounds the perturbation count (capped at MAX_NUM_SAMPLES, and
+    DEEP_MAX_SAMPLES for the deep models); deadline_ms stops scoring early.
     """
     model_entry = loader.models.get(model_name)
     if model_entry is None:
         return []
 
+    if mode == "heuristic":
+        return _heuristic_explanation(text, num_features)
+
     mtype = model_entry.get("type")
 
     # Real LIME for sklearn
     if mtype == "sklearn":
+        num_samples = min(num_samples or DEFAULT_NUM_SAMPLES, MAX_NUM_SAMPLES)
+        pipeline = model_entry["pipeline"]
+        method = model_entry.get("preprocessing", "lemmatize")
+        try:
+            if mode == "exact":
+                try:
+                    return exact_linear_explanation(pipeline, text, num_features, method)
+                except ValueError:
+                    telemetry.record_fallback(model_name, "fast_explainer", "exact_unsupported")
+                    mode = "fast"
+            if mode == "lime":
+                return _lime_explanation(pipeline, text, num_features, num_samples, method)
+            return fast_lime_explanation(pipeline, text, num_features, num_samples, deadline_ms, method=method)
+        except Exception as e:
+            print(f"LIME failed for {model_name}: {type(e).__name__}: {e}; using heuristic explanation")
+            telemetry.record_error("explain", e)
+            telemetry.record_fallback(model_name, "heuristic_explainer", "explainer_error")
+            return _heuristic_explanation(text, num_features)
+
+    # Batched occlusion LIME for the deep models, whichever sampling mode was asked for
+    if mtype in ("lstm", "bert"):
+        if mode == "exact":
+            telemetry.record_fallback(model_name, "fast_explainer", "exact_unsupported")
         try:
-            import lime.lime_text
-            pipeline = model_entry["pipeline"]
-
-            def predict_fn(texts):
-                processed = [preprocess_text(t) for t in texts]
-                return pipeline.predict_proba(processed)
-
-            explainer = lime.lime_text.LimeTextExplainer(class_names=["negative", "positive"])
-            exp = explainer.explain_instance(text, predict_fn, num_features=num_features)
-            return [
-                {"word": w, "weight": round(float(wt), 4)}
-                for w, wt in exp.as_list()
-            ]
+            return occlusion_explanation(model_entry, text, num_features, num_samples, deadline_ms)
         except Exception as e:
-            print(f"LIME failed for {model_name}: {e}")
+            print(f"Occlusion failed for {model_name}: {type(e).__name__}: {e}; using heuristic explanation")
+            telemetry.record_error("explain", e)
+            telemetry.record_fallback(model_name, "heuristic_explainer", "explainer_error")
             return _heuristic_explanation(text, num_features)
 
-    # Heuristic for demo / deep learning models
+    # Heuristic for demo models
+    telemetry.record_fallback(model_name, "heuristic_explainer", "unsupported_model")
     return _heuristic_explanation(text, num_features)
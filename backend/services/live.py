@@ -0,0 +1,213 @@
+"""
+Per-connection state for live (as-you-type) prediction over the WebSocket.
+
+Every update carries the whole text. The changed span is found from the
+common prefix / suffix with the previous text and widened to whole words
+(whole lines where the line holds an HTML tag, since tag stripping can join
+words), and only those units are preprocessed again.
+
+For Naive Bayes / Logistic Regression with a native linear scorer the TF-IDF
+term counts are kept as well: the n-grams touching the replaced tokens are
+subtracted and the new ones added, so a keystroke costs a few dictionary
+updates and one sparse dot product instead of a full transform.
+"""
+import re
+from collections import Counter
+from itertools import chain
+
+from services.predict import _proba_to_result
+from services.preprocess import preprocess_batch
+
+# Whitespace as the preprocessing regexes see it (ASCII mode); anything else is part of a word
+_WS = " \t\n\r\f\v"
+_UNIT_RE = re.compile(r"[^ \t\n\r\f\v]+")
+
+DEEP_TYPES = ("lstm", "bert")
+
+
+def _common_prefix(a: str, b: str) -> int:
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[:mid] == b[:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _common_suffix(a: str, b: str, limit: int) -> int:
+    lo, hi = 0, limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[len(a) - mid:] == b[len(b) - mid:]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _line(text: str, pos: int) -> tuple:
+    end = text.find("\n", pos)
+    return text.rfind("\n", 0, pos) + 1, len(text) if end < 0 else end
+
+
+def _widen(text: str, start: int, stop: int) -> tuple:
+    """Grow [start, stop) to unit boundaries: whole words, or the whole line if it has a tag."""
+    line_start, line_end = _line(text, start)
+    if "<" in text[line_start:line_end]:
+        start = line_start
+    else:
+        while start > 0 and text[start - 1] not in _WS:
+            start -= 1
+    line_start, line_end = _line(text, stop)
+    if "<" in text[line_start:line_end]:
+        stop = line_end
+    else:
+        while stop < len(text) and text[stop] not in _WS:
+            stop += 1
+    return start, stop
+
+
+def _units(text: str, start: int, stop: int) -> list:
+    """(start, end) of the units in text[start:stop], which must be aligned to unit boundaries."""
+    units = []
+    pos = start
+    while pos < stop:
+        newline = text.find("\n", pos, stop)
+        line_end = stop if newline < 0 else newline
+        if "<" in text[pos:line_end]:
+            units.append((pos, line_end))
+        else:
+            units.extend(m.span() for m in _UNIT_RE.finditer(text, pos, line_end))
+        pos = line_end + 1
+    return units
+
+
+class LiveText:
+    """A text and its preprocessed words, kept per unit so an edit only reprocesses what it touched."""
+
+    def __init__(self, method: str = "lemmatize"):
+        self.method = method
+        self.text = ""
+        self.units = []     # [start, end, preprocessed words] in text order
+
+    def update(self, text: str) -> tuple:
+        """Switch to a new version of the text; returns (first unit, units removed, units added)."""
+        old = self.text
+        prefix = _common_prefix(old, text)
+        suffix = _common_suffix(old, text, min(len(old), len(text)) - prefix)
+        delta = len(text) - len(old)
+        start, stop = prefix, len(text) - suffix
+        while True:
+            start, stop = _widen(text, start, stop)
+            # Old units overlapping the span (a tag line that lost its tag may reach past it)
+            first = next((i for i, u in enumerate(self.units) if u[1] > start), len(self.units))
+            last = first
+            while last < len(self.units) and self.units[last][0] < stop - delta:
+                last += 1
+            if first == last:
+                break
+            wider = min(start, self.units[first][0]), max(stop, self.units[last - 1][1] + delta)
+            if wider == (start, stop):
+                break
+            start, stop = wider
+
+        spans = _units(text, start, stop)
+        processed = preprocess_batch([text[s:e] for s, e in spans], self.method)
+        for unit in self.units[last:]:
+            unit[0] += delta
+            unit[1] += delta
+        self.units[first:last] = [[s, e, p.split()] for (s, e), p in zip(spans, processed)]
+        self.text = text
+        return first, last - first, len(spans)
+
+    def processed(self) -> str:
+        """Same as preprocess_text(text, method)."""
+        return " ".join(chain.from_iterable(u[2] for u in self.units))
+
+
+class LiveScore:
+    """Term counts of a LiveText under one linear scorer, updated from the units an edit replaced."""
+
+    def __init__(self, scorer):
+        self.scorer = scorer
+        self.unit_tokens = []   # scorer tokens per unit
+        self.tokens = []
+        self.counts = Counter()
+
+    def _count(self, terms: list, sign: int):
+        vocabulary, counts = self.scorer.vocabulary, self.counts
+        for j in map(vocabulary.get, terms):
+            if j is not None:
+                counts[j] += sign
+                if not counts[j]:
+                    del counts[j]
+
+    def apply(self, units: list, first: int, removed: int, added: int):
+        new_tokens = [self.scorer.tokens(" ".join(u[2])) for u in units[first:first + added]]
+        start = sum(map(len, self.unit_tokens[:first]))
+        stop = start + sum(map(len, self.unit_tokens[first:first + removed]))
+        # n-grams overlapping the replaced tokens go, those overlapping their replacement come in
+        self._count(self.scorer.ngrams(self.tokens, start, stop), -1)
+        flat = list(chain.from_iterable(new_tokens))
+        self.tokens[start:stop] = flat
+        self.unit_tokens[first:first + removed] = new_tokens
+        self._count(self.scorer.ngrams(self.tokens, start, start + len(flat)), 1)
+
+    def predict(self) -> dict:
+        return _proba_to_result(self.scorer.predict_proba([None], [self.counts])[0])
+
+
+class LiveSession:
+    def __init__(self, loader):
+        self.loader = loader
+        self.texts = {}     # preprocessing method -> LiveText
+        self.scores = {}    # model name -> (model version, LiveScore)
+
+    def _method(self, model_name: str) -> str:
+        return self.loader.models[model_name].get("preprocessing", "lemmatize")
+
+    def incremental(self, model_name: str) -> bool:
+        entry = self.loader.models[model_name]
+        scorer = entry.get("scorer")
+        return entry["type"] == "sklearn" and scorer is not None and scorer.incremental
+
+    def debounced(self, model_name: str) -> bool:
+        return self.loader.models[model_name]["type"] in DEEP_TYPES
+
+    def update(self, text: str, model_names: list) -> dict:
+        """
+        Apply a new text for these models; returns what was reprocessed and the
+        incremental predictions {model: result}.
+        """
+        methods = {"lemmatize"} | {self._method(m) for m in model_names if self.incremental(m)}
+        edits = {}
+        for method in methods:
+            live = self.texts.setdefault(method, LiveText(method))
+            edits[method] = live.update(text)
+
+        predictions = {}
+        for name in model_names:
+            if not self.incremental(name):
+                continue
+            version = self.loader.versions.get(name)
+            live = self.texts[self._method(name)]
+            cached = self.scores.get(name)
+            if cached is None or cached[0] != version:
+                score = LiveScore(self.loader.models[name]["scorer"])
+                score.apply(live.units, 0, 0, len(live.units))
+                self.scores[name] = (version, score)
+            else:
+                cached[1].apply(live.units, *edits[live.method])
+            predictions[name] = {**self.scores[name][1].predict(), "model_version": version}
+        for name in list(self.scores):
+            if name not in model_names:
+                del self.scores[name]
+
+        first, removed, added = edits["lemmatize"]
+        return {"units": len(self.texts["lemmatize"].units), "reprocessed_units": added,
+                "replaced_units": removed, "predictions": predictions}
+
+    def processed(self) -> str:
+        return self.texts["lemmatize"].processed() if "lemmatize" in self.texts else ""
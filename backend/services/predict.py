@@ -4,7 +4,9 @@ Demo stubs return heuristic-based results when real models aren't loaded.
 """
 import re
 import numpy as np
-from services.preprocess import preprocess_text
+from models.onnx_runtime import BERT_MAX_LENGTH, LSTM_MAXLEN, pad_post, softmax
+from services.preprocess import preprocess_batch
+from services import telemetry
 
 # Simple keyword heuristic for demo mode
 _POS_WORDS = set([
@@ -34,54 +36,125 @@ def _demo_predict(text: str, seed_offset: int = 0) -> dict:
     return {"sentiment": sentiment, "confidence": round(float(confidence), 4)}
 
 
+def _proba_to_result(proba) -> dict:
+    """Turn a [p_negative, p_positive] row into the API result dict."""
+    idx = int(np.argmax(proba))
+    return {
+        "sentiment": "positive" if idx == 1 else "negative",
+        "confidence": round(float(proba[idx]), 4),
+    }
+
+
+def _bert_length_buckets(lengths, batch_size: int):
+    """Group item indices by token length so each mini-batch pads to a similar size."""
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    return [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+
+
 def predict_with_model(loader, model_name: str, text: str) -> dict:
-    model_entry = loader.models.get(model_name)
+    return predict_batch_with_model(loader, model_name, [text])[0]
+
+
+def predict_batch_with_model(loader, model_name: str, texts: list, batch_size: int = 32,
+                             processed: list = None, model_entry: dict = None) -> list:
+    """
+    Vectorized prediction for a list of texts.
+    Preprocesses the whole list once, then makes one model call per batch
+    instead of one per text. Results come back in input order, each with the
+    `model_version` that produced it.
+    Pass `processed` (preprocess_text output per text) to skip preprocessing,
+    and `model_entry` to run a specific entry (e.g. a staged reload) instead
+    of the one currently registered.
+    """
+    # One lookup per call: a hot reload swapping the entry mid-batch does not mix versions
+    model_entry = model_entry or loader.models.get(model_name)
     if model_entry is None:
         raise ValueError(f"Model '{model_name}' not found")
+    if not texts:
+        return []
+    results = _predict_entry(model_name, model_entry, texts, batch_size, processed)
+    version = model_entry.get("version")
+    for r in results:
+        r["model_version"] = version
+    return results
+
 
+def _predict_entry(model_name: str, model_entry: dict, texts: list, batch_size: int, processed: list) -> list:
     mtype = model_entry["type"]
 
     # ── Demo stub ─────────────────────────────────────────────────────────────
     if mtype == "demo":
+        telemetry.record_fallback(model_name, "demo_stub", model_entry.get("reason", "no_artifact"), len(texts))
         offsets = {"naive_bayes": 0, "logistic_regression": 10, "rnn_lstm": 20, "distilbert": 30}
-        return _demo_predict(text, offsets.get(model_name, 0))
+        return [_demo_predict(t, offsets.get(model_name, 0)) for t in texts]
 
     # ── Scikit-learn pipeline ─────────────────────────────────────────────────
     if mtype == "sklearn":
         pipeline = model_entry["pipeline"]
-        processed = preprocess_text(text)
-        proba = pipeline.predict_proba([processed])[0]
-        idx = int(np.argmax(proba))
-        return {
-            "sentiment": "positive" if idx == 1 else "negative",
-            "confidence": round(float(proba[idx]), 4),
-        }
+        method = model_entry.get("preprocessing", "lemmatize")
+        # Shared `processed` texts are lemmatized; recompute for models trained on another method
+        if processed is None or method != "lemmatize":
+            with telemetry.stage("preprocess", model_name):
+                processed = preprocess_batch(texts, method)
+        scorer = model_entry.get("scorer")
+        if scorer is not None:
+            with telemetry.stage("vectorize", model_name):
+                features = [scorer.features(doc) for doc in processed]
+            with telemetry.stage("infer", model_name):
+                probas = scorer.predict_proba(processed, features)
+        else:
+            with telemetry.stage("vectorize", model_name):
+                features = pipeline[:-1].transform(processed)
+            with telemetry.stage("infer", model_name):
+                probas = pipeline[-1].predict_proba(features)
+        return [_proba_to_result(p) for p in probas]
 
     # ── LSTM ──────────────────────────────────────────────────────────────────
     if mtype == "lstm":
-        from tensorflow.keras.preprocessing.sequence import pad_sequences
         model = model_entry["model"]
-        processed = preprocess_text(text)
-        seq = loader.tokenizer.texts_to_sequences([processed])
-        padded = pad_sequences(seq, maxlen=200, padding='post', truncating='post')
-        prob = float(model.predict(padded, verbose=0)[0][0])
-        sentiment = "positive" if prob > 0.5 else "negative"
-        confidence = prob if prob > 0.5 else 1 - prob
-        return {"sentiment": sentiment, "confidence": round(confidence, 4)}
+        if processed is None:
+            with telemetry.stage("preprocess", model_name):
+                processed = preprocess_batch(texts)
+        with telemetry.stage("vectorize", model_name):
+            seqs = model_entry["tokenizer"].texts_to_sequences(processed)
+            padded = pad_post(seqs, LSTM_MAXLEN)
+        with telemetry.stage("infer", model_name):
+            if model_entry.get("runtime") == "onnx":
+                probs = np.concatenate([model.run(padded[i:i + batch_size])[:, 0]
+                                        for i in range(0, len(padded), batch_size)])
+            else:
+                probs = model.predict(padded, batch_size=batch_size, verbose=0)[:, 0]
+        results = []
+        for prob in probs:
+            prob = float(prob)
+            sentiment = "positive" if prob > 0.5 else "negative"
+            confidence = prob if prob > 0.5 else 1 - prob
+            results.append({"sentiment": sentiment, "confidence": round(confidence, 4)})
+        return results
 
     # ── DistilBERT ────────────────────────────────────────────────────────────
     if mtype == "bert":
-        import tensorflow as tf
         model = model_entry["model"]
-        enc = loader.bert_tokenizer(
-            text, return_tensors="tf", truncation=True, padding=True, max_length=128
-        )
-        logits = model(**enc).logits
-        probs = tf.nn.softmax(logits, axis=-1).numpy()[0]
-        idx = int(np.argmax(probs))
-        return {
-            "sentiment": "positive" if idx == 1 else "negative",
-            "confidence": round(float(probs[idx]), 4),
-        }
+        onnx = model_entry.get("runtime") == "onnx"
+        tok = model_entry["tokenizer"]
+        with telemetry.stage("vectorize", model_name):
+            enc = tok(list(texts), truncation=True, max_length=BERT_MAX_LENGTH)
+        lengths = [len(ids) for ids in enc["input_ids"]]
+        results = [None] * len(texts)
+        for bucket in _bert_length_buckets(lengths, batch_size):
+            batch = tok.pad(
+                {k: [enc[k][i] for i in bucket] for k in enc.keys()},
+                padding=True, return_tensors="np" if onnx else "tf",
+            )
+            with telemetry.stage("infer", model_name):
+                if onnx:
+                    probs = softmax(model.run(**batch))
+                else:
+                    import tensorflow as tf
+                    logits = model(**batch).logits
+                    probs = tf.nn.softmax(logits, axis=-1).numpy()
+            for i, p in zip(bucket, probs):
+                results[i] = _proba_to_result(p)
+        return results
 
     raise ValueError(f"Unknown model type: {mtype}")
@@ -1,38 +1,100 @@
 """
 Text preprocessing pipeline — same as used during training.
+Per-token lemma/stem results are memoized in a bounded LRU cache, and
+preprocess_batch handles whole corpora (optionally across processes).
 """
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 
 try:
     import nltk
-    from nltk.stem import WordNetLemmatizer
+    from nltk.stem import WordNetLemmatizer, PorterStemmer
     from nltk.corpus import stopwords
     nltk.download('stopwords', quiet=True)
     nltk.download('wordnet', quiet=True)
     nltk.download('omw-1.4', quiet=True)
     _stop_words = set(stopwords.words('english'))
     _lemmatizer = WordNetLemmatizer()
+    _stemmer = PorterStemmer()
     _NLTK_AVAILABLE = True
 except Exception:
     _NLTK_AVAILABLE = False
     _stop_words = set()
 
-def preprocess_text(text: str, method: str = "lemmatize") -> str:
-    """Clean text exactly as done during training."""
+_HTML_RE = re.compile(r'<.*?>')
+_NON_ALPHA_RE = re.compile(r'[^a-zA-Z\s]', flags=re.I | re.A)
+
+# Max distinct (token, method) pairs kept in the normalization cache
+TOKEN_CACHE_SIZE = int(os.getenv("PREPROCESS_TOKEN_CACHE_SIZE", 200_000))
+
+
+def clean_tokens(text: str) -> list:
+    """Strip HTML and non-alphabetic chars, lowercase, split into raw tokens."""
     # Remove HTML tags
-    text = re.sub(r'<.*?>', '', text)
+    text = _HTML_RE.sub('', text)
     # Remove non-alphabetic chars, lowercase
-    text = re.sub(r'[^a-zA-Z\s]', '', text, flags=re.I | re.A).lower()
-    tokens = text.split()
+    text = _NON_ALPHA_RE.sub('', text).lower()
+    return text.split()
+
 
+@lru_cache(maxsize=TOKEN_CACHE_SIZE)
+def normalize_token(token: str, method: str = "lemmatize") -> str:
+    """Stopword-filter and lemmatize/stem one clean token; '' if it is dropped."""
     if _NLTK_AVAILABLE:
+        if token in _stop_words:
+            return ''
         if method == "stem":
-            from nltk.stem import PorterStemmer
-            stemmer = PorterStemmer()
-            processed = [stemmer.stem(w) for w in tokens if w not in _stop_words]
-        else:
-            processed = [_lemmatizer.lemmatize(w) for w in tokens if w not in _stop_words]
-    else:
-        processed = [w for w in tokens if len(w) > 2]  # minimal fallback
-
-    return ' '.join(processed)
+            return _stemmer.stem(token)
+        return _lemmatizer.lemmatize(token)
+    return token if len(token) > 2 else ''  # minimal fallback
+
+
+def token_cache_info() -> dict:
+    info = normalize_token.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "size": info.currsize,
+        "max_size": info.maxsize,
+        "hit_rate": round(info.hits / lookups, 4) if lookups else 0.0,
+    }
+
+
+def preprocess_text(text: str, method: str = "lemmatize") -> str:
+    """Clean text exactly as done during training."""
+    return _preprocess_chunk([text], method)[0]
+
+
+def _preprocess_chunk(texts: list, method: str) -> list:
+    html_sub, non_alpha_sub = _HTML_RE.sub, _NON_ALPHA_RE.sub
+    out = []
+    if not _NLTK_AVAILABLE:
+        for text in texts:
+            tokens = non_alpha_sub('', html_sub('', text)).lower().split()
+            out.append(' '.join([w for w in tokens if len(w) > 2]))
+        return out
+    norm = normalize_token
+    for text in texts:
+        tokens = non_alpha_sub('', html_sub('', text)).lower().split()
+        out.append(' '.join([p for p in [norm(w, method) for w in tokens] if p]))
+    return out
+
+
+def preprocess_batch(texts: list, method: str = "lemmatize", n_jobs: int = 1, chunksize: int = 2000) -> list:
+    """
+    preprocess_text over a list of documents in one pass.
+    With n_jobs > 1, corpora larger than one chunk are split across a
+    process pool (each worker keeps its own token cache).
+    """
+    texts = list(texts)
+    if n_jobs <= 1 or len(texts) <= chunksize:
+        return _preprocess_chunk(texts, method)
+    chunks = [texts[i:i + chunksize] for i in range(0, len(texts), chunksize)]
+    out = []
+    with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        for part in pool.map(_preprocess_chunk, chunks, [method] * len(chunks)):
+            out.extend(part)
+    return out
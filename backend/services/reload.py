@@ -0,0 +1,166 @@
+"""
+Zero-downtime model hot reload.
+
+A reload (POST /admin/models/{name}/reload, or the file watcher on
+models/saved when MODEL_WATCH=1) handles one model at a time: the new
+artifact is loaded next to the serving version, warmed up with inferences at
+representative batch sizes (MODEL_WARMUP_BATCHES), then swapped into
+ModelLoader.models with a single dict assignment. Requests that already
+picked up the old entry finish on it; the old entry is tracked through a weak
+reference until the last of them lets go and it is freed.
+
+The watcher only reloads once an artifact has stopped changing for a whole
+poll interval (MODEL_WATCH_INTERVAL_S), so a model being written is not
+picked up half-way. Each server process reloads its own copy.
+"""
+import gc
+import os
+import threading
+import time
+import weakref
+from collections import deque
+from datetime import datetime, timezone
+from itertools import cycle, islice
+
+from models.loader import ReloadInProgress
+from services import telemetry
+from services.predict import predict_batch_with_model
+
+# Short, long and mixed reviews, so length-bucketed models warm up more than one shape
+WARMUP_REVIEWS = [
+    "Great film.",
+    "Terrible acting and a plot that goes nowhere. I walked out halfway through.",
+    "The visuals are stunning and the soundtrack is excellent, but the storyline falls apart in the third "
+    "act. Some great moments, ultimately a disappointing experience.",
+    "An absolute masterpiece! The performances were breathtaking, the cinematography stunning, and the "
+    "story was deeply moving. One of the best films I've ever seen, and I have seen a lot of films over "
+    "the years. A must-watch for anyone who loves cinema.<br /><br />Ten out of ten.",
+]
+DEFAULT_WARMUP_BATCHES = (1, 8, 32)
+HISTORY = 20
+DRAIN_POLL_S = 0.1
+
+
+def warm_up(loader, model_name: str, entry: dict, batch_sizes=DEFAULT_WARMUP_BATCHES) -> dict:
+    """Run the staged entry once per batch size; returns {batch size: ms}."""
+    telemetry.current_endpoint.set("warmup")
+    times = {}
+    for size in batch_sizes:
+        texts = list(islice(cycle(WARMUP_REVIEWS), size))
+        t0 = time.perf_counter()
+        predict_batch_with_model(loader, model_name, texts, batch_size=size, model_entry=entry)
+        times[size] = round((time.perf_counter() - t0) * 1000, 1)
+    return times
+
+
+class ModelReloader:
+    def __init__(self, loader, watch: bool = False, interval_s: float = 5.0,
+                 warmup_batches=DEFAULT_WARMUP_BATCHES, drain_timeout_s: float = 60.0):
+        self.loader = loader
+        self.watch = watch
+        self.interval_s = interval_s
+        self.warmup_batches = tuple(warmup_batches)
+        self.drain_timeout_s = drain_timeout_s
+        self.history = deque(maxlen=HISTORY)
+        self._failed = {}     # model name -> disk version whose reload failed; the watcher skips it
+        self._stop = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_env(cls, loader) -> "ModelReloader":
+        batches = os.getenv("MODEL_WARMUP_BATCHES")
+        return cls(
+            loader,
+            watch=os.getenv("MODEL_WATCH", "0") == "1",
+            interval_s=float(os.getenv("MODEL_WATCH_INTERVAL_S", 5)),
+            warmup_batches=[int(b) for b in batches.split(",") if b.strip()] if batches else DEFAULT_WARMUP_BATCHES,
+            drain_timeout_s=float(os.getenv("MODEL_DRAIN_TIMEOUT_S", 60)),
+        )
+
+    # ── Reload ────────────────────────────────────────────────────────────────
+
+    def reload(self, model_name: str, source: str = "admin", wait: bool = True) -> dict:
+        """
+        Reload one model and return its record. Raises ReloadInProgress when
+        another reload is running and wait is False.
+        """
+        record = {"model": model_name, "source": source, "outcome": None,
+                  "old_version": self.loader.versions.get(model_name), "new_version": None,
+                  "load_ms": None, "warmup_ms": None, "error": None, "drain": None,
+                  "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds")}
+        try:
+            info = self.loader.reload_model(
+                model_name, lambda name, entry: warm_up(self.loader, name, entry, self.warmup_batches), wait=wait)
+        except ReloadInProgress:
+            raise
+        except Exception as e:
+            print(f"  {model_name} reload failed ({type(e).__name__}: {e}); still serving {record['old_version']}")
+            telemetry.record_error("model_reload", e)
+            telemetry.MODEL_RELOADS.inc(model=model_name, outcome="failed")
+            record.update(outcome="failed", error=str(e))
+            self.history.append(record)
+            return record
+
+        record.update(new_version=info["new"]["version"], load_ms=round(info["load_ms"], 1),
+                      warmup_ms=info["warmup_ms"], outcome="swapped" if info["swapped"] else "unchanged")
+        telemetry.MODEL_RELOADS.inc(model=model_name, outcome=record["outcome"])
+        self._failed.pop(model_name, None)
+        if info["swapped"] and info["old"] is not None:
+            record["drain"] = {"state": "draining", "ms": None}
+            retired = weakref.ref(info["old"])
+            info = None   # the only strong references left are the requests still using the old entry
+            threading.Thread(target=self._drain, args=(retired, record), daemon=True, name="model-drain").start()
+            print(f" {model_name} reloaded: {record['old_version']} → {record['new_version']} "
+                  f"(load {record['load_ms']} ms, warm-up {record['warmup_ms']})")
+        self.history.append(record)
+        return record
+
+    def _drain(self, retired, record: dict):
+        """Wait for in-flight requests to drop the old entry; collect cycles once if they hold on past the timeout."""
+        t0 = time.perf_counter()
+        deadline = time.monotonic() + self.drain_timeout_s
+        while retired() is not None and time.monotonic() < deadline:
+            time.sleep(DRAIN_POLL_S)
+        if retired() is not None:
+            gc.collect()
+        record["drain"] = {"state": "released" if retired() is None else "referenced",
+                           "ms": round((time.perf_counter() - t0) * 1000, 1)}
+
+    # ── File watcher ──────────────────────────────────────────────────────────
+
+    def start(self):
+        """Called from app startup (after any fork), so each server process watches for itself."""
+        if not self.watch or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="model-watch")
+        self._thread.start()
+        print(f" Watching saved models for changes every {self.interval_s:g}s")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        seen = {}   # model name -> disk version on the previous poll, while it differs from the loaded one
+        while not self._stop.wait(self.interval_s):
+            changed = {name: self.loader.disk_version(name) for name in self.loader.changed_on_disk()}
+            for name, version in changed.items():
+                # Unchanged for a whole interval: done being written
+                if seen.get(name) == version and self._failed.get(name) != version:
+                    record = self.reload(name, source="watch")
+                    if record["outcome"] == "failed":
+                        self._failed[name] = version
+            seen = changed
+
+    def status(self) -> dict:
+        return {
+            "watching": self._thread is not None,
+            "interval_s": self.interval_s,
+            "warmup_batches": list(self.warmup_batches),
+            "versions": dict(self.loader.versions),
+            "changed_on_disk": self.loader.changed_on_disk(),
+            "reloads": list(self.history),
+        }
@@ -0,0 +1,280 @@
+"""
+In-process instrumentation: per-stage latency histograms, fallback counters
+and in-flight gauges, rendered in the Prometheus text exposition format,
+plus a sampling profiler that can be switched on at runtime.
+
+Stages are recorded with the model and the endpoint that triggered them.
+The endpoint comes from a context variable set by the HTTP middleware;
+work handed to the executor's thread pool carries the context along.
+"""
+import contextvars
+import sys
+import threading
+import time
+import traceback
+from collections import Counter as _Tally
+from contextlib import contextmanager
+
+# Latency buckets in seconds: 0.5 ms … 30 s
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+STAGES = ("queue", "preprocess", "vectorize", "infer", "explain", "serialize")
+
+# Endpoint (route path) of the request being served; "internal" outside a request
+current_endpoint = contextvars.ContextVar("current_endpoint", default="internal")
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self) -> list:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def drain(self) -> dict:
+        """Return and reset the counts (used to ship counts out of pool workers)."""
+        with self._lock:
+            values, self._values = self._values, {}
+        return values
+
+    def merge(self, values: dict):
+        with self._lock:
+            for key, amount in values.items():
+                self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> list:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}_total{_labels(self.labelnames, k)} {v}" for k, v in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> list:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, k)} {v}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}        # label values -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def snapshot(self, **labels) -> dict:
+        series = self._series.get(self._key(labels))
+        if series is None:
+            return {"count": 0, "sum": 0.0}
+        return {"count": series[-1], "sum": series[-2]}
+
+    def _samples(self) -> list:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        lines = []
+        for key, series in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, series):
+                cumulative += n
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {series[-1]}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {series[-2]}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {series[-1]}")
+        return lines
+
+
+# ── Metrics ───────────────────────────────────────────────────────────────────
+
+STAGE_SECONDS = Histogram(
+    "sentiment_stage_seconds", "Time spent per processing stage", ("stage", "model", "endpoint"))
+REQUEST_SECONDS = Histogram(
+    "sentiment_request_seconds", "End-to-end HTTP request latency", ("endpoint", "method", "status"))
+IN_FLIGHT = Gauge("sentiment_requests_in_flight", "HTTP requests currently being served", ("endpoint",))
+FALLBACKS = Counter(
+    "sentiment_fallbacks", "Predictions served by a demo stub or explanations by the heuristic explainer",
+    ("model", "kind", "reason"))
+ERRORS = Counter("sentiment_errors", "Exceptions caught and handled, by component", ("component", "error"))
+CASCADE_ANSWERS = Counter("sentiment_cascade_answers", "Requests to the auto model, by the tier that answered", ("tier",))
+
+LIVE_UPDATES = Counter(
+    "sentiment_live_updates", "Live-typing updates, by outcome (applied / dropped as stale / settled)", ("outcome",))
+
+DEGRADATIONS = Counter(
+    "sentiment_degradations", "Admission decisions on /predict and /predict/compare, by model and ladder level",
+    ("model", "level"))
+
+MODEL_RELOADS = Counter(
+    "sentiment_model_reloads", "Model hot reloads, by model and outcome (swapped / unchanged / failed)",
+    ("model", "outcome"))
+
+REGISTRY = [STAGE_SECONDS, REQUEST_SECONDS, IN_FLIGHT, FALLBACKS, ERRORS, CASCADE_ANSWERS, LIVE_UPDATES, DEGRADATIONS,
+            MODEL_RELOADS]
+
+
+def observe_stage(stage: str, seconds: float, model: str = "", endpoint: str = None):
+    STAGE_SECONDS.observe(seconds, stage=stage, model=model, endpoint=endpoint or current_endpoint.get())
+
+
+@contextmanager
+def stage(name: str, model: str = ""):
+    """Time a block as one stage of the current request."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - t0, model)
+
+
+def record_fallback(model: str, kind: str, reason: str, n: int = 1):
+    FALLBACKS.inc(n, model=model, kind=kind, reason=reason)
+
+
+def record_error(component: str, exc: BaseException):
+    ERRORS.inc(component=component, error=type(exc).__name__)
+
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ── Sampling profiler ─────────────────────────────────────────────────────────
+
+class SamplingProfiler:
+    """
+    Samples every thread's Python stack at a fixed interval from a daemon
+    thread and tallies them as folded stacks ("a;b;c count"), the input
+    format of flamegraph.pl / speedscope. Costs nothing while stopped.
+    """
+
+    def __init__(self):
+        self.interval_s = 0.005
+        self.samples = 0
+        self.started_at = None
+        self.stopped_at = None
+        self._stacks = _Tally()
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval_ms: float = 5.0, duration_s: float = 30.0):
+        with self._lock:
+            if self.running:
+                raise RuntimeError("profiler is already running")
+            self.interval_s = max(interval_ms, 0.5) / 1000
+            self.samples = 0
+            self._stacks = _Tally()
+            self._stop.clear()
+            self.started_at, self.stopped_at = time.time(), None
+            self._thread = threading.Thread(target=self._run, args=(duration_s,), daemon=True, name="profiler")
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self, duration_s: float):
+        own = threading.get_ident()
+        deadline = time.monotonic() + duration_s
+        while not self._stop.wait(self.interval_s) and time.monotonic() < deadline:
+            stacks = [";".join(f"{f.name} ({f.filename.rsplit('/', 1)[-1]}:{f.lineno})"
+                               for f in traceback.extract_stack(frame))
+                      for ident, frame in sys._current_frames().items() if ident != own]
+            # folded() may be reading the tally from a request thread
+            with self._lock:
+                self._stacks.update(stacks)
+                self.samples += 1
+        self.stopped_at = time.time()
+
+    def folded(self, limit: int = None) -> str:
+        with self._lock:
+            stacks = _Tally(self._stacks)
+        return "\n".join(f"{stack} {n}" for stack, n in stacks.most_common(limit)) + "\n"
+
+    def status(self) -> dict:
+        return {
+            "running": self.running,
+            "interval_ms": self.interval_s * 1000,
+            "samples": self.samples,
+            "distinct_stacks": len(self._stacks),
+            "started_at": self.started_at,
+            "stopped_at": self.stopped_at,
+        }
+
+
+profiler = SamplingProfiler()
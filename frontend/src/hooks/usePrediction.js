@@ -1,43 +1,100 @@
-import { useState, useCallback } from 'react'
-import { predictSingle, predictAll } from '../services/api'
+import { useState, useCallback, useEffect, useRef } from 'react'
+import { streamPredictions, openLiveSession } from '../services/api'
 import toast from 'react-hot-toast'
 
 export function usePrediction() {
   const [loading, setLoading] = useState(false)
   const [results, setResults] = useState(null)
   const [error, setError] = useState(null)
+  const abortRef = useRef(null)
+
+  useEffect(() => () => abortRef.current?.abort(), [])
 
   const predict = useCallback(async (text, models) => {
     if (!text.trim()) {
       toast.error('Please enter a review text')
       return
     }
+    abortRef.current?.abort()
+    const controller = new AbortController()
+    abortRef.current = controller
     setLoading(true)
     setError(null)
     setResults(null)
 
+    // Predictions arrive first and render immediately; lime_words stays undefined
+    // (explanation pending) until that model's explanation event arrives
+    const merge = (model, fields) =>
+      setResults(prev => ({ ...prev, [model]: { ...prev?.[model], ...fields } }))
+
     try {
-      let data
-      if (models.length === 1) {
-        const res = await predictSingle(text, models[0])
-        data = { [models[0]]: res }
-      } else {
-        const res = await predictAll(text)
-        // API returns { results: { model_id: {...}, ... } }
-        const modelResults = res.results || res
-        data = {}
-        models.forEach(m => { if (modelResults[m]) data[m] = modelResults[m] })
-      }
-      setResults(data)
+      await streamPredictions(text, models, event => {
+        if (event.event === 'prediction') {
+          const { event: _, ...result } = event
+          merge(event.model, result)
+        } else if (event.event === 'explanation') {
+          merge(event.model, {
+            lime_words: event.lime_words,
+            explain_time_ms: event.explain_time_ms,
+            explain_timed_out: event.explain_timed_out,
+          })
+        } else if (event.event === 'error') {
+          toast.error(`${event.model}: ${event.detail}`)
+        }
+      }, controller.signal)
       toast.success('Analysis complete!')
     } catch (err) {
+      if (err.name === 'AbortError') return
       const msg = err?.response?.data?.detail || 'API Error — is the backend running?'
       setError(msg)
       toast.error(msg)
     } finally {
-      setLoading(false)
+      if (abortRef.current === controller) setLoading(false)
     }
   }, [])
 
   return { loading, results, error, predict }
 }
+
+// As-you-type results: NB / LR update on every edit, deep models and explanations once typing pauses
+export function useLivePrediction(enabled, text, models) {
+  const [results, setResults] = useState(null)
+  const [settled, setSettled] = useState(true)
+  const sessionRef = useRef(null)
+
+  useEffect(() => {
+    if (!enabled) return undefined
+    const merge = (model, fields) =>
+      setResults(prev => ({ ...prev, [model]: { ...prev?.[model], ...fields } }))
+    sessionRef.current = openLiveSession(event => {
+      if (event.event === 'prediction') {
+        const { event: _, seq, ...result } = event
+        merge(event.model, result)
+      } else if (event.event === 'explanation') {
+        merge(event.model, { lime_words: event.lime_words, explain_time_ms: event.explain_time_ms })
+      } else if (event.event === 'settled') {
+        setSettled(true)
+      } else if (event.event === 'error') {
+        toast.error(event.model ? `${event.model}: ${event.detail}` : event.detail)
+      }
+    })
+    return () => {
+      sessionRef.current.close()
+      sessionRef.current = null
+    }
+  }, [enabled])
+
+  useEffect(() => {
+    if (!enabled || !sessionRef.current) return
+    if (!text.trim()) {
+      setResults(null)
+      setSettled(true)
+      return
+    }
+    setSettled(false)
+    setResults(prev => prev && Object.fromEntries(Object.entries(prev).filter(([model]) => models.includes(model))))
+    sessionRef.current.send(text, models)
+  }, [enabled, text, models])
+
+  return { results, settled }
+}
@@ -2,7 +2,7 @@ import { useState, useEffect } from 'react'
 import { motion } from 'framer-motion'
 import { BarChart, Bar, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer } from 'recharts'
 import { AlertTriangle, TrendingDown } from 'lucide-react'
-import { getErrors } from '../services/api'
+import { getErrors, getErrorSummary } from '../services/api'
 
 const MOCK_ERRORS = [
   { id: 1, model: 'Naive Bayes', review: "I can't say enough bad things about this film... just kidding, it was fantastic!", true_label: 'positive', pred_label: 'negative', confidence: 0.91, length: 78, reason: 'Sarcasm / Negation' },
@@ -15,6 +15,8 @@ const MOCK_ERRORS = [
   { id: 8, model: 'DistilBERT', review: "Technically impressive but emotionally hollow. Beautiful images, no soul.", true_label: 'negative', pred_label: 'positive', confidence: 0.68, length: 70, reason: 'Mixed signals' },
 ]
 
+const PAGE_SIZE = 25
+
 const ERROR_BY_LENGTH = [
   { bucket: '0-200', error_rate: 0.18 },
   { bucket: '200-400', error_rate: 0.12 },
@@ -53,24 +55,49 @@ const tooltipStyle = {
 
 export default function ErrorAnalysis() {
   const [errors, setErrors] = useState(MOCK_ERRORS)
+  const [cursor, setCursor] = useState(null)
+  const [highConf, setHighConf] = useState(() => [...MOCK_ERRORS].sort((a, b) => b.confidence - a.confidence).slice(0, 3))
+  const [errorByLength, setErrorByLength] = useState(ERROR_BY_LENGTH)
+  const [models, setModels] = useState(() => [...new Set(MOCK_ERRORS.map(e => e.model))])
   const [modelFilter, setModelFilter] = useState('all')
   const [trueLabelFilter, setTrueLabelFilter] = useState('all')
   const [predLabelFilter, setPredLabelFilter] = useState('all')
 
   useEffect(() => {
-    getErrors().then(data => { if (data?.length) setErrors(data) }).catch(() => { })
+    getErrors({ limit: 3 }).then(data => { if (data?.items?.length) setHighConf(data.items) }).catch(() => { })
+    getErrorSummary().then(data => {
+      if (data.error_by_length?.length) setErrorByLength(data.error_by_length)
+      if (data.models?.length) setModels(data.models.map(m => m.label))
+    }).catch(() => { }) // 404 until an evaluation run exists; keep the mock chart
   }, [])
 
-  const models = [...new Set(MOCK_ERRORS.map(e => e.model))]
-
-  const filtered = errors.filter(e => {
-    const mOk = modelFilter === 'all' || e.model === modelFilter
-    const tOk = trueLabelFilter === 'all' || e.true_label === trueLabelFilter
-    const pOk = predLabelFilter === 'all' || e.pred_label === predLabelFilter
-    return mOk && tOk && pOk
+  // Filtering and paging happen server-side; a filter change starts again from the first page
+  const filterParams = () => ({
+    ...(modelFilter !== 'all' && { model: modelFilter }),
+    ...(trueLabelFilter !== 'all' && { true_label: trueLabelFilter }),
+    ...(predLabelFilter !== 'all' && { pred_label: predLabelFilter }),
+    limit: PAGE_SIZE,
   })
 
-  const highConf = [...errors].sort((a, b) => b.confidence - a.confidence).slice(0, 3)
+  useEffect(() => {
+    getErrors(filterParams())
+      .then(data => { setErrors(data.items); setCursor(data.next_cursor) })
+      .catch(() => {
+        setErrors(MOCK_ERRORS.filter(e =>
+          (modelFilter === 'all' || e.model === modelFilter) &&
+          (trueLabelFilter === 'all' || e.true_label === trueLabelFilter) &&
+          (predLabelFilter === 'all' || e.pred_label === predLabelFilter)))
+        setCursor(null)
+      })
+  }, [modelFilter, trueLabelFilter, predLabelFilter])
+
+  const loadMore = () => {
+    getErrors({ ...filterParams(), cursor })
+      .then(data => { setErrors(prev => [...prev, ...data.items]); setCursor(data.next_cursor) })
+      .catch(() => { })
+  }
+
+  const filtered = errors
 
   return (
     <div className="max-w-6xl mx-auto px-4 sm:px-6 py-12">
@@ -89,7 +116,7 @@ export default function ErrorAnalysis() {
         <div className="card p-6">
           <p className="section-label mb-4">Error Rate by Review Length</p>
           <ResponsiveContainer width="100%" height={240}>
-            <BarChart data={ERROR_BY_LENGTH} margin={{ top: 5, right: 10, bottom: 20, left: 0 }}>
+            <BarChart data={errorByLength} margin={{ top: 5, right: 10, bottom: 20, left: 0 }}>
               <CartesianGrid strokeDasharray="3 3" stroke="#ebe3d9" vertical={false} />
               <XAxis dataKey="bucket" tick={{ fill: '#9a8b78', fontSize: 10, fontFamily: 'Inter' }} />
               <YAxis tickFormatter={v => `${(v * 100).toFixed(0)}%`} tick={{ fill: '#9a8b78', fontSize: 11 }} />
@@ -195,7 +222,17 @@ export default function ErrorAnalysis() {
             </tbody>
           </table>
         </div>
-        <p className="text-xs text-warm-400 mt-4">{filtered.length} errors shown</p>
+        <div className="flex items-center justify-between mt-4">
+          <p className="text-xs text-warm-400">{filtered.length} errors shown</p>
+          {cursor && (
+            <button
+              onClick={loadMore}
+              className="text-xs font-display font-semibold rounded-xl px-3 py-2 bg-warm-50 border border-warm-200 text-warm-600 hover:border-accent-coral/40 transition-colors"
+            >
+              Load more
+            </button>
+          )}
+        </div>
       </div>
 
       {/* Sarcasm Examples */}
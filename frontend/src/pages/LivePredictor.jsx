@@ -1,7 +1,7 @@
 import { useState } from 'react'
 import { motion, AnimatePresence } from 'framer-motion'
 import { Zap, ThumbsUp, ThumbsDown, Loader2, RotateCcw } from 'lucide-react'
-import { usePrediction } from '../hooks/usePrediction'
+import { usePrediction, useLivePrediction } from '../hooks/usePrediction'
 import ModelSelector from '../components/ModelSelector'
 import ConfidenceGauge from '../components/ConfidenceGauge'
 import LimeHighlighter from '../components/LimeHighlighter'
@@ -65,7 +65,12 @@ function ResultCard({ modelId, result }) {
         <ConfidenceGauge confidence={result.confidence} sentiment={result.sentiment} />
       </div>
 
-      {result.lime_words && result.lime_words.length > 0 && (
+      {result.lime_words === undefined ? (
+        <p className="flex items-center gap-2 text-xs text-warm-400 mt-3 font-body">
+          <Loader2 size={12} className="animate-spin" />
+          Computing explanation...
+        </p>
+      ) : result.lime_words.length > 0 && (
         <LimeHighlighter words={result.lime_words} />
       )}
 
@@ -81,7 +86,10 @@ function ResultCard({ modelId, result }) {
 export default function LivePredictor() {
   const [text, setText] = useState('')
   const [selectedModels, setSelectedModels] = useState(['naive_bayes', 'logistic_regression'])
-  const { loading, results, error, predict } = usePrediction()
+  const [live, setLive] = useState(false)
+  const { loading, results: clickResults, error, predict } = usePrediction()
+  const { results: liveResults, settled } = useLivePrediction(live, text, selectedModels)
+  const results = live ? liveResults : clickResults
 
   const handleAnalyze = () => predict(text, selectedModels)
 
@@ -138,6 +146,11 @@ export default function LivePredictor() {
             <div className="flex items-center justify-between mb-3">
               <p className="section-label">Review Text</p>
               <div className="flex items-center gap-2">
+                <label className="flex items-center gap-1.5 text-xs text-warm-500 font-body cursor-pointer">
+                  <input type="checkbox" checked={live} onChange={e => setLive(e.target.checked)} />
+                  Live
+                </label>
+                {live && !settled && <Loader2 size={12} className="animate-spin text-warm-400" />}
                 <span className="text-xs text-warm-400 font-body">{text.length} chars</span>
                 {text && (
                   <button onClick={handleReset} className="text-warm-400 hover:text-warm-600 transition-colors">
@@ -153,29 +166,31 @@ export default function LivePredictor() {
               rows={7}
               className="w-full bg-warm-50 text-warm-800 placeholder-warm-300 resize-none focus:outline-none text-sm leading-relaxed p-4 rounded-xl border border-warm-200 focus:border-accent-coral/40 transition-colors"
             />
-            <div className="mt-4">
-              <button
-                onClick={handleAnalyze}
-                disabled={loading || !text.trim()}
-                className="btn-primary w-full flex items-center justify-center gap-2 py-3.5"
-              >
-                {loading ? (
-                  <>
-                    <Loader2 size={16} className="animate-spin" />
-                    Analyzing...
-                  </>
-                ) : (
-                  <>
-                    <Zap size={16} />
-                    Analyze Sentiment
-                  </>
-                )}
-              </button>
-            </div>
+            {!live && (
+              <div className="mt-4">
+                <button
+                  onClick={handleAnalyze}
+                  disabled={loading || !text.trim()}
+                  className="btn-primary w-full flex items-center justify-center gap-2 py-3.5"
+                >
+                  {loading ? (
+                    <>
+                      <Loader2 size={16} className="animate-spin" />
+                      Analyzing...
+                    </>
+                  ) : (
+                    <>
+                      <Zap size={16} />
+                      Analyze Sentiment
+                    </>
+                  )}
+                </button>
+              </div>
+            )}
           </div>
 
           {/* Error message */}
-          {error && !loading && (
+          {error && !loading && !live && (
             <div className="card p-4 border-l-3 border-l-accent-rose bg-accent-rose/5">
               <p className="text-sm text-accent-rose">{error}</p>
             </div>
@@ -183,7 +198,7 @@ export default function LivePredictor() {
 
           {/* Results */}
           <AnimatePresence>
-            {results && Object.keys(results).length > 0 && !loading && (
+            {results && Object.keys(results).length > 0 && (
               <motion.div
                 initial={{ opacity: 0 }}
                 animate={{ opacity: 1 }}
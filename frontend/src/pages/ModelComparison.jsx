@@ -5,7 +5,7 @@ import {
   LineChart, Line
 } from 'recharts'
 import { GitCompare } from 'lucide-react'
-import { getMetrics, getTrainingHistory } from '../services/api'
+import { getMetrics, getMetricsDetails, getTrainingHistory } from '../services/api'
 import MetricsBar from '../components/charts/MetricsBar'
 import MetricsRadar from '../components/charts/RadarChart'
 import ConfusionMatrix from '../components/charts/ConfusionMatrix'
@@ -72,11 +72,20 @@ const tooltipStyle = {
 
 export default function ModelComparison() {
   const [metrics, setMetrics] = useState(MOCK_METRICS)
+  const [roc, setRoc] = useState(MOCK_ROC)
+  const [confusion, setConfusion] = useState(MOCK_CONFUSION)
   const [history, setHistory] = useState(MOCK_HISTORY)
   const [cmModel, setCmModel] = useState('Naive Bayes')
 
   useEffect(() => {
     getMetrics().then(setMetrics).catch(() => { })
+    // 404 until the backend has run an evaluation; keep the mock curves then
+    getMetricsDetails().then(details => {
+      const entries = Object.entries(details.models)
+      setRoc(Object.fromEntries(entries.map(([m, d]) => [m, d.roc])))
+      setConfusion(Object.fromEntries(entries.map(([m, d]) => [m, d.confusion_matrix])))
+      if (entries.length) setCmModel(entries[0][0])
+    }).catch(() => { })
   }, [])
 
   const models = Object.keys(metrics)
@@ -150,7 +159,7 @@ export default function ModelComparison() {
 
       {/* ROC Curves */}
       <div className="card p-6 mb-6">
-        <ROCCurve data={MOCK_ROC} />
+        <ROCCurve data={roc} />
       </div>
 
       {/* Confusion Matrix + Training History */}
@@ -166,7 +175,7 @@ export default function ModelComparison() {
               {models.map(m => <option key={m} value={m}>{m}</option>)}
             </select>
           </div>
-          <ConfusionMatrix data={MOCK_CONFUSION[cmModel]} modelName={cmModel} />
+          <ConfusionMatrix data={confusion[cmModel]} modelName={cmModel} />
         </div>
 
         {/* Training History */}
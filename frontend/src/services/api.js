@@ -16,18 +16,77 @@ api.interceptors.response.use(
 export const predictSingle = (text, model) =>
   api.post('/predict', { text, model })
 
-export const predictAll = (text) =>
-  api.post('/predict/compare', { text })
+export const predictAll = (text, models) =>
+  api.post('/predict/compare', { text, models })
+
+// Streams NDJSON events from /predict/stream (one model) or /predict/compare/stream,
+// calling onEvent for each: start, prediction, explanation, error, done
+export async function streamPredictions(text, models, onEvent, signal) {
+  const single = models.length === 1
+  const res = await fetch(`${api.defaults.baseURL}${single ? '/predict/stream' : '/predict/compare/stream'}`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify(single ? { text, model: models[0] } : { text, models }),
+    signal,
+  })
+  if (!res.ok) {
+    const data = await res.json().catch(() => ({}))
+    const err = new Error(data.detail || `HTTP ${res.status}`)
+    err.response = { status: res.status, data }
+    throw err
+  }
+  const reader = res.body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ''
+  for (;;) {
+    const { value, done } = await reader.read()
+    if (done) break
+    buffer += decoder.decode(value, { stream: true })
+    const lines = buffer.split('\n')
+    buffer = lines.pop()
+    lines.filter(line => line.trim()).forEach(line => onEvent(JSON.parse(line)))
+  }
+  if (buffer.trim()) onEvent(JSON.parse(buffer))
+}
+
+// Live typing over the /ws/live WebSocket. send(text, models) after each edit; onEvent gets
+// update, prediction, explanation, error and settled events for the newest edit only
+export function openLiveSession(onEvent) {
+  const ws = new WebSocket(`${api.defaults.baseURL.replace(/^http/, 'ws')}/ws/live`)
+  let seq = 0
+  let pending = null
+  ws.onopen = () => { if (pending) ws.send(pending) }
+  ws.onmessage = msg => {
+    const event = JSON.parse(msg.data)
+    // Events for an edit the user has already typed past are stale
+    if (event.seq == null || event.seq === seq) onEvent(event)
+  }
+  return {
+    send(text, models) {
+      seq += 1
+      const body = JSON.stringify({ seq, text, models })
+      if (ws.readyState === WebSocket.OPEN) ws.send(body)
+      else pending = body
+    },
+    close: () => ws.close(),
+  }
+}
 
 export const getMetrics = () =>
   api.get('/metrics')
 
+export const getMetricsDetails = () =>
+  api.get('/metrics/details')
+
 export const getDatasetStats = () =>
   api.get('/dataset/stats')
 
 export const getErrors = (params = {}) =>
   api.get('/errors', { params })
 
+export const getErrorSummary = () =>
+  api.get('/errors/summary')
+
 export const getTrainingHistory = (model) =>
   api.get('/training-history', { params: { model } })
 
@@ -12,15 +12,39 @@ This script assumes you have the following variables in scope from training:
 - tokenizer           (Keras Tokenizer)
 - model_bert          (TF DistilBERT model)
 - tokenizer_bert      (HuggingFace tokenizer)
+
+export_sklearn / export_keras_tokenizer additionally write the memory-mappable
+array format (a directory of .npy files + manifest.json) that the backend
+prefers over the pickles when present.
+
+export_onnx_lstm / export_onnx_distilbert convert the deep models to ONNX
+(optionally int8-quantized) for ONNX Runtime, which the backend serves
+instead of TensorFlow when present. They need tf2onnx and onnxruntime, and
+check the exported graphs against the TF outputs on sample reviews.
 """
 
 import pickle
 import os
+import sys
 from pathlib import Path
 
 SAVE_DIR = Path("backend/models/saved")
 SAVE_DIR.mkdir(parents=True, exist_ok=True)
 
+# Parity-check reviews for the ONNX exports; pass held-out test reviews for a stronger check
+SAMPLE_REVIEWS = [
+    "An absolute masterpiece with breathtaking performances and a moving story.",
+    "Terrible movie. The plot made no sense and the acting was wooden.",
+    "The visuals are stunning but the storyline falls apart in the third act.",
+    "I wanted to love it, but it was boring and far too long.",
+    "Not bad at all, a fun and surprisingly clever comedy.",
+    "A complete waste of two hours. I want my money back.",
+    "Solid direction, great soundtrack, and a cast that clearly enjoyed themselves.",
+    "Neither funny nor scary, it just sits there.",
+]
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "backend"))
+
 
 def save_sklearn(model, name):
     path = SAVE_DIR / f"{name}.pkl"
@@ -29,6 +53,14 @@ def save_sklearn(model, name):
     print(f"✅ Saved {name} → {path}")
 
 
+def export_sklearn(model, name, preprocessing="lemmatize"):
+    """Array export of a TF-IDF → NB/LR pipeline; name is the model key, e.g. 'naive_bayes'."""
+    from models.artifacts import export_sklearn_pipeline
+    path = SAVE_DIR / name
+    manifest = export_sklearn_pipeline(model, path, preprocessing=preprocessing)
+    print(f"✅ Exported {name} arrays → {path} (checksum {manifest['checksum'][:12]})")
+
+
 def save_keras_tokenizer(tokenizer):
     path = SAVE_DIR / "tokenizer.pkl"
     with open(path, "wb") as f:
@@ -36,6 +68,13 @@ def save_keras_tokenizer(tokenizer):
     print(f"✅ Saved Keras tokenizer → {path}")
 
 
+def export_keras_tokenizer(tokenizer, preprocessing="lemmatize"):
+    from models.artifacts import export_keras_tokenizer as _export
+    path = SAVE_DIR / "tokenizer"
+    manifest = _export(tokenizer, path, preprocessing=preprocessing)
+    print(f"✅ Exported Keras tokenizer arrays → {path} (checksum {manifest['checksum'][:12]})")
+
+
 def save_lstm(model):
     path = SAVE_DIR / "rnn_lstm.h5"
     model.save(str(path))
@@ -49,12 +88,41 @@ def save_distilbert(model, tokenizer):
     print(f"✅ Saved DistilBERT → {path}")
 
 
+def _print_parity(name, manifest):
+    for precision, report in manifest["parity"].items():
+        status = "✅" if report["passed"] else "❌"
+        print(f"{status} {name} {precision}: max |Δp| {report['max_abs_diff']:.2e} "
+              f"(tolerance {report['tolerance']}), label agreement {report['label_agreement']:.1%}")
+
+
+def export_onnx_lstm(model, tokenizer, quantize=False, sample_texts=None):
+    from models.onnx_runtime import export_lstm
+    path = SAVE_DIR / "rnn_lstm_onnx"
+    manifest = export_lstm(model, tokenizer, path, sample_texts or SAMPLE_REVIEWS, quantize=quantize)
+    print(f"✅ Exported LSTM to ONNX → {path} ({', '.join(manifest['files'])})")
+    _print_parity("LSTM", manifest)
+
+
+def export_onnx_distilbert(model, tokenizer, quantize=False, sample_texts=None):
+    from models.onnx_runtime import export_distilbert
+    path = SAVE_DIR / "distilbert_onnx"
+    manifest = export_distilbert(model, tokenizer, path, sample_texts or SAMPLE_REVIEWS, quantize=quantize)
+    print(f"✅ Exported DistilBERT to ONNX → {path} ({', '.join(manifest['files'])})")
+    _print_parity("DistilBERT", manifest)
+
+
 if __name__ == "__main__":
     print("This script should be run after training. Import your trained models and call the save functions.")
     print("\nExample:")
-    print("  from save_models import save_sklearn, save_lstm, save_distilbert, save_keras_tokenizer")
+    print("  from save_models import save_sklearn, save_lstm, save_distilbert, save_keras_tokenizer, export_sklearn, export_keras_tokenizer")
+    print("  from save_models import export_onnx_lstm, export_onnx_distilbert")
     print("  save_sklearn(nb_pipeline, 'naive_bayes_pipeline')")
     print("  save_sklearn(best_lr_model, 'logistic_regression_pipeline')")
+    print("  export_sklearn(nb_pipeline, 'naive_bayes')            # fast array format")
+    print("  export_sklearn(best_lr_model, 'logistic_regression')")
     print("  save_keras_tokenizer(tokenizer)")
+    print("  export_keras_tokenizer(tokenizer)")
     print("  save_lstm(rnn_model)")
     print("  save_distilbert(model_bert, tokenizer_bert)")
+    print("  export_onnx_lstm(rnn_model, tokenizer, quantize=True)          # ONNX Runtime backend")
+    print("  export_onnx_distilbert(model_bert, tokenizer_bert, quantize=True)")